@@ -0,0 +1,87 @@
+# myquant/backend/api/compare.py
+"""
+运行对比API - 把多个运行（可跨策略）的资金曲线对齐到同一日期索引后统一计算对比指标
+"""
+
+from flask import Blueprint, request, jsonify
+from backend.api.auth import login_required
+from backend.api.runs import global_config, get_run_state
+from backend.api.sweeps import load_sweep, build_sweep_result
+from backend.utils.metrics import get_daily_nav, get_equity_metrics, compare_navs
+from backend.utils.concurrency import run_cpu_bound
+
+compare_bp = Blueprint('compare', __name__)
+
+MAX_COMPARE_RUNS = global_config.get('compare', {}).get('max_runs', 500)
+
+
+@compare_bp.route('/runs/compare', methods=['POST'])
+@login_required
+def compare_runs():
+    """
+    对比多个运行
+    请求体: {
+        "run_ids": ["a_backtest_20250101_093000", ...],   // 或 "sweep_id": "..." 对比某次参数扫描的所有已完成变体
+        "rolling_window": 60,                             // 滚动夏普的窗口（交易日）
+        "max_points": 500,                                // 每条时间序列最多返回的点数，0 表示不抽样
+        "base_run_id": "..."                              // 相对表现的基准，默认第一个运行
+    }
+    """
+    data = request.get_json() or {}
+    run_ids = list(data.get('run_ids') or [])
+
+    if data.get('sweep_id'):
+        sweep = load_sweep(data['sweep_id'])
+        if not sweep:
+            return jsonify({'error': '参数扫描不存在'}), 404
+        result = build_sweep_result(sweep)
+        run_ids += [row['run_id'] for row in result['rows']
+                    if row.get('run_id') and row['status'] in ('finished', 'interrupted')]
+
+    run_ids = list(dict.fromkeys(run_ids))  # 去重并保持顺序
+    if len(run_ids) < 2:
+        return jsonify({'error': '至少需要两个运行'}), 400
+    if len(run_ids) > MAX_COMPARE_RUNS:
+        return jsonify({'error': f'最多对比 {MAX_COMPARE_RUNS} 个运行'}), 400
+
+    base_run_id = data.get('base_run_id') or run_ids[0]
+    if base_run_id not in run_ids:
+        return jsonify({'error': '基准运行不在对比列表中'}), 400
+
+    try:
+        rolling_window = int(data.get('rolling_window', 60))
+        max_points = int(data.get('max_points', 500))
+    except (TypeError, ValueError):
+        return jsonify({'error': '无效的 rolling_window 或 max_points'}), 400
+
+    runs = []
+    series = []
+    missing = []
+    for run_id in run_ids:
+        status, workspace_dir = get_run_state(run_id)
+        daily = get_daily_nav(workspace_dir) if workspace_dir else None
+        if daily is None:
+            missing.append(run_id)
+            continue
+        runs.append({'run_id': run_id, 'status': status, 'metrics': get_equity_metrics(workspace_dir)})
+        series.append(daily)
+
+    if missing:
+        return jsonify({'error': '部分运行没有资金曲线', 'missing': missing}), 404
+
+    try:
+        comparison = run_cpu_bound(
+            compare_navs,
+            series,
+            rolling_window=rolling_window,
+            base_index=run_ids.index(base_run_id),
+            max_points=max_points
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'runs': runs,
+        'base_run_id': base_run_id,
+        **comparison
+    })
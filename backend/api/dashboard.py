@@ -0,0 +1,130 @@
+# myquant/backend/api/dashboard.py
+"""
+首页看板API - 一次返回所有策略的运行统计
+
+数据来自运行摘要索引和活动运行登记表，不逐个扫描工作区：
+只有 backtest / simulation 目录的 mtime 发生变化（新建或删除了工作区）的策略才会重新校验索引，
+运行结束、备注修改等变化由 runs.py 在发生时写入索引。
+"""
+
+import os
+import threading
+from flask import Blueprint, jsonify
+from backend.api.auth import login_required
+from backend.api.runs import STRATEGIES_DIR, active_runs, run_index, collect_runs
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+RUN_MODES = ('backtest', 'simulation')
+
+# {strategy_name: (backtest 目录 mtime, simulation 目录 mtime)}，与当前值不同时重新校验该策略的索引
+scan_stamps = {}
+scan_lock = threading.Lock()
+
+
+def get_scan_stamp(strategy_dir):
+    """策略各模式目录的 mtime，目录不存在时为 None"""
+    stamp = []
+    for mode in RUN_MODES:
+        try:
+            stamp.append(os.stat(strategy_dir / 'strategy' / mode).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def refresh_stale_strategies(strategy_dirs):
+    """重新校验工作区发生增删的策略的索引"""
+    with scan_lock:
+        for strategy_dir in strategy_dirs:
+            stamp = get_scan_stamp(strategy_dir)
+            if scan_stamps.get(strategy_dir.name) != stamp:
+                collect_runs(strategy_dir.name)
+                scan_stamps[strategy_dir.name] = stamp
+        for name in set(scan_stamps) - {strategy_dir.name for strategy_dir in strategy_dirs}:
+            del scan_stamps[name]
+
+
+def get_live_runs():
+    """活动运行按策略分组: {strategy: [{run_id, mode, status, start_time, port}]}"""
+    live = {}
+    # 进程退出时由进程监视器移出 active_runs，无需逐个探测进程
+    for run_id, run_info in active_runs.items():
+        live.setdefault(run_info.get('strategy'), []).append({
+            'run_id': run_id,
+            'mode': run_info.get('mode'),
+            'status': 'paused' if run_info.get('is_paused') else 'running',
+            'start_time': run_info.get('start_time'),
+            'port': run_info.get('port')
+        })
+    return live
+
+
+@dashboard_bp.route('/dashboard', methods=['GET'])
+@login_required
+def get_dashboard():
+    """
+    所有策略的看板数据
+    返回: {
+        strategies: [{name, created_at, total_runs, counts: {status: n}, active_runs: [...],
+                      latest_run: {run_id, mode, status, start_time, final_return} | null, disk_usage_bytes}],
+        totals: {strategies, runs, active_runs, disk_usage_bytes}
+    }
+    """
+    strategy_dirs = [
+        STRATEGIES_DIR / entry.name for entry in os.scandir(STRATEGIES_DIR)
+        if entry.is_dir() and not entry.name.startswith('.')
+    ]
+    refresh_stale_strategies(strategy_dirs)
+
+    stats = run_index.strategy_stats()
+    live = get_live_runs()
+    strategies = []
+    for strategy_dir in strategy_dirs:
+        name = strategy_dir.name
+        entry = stats.get(name, {'counts': {}, 'size_bytes': 0, 'latest_run': None})
+        counts = dict(entry['counts'])
+        live_runs = live.get(name, [])
+
+        # 活动运行在索引中记录的是工作区推断的状态，以进程状态为准
+        for run in live_runs:
+            summary = run_index.get(run['run_id'])
+            if summary and counts.get(summary['status']):
+                counts[summary['status']] -= 1
+            counts[run['status']] = counts.get(run['status'], 0) + 1
+        counts = {status: count for status, count in counts.items() if count}
+
+        latest = entry['latest_run']
+        latest_run = None
+        if latest:
+            live_status = next((run['status'] for run in live_runs if run['run_id'] == latest['run_id']), None)
+            latest_run = {
+                'run_id': latest['run_id'],
+                'mode': latest['mode'],
+                'status': live_status or latest['status'],
+                'start_time': latest['start_time'],
+                'final_return': latest['final_return']
+            }
+
+        strategies.append({
+            'name': name,
+            'created_at': strategy_dir.stat().st_ctime,
+            'total_runs': sum(counts.values()),
+            'counts': counts,
+            'active_runs': live_runs,
+            'latest_run': latest_run,
+            'disk_usage_bytes': entry['size_bytes']
+        })
+
+    # 与策略列表一致，按创建时间倒序
+    strategies.sort(key=lambda x: x['created_at'], reverse=True)
+
+    return jsonify({
+        'strategies': strategies,
+        'totals': {
+            'strategies': len(strategies),
+            'runs': sum(s['total_runs'] for s in strategies),
+            'active_runs': sum(len(s['active_runs']) for s in strategies),
+            'disk_usage_bytes': sum(s['disk_usage_bytes'] for s in strategies)
+        }
+    })
@@ -1,63 +1,269 @@
 # myquant/backend/api/monitoring.py
 """
 实时监控WebSocket事件处理
+
+每个运行只建立一条到 qtrader 监控服务的上游连接（MonitorRelay），所有订阅该运行的浏览器共享；
+订阅者按引用计数，最后一个订阅者离开时关闭上游连接。
+
+上游的 update 先合并到中继的最新状态中，再按每个订阅者的帧率合并发送（引擎推送再快，下行频率也不变）：
+- 默认：每帧发送完整状态（monitoring_update 事件，与原来的格式相同）
+- delta：首帧发送完整状态，之后只发送与该订阅者上一帧相比变化的字段（monitoring_frame 事件，见 state_delta）
+- binary：帧以 zlib 压缩的 JSON 字节发送
+
+运行的降采样历史（权益曲线、订单等，见 monitor_history）由后端按运行保存：
+运行器通过 stdout 事件通道持续发送监控采样（monitor 事件），launch_runner 把它记录到 register_history 登记的历史中，
+因此历史从运行启动起就是完整的，且不需要为没有订阅者的运行保持上游连接。
+新订阅者先收到一次 monitoring_snapshot（最新状态 + 历史），之后再接收实时帧，无需运行器重放历史。
+重新接管的运行没有事件通道，此时中继自行记录历史（从第一个订阅者到来时开始）。
 """
 
+import copy
 import socketio
 import threading
 import time
-import requests
 from flask import request
-from flask_socketio import emit, disconnect
+from flask_socketio import emit, join_room, leave_room
 
 # 从新的 extensions 模块安全地导入 socketio 实例
 from backend.extensions import socketio as main_socketio
+from backend.utils.state_delta import diff_state, encode_frame
+from backend.utils.monitor_history import MonitorHistory
 
-# 订阅管理：{sid: {run_id, port, thread}}
+# 订阅管理：{sid: run_id}，每个浏览器连接同时只订阅一个运行
 subscriptions = {}
+# 上游中继：{run_id: MonitorRelay}
+relays = {}
+relays_lock = threading.Lock()
+# 由运行器事件通道记录的监控历史：{run_id: MonitorHistory}
+histories = {}
+
+# 帧率和历史缓冲大小（由 register_socketio_events 从全局配置 monitoring 中读取）
+DEFAULT_FPS = 5
+MAX_FPS = 20
+HISTORY_POINTS = 1000
+HISTORY_ORDERS = 200
+
+
+def monitoring_room(run_id):
+    return f'monitoring:{run_id}'
+
+
+class Subscriber:
+    """一个订阅者的发送选项和发送进度"""
+
+    def __init__(self, sid, fps=None, delta=False, binary=False):
+        self.sid = sid
+        try:
+            fps = float(fps or DEFAULT_FPS)
+        except (TypeError, ValueError):
+            fps = DEFAULT_FPS
+        self.interval = 1.0 / min(max(fps, 0.1), MAX_FPS)
+        self.delta = bool(delta)
+        self.binary = bool(binary)
+        self.version = 0  # 最近一次发送给该订阅者的状态版本
+        self.next_due = 0.0
+
+
+class MonitorRelay:
+    """
+    单个运行的上游中继：后台线程连接 qtrader 的 Socket.IO，合并 update 事件并按帧率发送给订阅者
+    """
+
+    def __init__(self, run_id, port):
+        self.run_id = run_id
+        self.port = port
+        self.subscribers = {}  # {sid: Subscriber}
+        self._state = {}
+        self._version = 0
+        self._snapshots = {}  # {版本: 状态快照}，作为增量订阅者的比较基准
+        # 优先使用事件通道记录的历史；没有时（重新接管的运行）由中继自己记录
+        self.history = histories.get(run_id)
+        self._owns_history = self.history is None
+        if self._owns_history:
+            self.history = create_history()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'monitor-{run_id}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def on_update(self, data):
+        """合并上游推送的状态（字典按顶层字段合并，其它类型整体替换）"""
+        with self._lock:
+            if isinstance(data, dict):
+                self._state.update(data)
+            else:
+                self._state = {'data': data}
+            self._version += 1
+            if self._owns_history:
+                self.history.record(data)
+
+    def snapshot_for(self, sub):
+        """
+        新订阅者的初始快照：最新状态和历史
+        之后的实时帧以该快照为基准（增量订阅者直接收到相对快照的变化）
+        """
+        with self._lock:
+            version = self._version
+            state = copy.deepcopy(self._state)
+            history = self.history.export()
+            if sub.delta and version:
+                self._snapshots[version] = state
+            sub.version = version
+        frame = {'run_id': self.run_id, 'v': version, 'state': state, 'history': history}
+        return encode_frame(frame, sub.binary)
+
+    def _tick_interval(self):
+        intervals = [sub.interval for sub in list(self.subscribers.values())]
+        return max(min(intervals, default=1.0), 1.0 / MAX_FPS)
+
+    def emit_frames(self, now):
+        """向到期且有新状态的订阅者发送一帧；相同基准和编码的帧只生成一次"""
+        due = [sub for sub in list(self.subscribers.values())
+               if now >= sub.next_due and sub.version != self._version]
+        if not due:
+            return
+        with self._lock:
+            version = self._version
+            snapshot = copy.deepcopy(self._state)
+
+        frames = {}
+        for sub in due:
+            base = sub.version if sub.delta and sub.version in self._snapshots else None
+            key = (sub.delta, sub.binary, base)
+            if key not in frames:
+                with self._lock:
+                    base_state = self._snapshots.get(base)
+                if not sub.delta:
+                    frames[key] = ('monitoring_update', encode_frame(snapshot, sub.binary))
+                elif base is None:
+                    frame = {'run_id': self.run_id, 'v': version, 'key': True, 'state': snapshot}
+                    frames[key] = ('monitoring_frame', encode_frame(frame, sub.binary))
+                else:
+                    set_ops, unset_ops = diff_state(base_state, snapshot)
+                    frame = {'run_id': self.run_id, 'v': version, 'base': base, 'set': set_ops, 'unset': unset_ops}
+                    frames[key] = ('monitoring_frame', encode_frame(frame, sub.binary))
+            event, payload = frames[key]
+            main_socketio.emit(event, payload, room=sub.sid)
+            sub.version = version
+            sub.next_due = now + sub.interval
+
+        # 只保留仍被增量订阅者引用的快照
+        with self._lock:
+            self._snapshots[version] = snapshot
+            referenced = {sub.version for sub in list(self.subscribers.values()) if sub.delta}
+            for stale in [v for v in self._snapshots if v not in referenced]:
+                del self._snapshots[stale]
+
+    def _run(self):
+        room = monitoring_room(self.run_id)
+        sio_client = socketio.Client()
+        sio_client.on('update', self.on_update)
+
+        try:
+            # 尝试连接，设置10秒超时
+            sio_client.connect(f'http://localhost:{self.port}', wait_timeout=100)
+
+            # 保持连接，直到最后一个订阅者离开或连接断开
+            while not self._stop.wait(self._tick_interval()):
+                if not sio_client.connected:
+                    main_socketio.emit('error', {'message': f'与 {self.run_id} 的监控连接已断开'}, room=room)
+                    break
+                self.emit_frames(time.monotonic())
+
+        except Exception as e:
+            # 打印详细的错误日志
+            print(f"监控连接错误 (run_id: {self.run_id}, port: {self.port}): {e}")
+            # 向前端发送明确的错误通知
+            main_socketio.emit('error', {'message': f'无法连接到运行实例 {self.run_id} 的监控服务。该实例可能已崩溃或启动失败。'}, room=room)
+
+        finally:
+            # 确保断开连接，并移除中继（仍在房间中的订阅者需要重新订阅）
+            if sio_client.connected:
+                sio_client.disconnect()
+            with relays_lock:
+                if relays.get(self.run_id) is self:
+                    del relays[self.run_id]
+
+
+def create_history():
+    """按配置的容量创建一个运行的监控历史"""
+    return MonitorHistory(HISTORY_POINTS, HISTORY_ORDERS)
 
-def fetch_and_emit(sid, port, run_id):
+
+def register_history(run_id, history):
+    """登记由运行器事件通道记录的历史，之后创建的中继直接使用它"""
+    histories[run_id] = history
+
+
+def drop_history(run_id):
+    """运行结束后丢弃登记的历史"""
+    histories.pop(run_id, None)
+
+
+def _get_relay(run_id, port):
+    """取得运行的中继，不存在或端口已变化时创建（调用方持有 relays_lock）"""
+    relay = relays.get(run_id)
+    if relay is None or relay.port != port:
+        # 运行恢复后端口可能变化，旧中继的订阅者转移到新中继
+        previous = relay
+        relay = MonitorRelay(run_id, port)
+        if previous is not None:
+            previous.stop()
+            relay.subscribers = previous.subscribers
+        relays[run_id] = relay
+        relay.start()
+    return relay
+
+
+def add_subscriber(run_id, port, subscriber, send_snapshot):
     """
-    后台线程：定期从qtrader的Socket.IO获取数据并转发给前端
+    登记订阅者，该运行还没有中继时创建
+    先通过 send_snapshot(snapshot) 发出初始快照再登记，保证订阅者收到的第一条实时帧晚于快照
     """
-    # 创建Socket.IO客户端连接到qtrader
-    sio_client = socketio.Client()
-
-    @sio_client.on('update')
-    def on_update(data):
-        # 收到qtrader的更新，转发给前端
-        main_socketio.emit('monitoring_update', data, room=sid)
-
-    try:
-        # 尝试连接，设置10秒超时
-        sio_client.connect(f'http://localhost:{port}', wait_timeout=100)
-        
-        # 保持连接，直到取消订阅或连接断开
-        while sid in subscriptions and subscriptions[sid]['run_id'] == run_id:
-            if not sio_client.connected:
-                main_socketio.emit('error', {'message': f'与 {run_id} 的监控连接已断开'}, room=sid)
-                break
-            time.sleep(1)
-        
-    except Exception as e:
-        # 打印详细的错误日志
-        print(f"监控连接错误 (run_id: {run_id}, port: {port}): {e}")
-        # 向前端发送明确的错误通知
-        main_socketio.emit('error', {'message': f'无法连接到运行实例 {run_id} 的监控服务。该实例可能已崩溃或启动失败。'}, room=sid)
-        
-    finally:
-        # 确保断开连接并清理订阅信息
-        if sio_client.connected:
-            sio_client.disconnect()
-        if sid in subscriptions:
-            del subscriptions[sid]
+    with relays_lock:
+        relay = _get_relay(run_id, port)
+        send_snapshot(relay.snapshot_for(subscriber))
+        subscriber.next_due = time.monotonic() + subscriber.interval
+        relay.subscribers[subscriber.sid] = subscriber
+
+
+def remove_subscriber(sid):
+    """移除订阅者，中继没有订阅者时关闭上游连接"""
+    run_id = subscriptions.pop(sid, None)
+    if run_id is None:
+        return None
+    leave_room(monitoring_room(run_id), sid=sid)
+    with relays_lock:
+        relay = relays.get(run_id)
+        if relay is not None:
+            relay.subscribers.pop(sid, None)
+            if not relay.subscribers:
+                relay.stop()
+                del relays[run_id]
+    return run_id
+
 
 def register_socketio_events(socketio_server):
     """注册Socket.IO事件"""
+    global DEFAULT_FPS, MAX_FPS, HISTORY_POINTS, HISTORY_ORDERS
+    from backend.api.runs import global_config
+    monitoring_config = global_config.get('monitoring', {})
+    DEFAULT_FPS = monitoring_config.get('relay_fps', DEFAULT_FPS)
+    MAX_FPS = monitoring_config.get('relay_max_fps', MAX_FPS)
+    HISTORY_POINTS = monitoring_config.get('history_points', HISTORY_POINTS)
+    HISTORY_ORDERS = monitoring_config.get('history_orders', HISTORY_ORDERS)
 
     @socketio_server.on('subscribe')
     def handle_subscribe(data):
-        """订阅某个运行实例的实时数据"""
+        """
+        订阅某个运行实例的实时数据
+        data: {run_id, fps: 每秒最多帧数, delta: 是否只发送变化字段, binary: 是否发送压缩的二进制帧}
+        """
         run_id = data.get('run_id')
         sid = request.sid  # Socket session ID
 
@@ -77,37 +283,22 @@ def register_socketio_events(socketio_server):
             return
 
         # 取消之前的订阅（如果有）
-        if sid in subscriptions:
-            old_sub = subscriptions[sid]
-            del subscriptions[sid]
-
-        # 创建新的监控线程
-        thread = threading.Thread(
-            target=fetch_and_emit,
-            args=(sid, port, run_id),
-            daemon=True
-        )
-        thread.start()
-
-        subscriptions[sid] = {
-            'run_id': run_id,
-            'port': port,
-            'thread': thread
-        }
+        if subscriptions.get(sid) != run_id:
+            remove_subscriber(sid)
 
+        join_room(monitoring_room(run_id))
+        subscriptions[sid] = run_id
         emit('subscribed', {'run_id': run_id})
+        add_subscriber(run_id, port, Subscriber(sid, data.get('fps'), data.get('delta'), data.get('binary')),
+                       lambda snapshot: emit('monitoring_snapshot', snapshot))
 
     @socketio_server.on('unsubscribe')
     def handle_unsubscribe():
         """取消订阅"""
-        sid = request.sid
-        if sid in subscriptions:
-            del subscriptions[sid]
+        if remove_subscriber(request.sid) is not None:
             emit('unsubscribed', {})
 
     @socketio_server.on('disconnect')
     def handle_disconnect():
         """客户端断开连接"""
-        sid = request.sid
-        if sid in subscriptions:
-            del subscriptions[sid]
+        remove_subscriber(request.sid)
@@ -0,0 +1,40 @@
+# myquant/backend/api/queue.py
+"""
+运行队列API - 查询排队位置、等待时间，取消排队中的运行
+运行通过 POST /strategies/<name>/runs 且 queue=true 加入队列
+"""
+
+from flask import Blueprint, jsonify
+from backend.api.auth import login_required
+from backend.api.runs import run_scheduler
+
+queue_bp = Blueprint('queue', __name__)
+
+
+@queue_bp.route('/queue', methods=['GET'])
+@login_required
+def get_queue():
+    """
+    获取运行队列状态
+    返回: {queued: [...], recent: [...], launching, active, max_concurrency, blocked_reason, avg_wait_time}
+    """
+    return jsonify(run_scheduler.snapshot())
+
+
+@queue_bp.route('/queue/<queue_id>', methods=['GET'])
+@login_required
+def get_queue_item(queue_id):
+    """获取单个队列条目，排队中的条目包含 position 和 wait_time"""
+    item = run_scheduler.get(queue_id)
+    if not item:
+        return jsonify({'error': '队列条目不存在'}), 404
+    return jsonify(item)
+
+
+@queue_bp.route('/queue/<queue_id>', methods=['DELETE'])
+@login_required
+def cancel_queue_item(queue_id):
+    """取消排队中的运行"""
+    if not run_scheduler.cancel(queue_id):
+        return jsonify({'error': '队列条目不存在或已开始启动'}), 400
+    return jsonify({'success': True, 'message': '已取消排队'})
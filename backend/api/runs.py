@@ -3,37 +3,75 @@
 运行管理API - 处理回测和模拟的启动、控制、查询
 """
 
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response
+from flask_socketio import emit, join_room, leave_room
 from pathlib import Path
-import subprocess
 import yaml
+import base64
 import json
+import os
 import time
 import signal
 import psutil
 import requests
 import shutil
 import socket
-import tempfile
-import csv
+import sqlite3
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import quote
 from backend.api.auth import login_required
+from backend.api.monitoring import create_history, register_history, drop_history
 from backend.extensions import socketio
+from backend.utils.runner_pool import RunnerPool, build_runner_args
+from backend.utils.runner_events import RunnerChannel
+from backend.utils.run_output import OUTPUT_LOG_NAME, OutputCapture, OutputHub, parse_log_line
+from backend.utils.run_telemetry import TELEMETRY_FILENAME, TelemetrySampler
+from backend.utils.run_scheduler import RunScheduler
+from backend.utils.run_registry import RunRegistry
+from backend.utils.process_supervisor import ProcessSupervisor
+from backend.utils.run_index import RunIndex, workspace_size
+from backend.utils.note_store import NoteStore
+from backend.utils.metrics import get_equity_metrics
+from backend.utils.columnar import COLUMNAR_DIRNAME, convert_workspace, needs_conversion
+from backend.utils.zip_stream import iter_zip
+from backend.utils.concurrency import run_cpu_bound
+from backend.utils.file_viewer import read_bytes, read_lines, tail_lines
 
 runs_bp = Blueprint('runs', __name__)
 
 # 策略根目录
 STRATEGIES_DIR = Path(__file__).parent.parent.parent / 'strategies'
 
-# 备注存储文件
+# 工作区内记录参数覆盖项的文件
+OVERRIDES_FILENAME = 'platform_overrides.json'
+
+# 分片运行合并工作区的清单文件
+SHARD_MANIFEST_FILENAME = 'shards.json'
+
+# 旧版备注文件（首次启动时导入 note_store）
 NOTES_FILE = Path(__file__).parent.parent.parent / 'data' / 'run_notes.json'
 
-# 运行实例管理（内存存储）
-# 格式: {run_id: {strategy, mode, pid, port, start_time, status, workspace_dir, is_paused, last_heartbeat}}
-active_runs = {}
+# 运行实例管理（内存缓存 + SQLite 持久化，后端重启后由 reattach_runs 重新接管）
+# 格式: {run_id: {strategy, mode, pid, pid_create_time, port, start_time, status, workspace_dir, is_paused, last_heartbeat}}
+# 修改已有记录的持久字段（如 is_paused）需使用 active_runs.update_run
+REGISTRY_DB = Path(__file__).parent.parent.parent / 'data' / 'myquant.db'
+active_runs = RunRegistry(REGISTRY_DB)
+
+# 运行器在工作区中写入的 pid 文件
+PIDFILE_NAME = 'runner.pid'
+
+# 历史运行摘要索引（list_runs 的缓存）
+run_index = RunIndex(REGISTRY_DB)
+
+# 运行备注（内存缓存 + SQLite 持久化）
+note_store = NoteStore(REGISTRY_DB, legacy_file=NOTES_FILE)
 
 # 端口管理
-# 从全局配置加载监控端口范围
+# 从全局配置加载端口分配方式和监控端口范围
 config_path = Path(__file__).resolve().parent.parent.parent / 'myquant_config.json'
 with open(config_path, 'r', encoding='utf-8') as f:
     global_config = json.load(f)
@@ -42,8 +80,71 @@ monitoring_config = global_config.get('monitoring', {})
 port_start = monitoring_config.get('port_range_start', 8051)
 port_end = monitoring_config.get('port_range_end', 8100)
 
-PORT_RANGE = range(port_start, port_end)  # 可用端口范围
+PORT_RANGE = range(port_start, port_end)  # 可用端口范围（port_assignment 为 range 时使用）
+# range（默认）：在 PORT_RANGE 中逐个探测可用端口，浏览器直连运行器的监控端口，部署时只需放行该范围；
+# os：运行器绑定 0 号端口，由操作系统分配空闲端口，实际端口通过启动握手上报
+PORT_ASSIGNMENT = monitoring_config.get('port_assignment', 'range')
 used_ports = set()
+port_lock = threading.Lock()  # 异步启动会并发分配端口
+
+# 运行结束后在后台把 CSV 产物转换为列式副本（见 backend/utils/columnar.py）
+artifacts_config = global_config.get('artifacts', {})
+COLUMNAR_ENABLED = artifacts_config.get('columnar', True)
+artifact_executor = ThreadPoolExecutor(
+    max_workers=artifacts_config.get('max_workers', 1),
+    thread_name_prefix='artifact-convert'
+)
+converting_workspaces = set()
+converting_lock = threading.Lock()
+
+# 运行器输出捕获：环形缓冲 + 工作区滚动日志 + Socket.IO 批量推送（订阅者加入 run_output:<run_id> 房间）
+output_config = global_config.get('runner_output', {})
+
+def emit_run_output(run_id, lines, dropped):
+    socketio.emit('run_output', {'run_id': run_id, 'lines': lines, 'dropped': dropped},
+                  room=f'run_output:{run_id}')
+
+output_hub = OutputHub(
+    emit_run_output,
+    flush_interval=output_config.get('flush_interval', 0.25),
+    max_batch_lines=output_config.get('max_batch_lines', 500)
+)
+
+def create_output_capture():
+    return OutputCapture(
+        ring_lines=output_config.get('ring_lines', 2000),
+        max_bytes=output_config.get('max_log_mb', 10) * 1024 * 1024,
+        backup_count=output_config.get('backup_count', 3),
+        max_pending_lines=output_config.get('max_pending_lines', 5000)
+    )
+
+# 运行的资源占用采样（CPU、内存、磁盘读写、线程和文件描述符）
+# 每轮采样推送 run_telemetry 事件（订阅者加入 run_telemetry:<run_id> 房间），
+# 所有运行的汇总推送 run_telemetry_overview 事件（run_telemetry 房间）
+telemetry_config = global_config.get('telemetry', {})
+TELEMETRY_ENABLED = telemetry_config.get('enabled', True)
+
+def emit_run_telemetry(samples):
+    for run_id, sample in samples.items():
+        socketio.emit('run_telemetry', {'run_id': run_id, 'sample': sample}, room=f'run_telemetry:{run_id}')
+    socketio.emit('run_telemetry_overview', {'samples': samples}, room='run_telemetry')
+
+telemetry_sampler = TelemetrySampler(
+    emit_run_telemetry,
+    interval=telemetry_config.get('interval', 2),
+    capacity=telemetry_config.get('history_points', 1000),
+    collect_uss=telemetry_config.get('collect_uss', True)
+)
+
+# 等待运行器握手报告就绪的最长时间（秒）
+RUNNER_READY_TIMEOUT = 20
+
+# 预热运行器进程池（由 app.py 在启动时调用 runner_pool.start()）
+pool_config = global_config.get('runner_pool', {})
+runner_pool = RunnerPool(
+    size=pool_config.get('size', 0),
+    preload_modules=pool_config.get('preload_modules')
+)
 
 def is_port_in_use(port: int) -> bool:
     """通过尝试绑定一个临时套接字来检查端口是否在系统级别被占用"""
@@ -58,12 +159,18 @@ def is_port_in_use(port: int) -> bool:
     return False
 
 def get_available_port():
-    """获取一个真正未被使用的端口"""
-    for port in PORT_RANGE:
-        # 双重检查：既不在我们的内存记录中，也不在系统级别被占用
-        if port not in used_ports and not is_port_in_use(port):
-            used_ports.add(port)
-            return port
+    """
+    获取一个真正未被使用的端口
+    由操作系统分配时返回 0，运行器就绪后以握手上报的实际端口为准
+    """
+    if PORT_ASSIGNMENT == 'os':
+        return 0
+    with port_lock:
+        for port in PORT_RANGE:
+            # 双重检查：既不在我们的内存记录中，也不在系统级别被占用
+            if port not in used_ports and not is_port_in_use(port):
+                used_ports.add(port)
+                return port
     raise RuntimeError("没有可用端口，请检查是否有僵尸进程占用了端口或增加端口范围")
 
 def release_port(port):
@@ -71,57 +178,34 @@ def release_port(port):
     if port in used_ports:
         used_ports.discard(port)
 
-def load_notes():
-    """加载所有备注"""
-    if not NOTES_FILE.exists():
-        NOTES_FILE.parent.mkdir(parents=True, exist_ok=True)
-        return {}
-    try:
-        with open(NOTES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"加载备注文件失败: {e}")
-        return {}
-
-def save_notes(notes):
-    """保存备注"""
-    try:
-        NOTES_FILE.parent.mkdir(parents=True, exist_ok=True)
-        with open(NOTES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(notes, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"保存备注文件失败: {e}")
-        return False
-
 def get_note(run_id):
     """获取单个run的备注"""
-    notes = load_notes()
-    return notes.get(run_id, '')
+    return note_store.get(run_id)
 
 def set_note(run_id, note):
     """设置单个run的备注"""
-    notes = load_notes()
-    notes[run_id] = note
-    return save_notes(notes)
+    try:
+        note_store.set(run_id, note)
+    except sqlite3.Error as e:
+        print(f"保存备注失败: {e}")
+        return False
+    run_index.set_note(run_id, note)
+    return True
 
 def delete_note(run_id):
     """删除单个run的备注"""
-    notes = load_notes()
-    if run_id in notes:
-        del notes[run_id]
-        return save_notes(notes)
-    return True
+    return set_note(run_id, '')
 
 def delete_notes_by_strategy(strategy_name):
     """删除某个策略的所有备注"""
-    notes = load_notes()
-    # 找出所有属于该策略的run_id（格式：strategy_name_mode_timestamp_time）
-    keys_to_delete = [run_id for run_id in notes.keys() if run_id.startswith(f"{strategy_name}_")]
-    for key in keys_to_delete:
-        del notes[key]
-    if keys_to_delete:
-        return save_notes(notes)
+    # run_id 格式：strategy_name_mode_timestamp_time，按模式限定前缀，避免误删名称以该策略名开头的其它策略
+    try:
+        for mode in ('backtest', 'simulation'):
+            note_store.delete_prefix(f"{strategy_name}_{mode}_")
+    except sqlite3.Error as e:
+        print(f"删除备注失败: {e}")
+        return False
+    run_index.delete_strategy(strategy_name)
     return True
 
 def is_process_running(pid):
@@ -132,16 +216,117 @@ def is_process_running(pid):
     except (psutil.NoSuchProcess, psutil.AccessDenied):
         return False
 
+def get_process_create_time(pid):
+    """进程创建时间，进程不存在时返回 None"""
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+def read_pidfile(workspace_dir):
+    """读取运行器写在工作区中的 pid 文件，返回 dict 或 None"""
+    try:
+        with open(Path(workspace_dir) / PIDFILE_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def reattach_runs():
+    """
+    后端启动时重新接管上次登记的运行
+    进程仍然存活（pid、创建时间与工作区 pid 文件都一致）的运行保留在 active_runs 中，
+    连同端口和暂停状态一起恢复；其余的记录被清除
+    """
+    for run_id, run_info in active_runs.items():
+        pid = run_info.get('pid')
+        pidfile = read_pidfile(run_info.get('workspace_dir', ''))
+        alive = (
+            pid and is_process_running(pid)
+            and run_info.get('pid_create_time') == get_process_create_time(pid)
+            and pidfile is not None and pidfile.get('pid') == pid
+        )
+        if not alive:
+            del active_runs[run_id]
+            print(f"[{run_info.get('strategy')}] 运行 {run_id} 已在后端停止期间结束。")
+            continue
+        if PORT_ASSIGNMENT == 'range' and run_info.get('port'):
+            with port_lock:
+                used_ports.add(run_info['port'])
+        process_supervisor.watch(run_id, pid)
+        if TELEMETRY_ENABLED:
+            telemetry_sampler.register(run_id, pid, run_info['workspace_dir'])
+        state = '暂停' if run_info.get('is_paused') else '运行'
+        print(f"[{run_info.get('strategy')}] 已重新接管{state}中的运行 {run_id} (pid: {pid}, 端口: {run_info.get('port')})")
+
+def handle_run_exit(run_id, pid, returncode):
+    """
+    进程监视器的回调：运行进程一退出就移出 active_runs、释放端口、更新摘要，
+    并推送 run_status_changed 和 dashboard_update，同时唤醒调度器放行排队的运行
+    """
+    run_info = active_runs.get(run_id)
+    # 已被其它路径清理（如空闲暂停实例），或同一 run_id 已由新进程恢复
+    if run_info is None or run_info.get('pid') != pid:
+        return
+    if active_runs.pop(run_id, None) is None:
+        return
+    release_port(run_info.get('port'))
+    telemetry_sampler.finish(run_id)
+    drop_history(run_id)
+    strategy_name = run_info.get('strategy')
+    workspace_dir = run_info.get('workspace_dir')
+    summary = update_run_summary(strategy_name, run_info.get('mode'), workspace_dir)
+    status = summary['status'] if summary else get_run_status_from_workspace(workspace_dir)
+    print(f"[{strategy_name}] 运行 {run_id} 已结束: {status} (退出码: {returncode})")
+    socketio.emit('run_status_changed', {
+        'run_id': run_id,
+        'status': status,
+        'is_paused': status == 'paused',
+        'returncode': returncode
+    })
+    socketio.emit('dashboard_update', {'strategy_name': strategy_name})
+    run_scheduler.notify()
+
+# 运行进程的退出监视（pidfd + epoll，见 process_supervisor）
+# 进程退出后立即回收，因此 active_runs 中的运行都是存活的，读取接口不再逐个探测进程
+process_supervisor = ProcessSupervisor(handle_run_exit)
+
+def count_live_runs():
+    """活动运行数（包括运行时暂停的实例）"""
+    return len(active_runs)
+
+def get_run_state(run_id):
+    """
+    获取运行的当前状态（不修改 active_runs）
+    返回: (status, workspace_dir)，找不到工作区时 workspace_dir 为 None
+    """
+    run_info = active_runs.get(run_id)
+    if run_info is not None:
+        status = 'paused' if run_info.get('is_paused') else 'running'
+        return status, Path(run_info['workspace_dir'])
+    workspace_dir = _get_historical_workspace_dir(run_id)
+    if not workspace_dir:
+        return None, None
+    return get_run_status_from_workspace(workspace_dir), workspace_dir
+
 def get_run_status_from_workspace(workspace_dir):
     """
     从工作区文件中推断运行状态
-    返回: finished, interrupted, paused, corrupted
+    返回: finished, interrupted, paused, corrupted（分片运行的合并工作区在合并前为 running）
     """
     workspace_path = Path(workspace_dir)
 
     if not workspace_path.exists():
         return 'corrupted'
 
+    # 分片运行的合并工作区，状态由清单记录
+    shard_manifest = workspace_path / SHARD_MANIFEST_FILENAME
+    if shard_manifest.exists():
+        try:
+            with open(shard_manifest, 'r', encoding='utf-8') as f:
+                return json.load(f).get('status', 'corrupted')
+        except Exception:
+            return 'corrupted'
+
     final_pkl = list(workspace_path.glob('*_final.pkl'))
     interrupt_pkl = list(workspace_path.glob('*_interrupt.pkl'))
     report_html = workspace_path / 'report.html'
@@ -164,27 +349,37 @@ def get_run_status_from_workspace(workspace_dir):
 
 def get_final_return(workspace_dir):
     """
-    从 equity.csv 读取最终收益率
+    从 equity.csv 读取最终收益率（来自带缓存的绩效指标）
     返回: float 或 None
     """
-    workspace_path = Path(workspace_dir)
-    equity_csv = workspace_path / 'equity.csv'
+    metrics = get_equity_metrics(workspace_dir)
+    return metrics['final_return'] if metrics else None
 
-    if not equity_csv.exists():
-        return None
+def get_run_start_time(workspace_dir):
+    """
+    运行的开始时间：优先由工作区目录名（YYYYMMDD_HHMMSS）得出，
+    目录名不符合该格式时退回目录的 ctime（目录内容变化后 ctime 会随之改变）
+    """
+    workspace_dir = Path(workspace_dir)
+    try:
+        return datetime.strptime(workspace_dir.name[:15], '%Y%m%d_%H%M%S').timestamp()
+    except ValueError:
+        return workspace_dir.stat().st_ctime
 
+def get_run_end_time(workspace_dir):
+    """
+    运行的结束时间：工作区根目录下文件的最晚修改时间（列式副本等子目录不计入）
+    返回: 时间戳或 None
+    """
+    latest = None
     try:
-        with open(equity_csv, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-            if rows and 'returns' in rows[-1]:
-                # 最后一行的 return 列
-                return float(rows[-1]['returns'])
-    except Exception as e:
-        print(f"Error reading equity.csv: {e}")
+        for entry in os.scandir(workspace_dir):
+            if entry.is_file():
+                mtime = entry.stat().st_mtime
+                latest = mtime if latest is None else max(latest, mtime)
+    except OSError:
         return None
-
-    return None
+    return latest
 
 def get_backtest_date_range(workspace_dir):
     """
@@ -232,111 +427,337 @@ def _get_historical_workspace_dir(run_id):
     
     return workspace_dir if workspace_dir.exists() else None
 
-@runs_bp.route('/strategies/<strategy_name>/runs', methods=['GET'])
-@login_required
-def list_runs(strategy_name):
+def _convert_artifacts(workspace_dir):
+    try:
+        run_cpu_bound(convert_workspace, workspace_dir)
+    except Exception as e:
+        print(f"转换列式副本出错 ({workspace_dir}): {e}")
+    finally:
+        with converting_lock:
+            converting_workspaces.discard(str(workspace_dir))
+
+
+def schedule_artifact_conversion(workspace_dir):
+    """在后台为已结束运行的工作区生成列式副本（同一工作区不会重复排队）"""
+    if not COLUMNAR_ENABLED or not needs_conversion(workspace_dir):
+        return
+    key = str(workspace_dir)
+    with converting_lock:
+        if key in converting_workspaces:
+            return
+        converting_workspaces.add(key)
+    artifact_executor.submit(_convert_artifacts, workspace_dir)
+
+
+def update_run_summary(strategy_name, mode, workspace_dir, note=None, dir_mtime_ns=None):
     """
-    列出策略的所有运行实例
-    返回: {backtest: [...], simulation: [...]}
+    重新生成一个工作区的摘要并写入索引，返回摘要
+    note 为 None 时从备注存储读取
     """
-    strategy_dir = STRATEGIES_DIR / strategy_name
-
-    if not strategy_dir.exists():
-        return jsonify({'error': f'策略 "{strategy_name}" 不存在'}), 404
+    workspace_dir = Path(workspace_dir)
+    run_id = f"{strategy_name}_{mode}_{workspace_dir.name}"
+    try:
+        stat = workspace_dir.stat()
+    except OSError:
+        run_index.delete([run_id])
+        return None
 
-    runs = {'backtest': [], 'simulation': []}
+    if note is None:
+        note = note_store.get(run_id)
+
+    status = get_run_status_from_workspace(workspace_dir)
+    if status in ('finished', 'interrupted'):
+        schedule_artifact_conversion(workspace_dir)
+    start_date, end_date = get_backtest_date_range(workspace_dir)
+    size_bytes, file_count = workspace_size(workspace_dir)
+    return run_index.upsert({
+        'run_id': run_id,
+        'strategy': strategy_name,
+        'mode': mode,
+        'workspace_dir': str(workspace_dir),
+        'dir_mtime_ns': dir_mtime_ns if dir_mtime_ns is not None else stat.st_mtime_ns,
+        'start_time': get_run_start_time(workspace_dir),
+        'end_time': get_run_end_time(workspace_dir) if status in ('finished', 'interrupted') else None,
+        'status': status,
+        'start_date': str(start_date) if start_date else None,
+        'end_date': str(end_date) if end_date else None,
+        'final_return': get_final_return(workspace_dir) if status in ('finished', 'interrupted') else None,
+        'note': note,
+        'size_bytes': size_bytes,
+        'file_count': file_count
+    })
+
+# list_runs 支持的排序字段
+RUN_SORT_FIELDS = ('start_time', 'final_return', 'duration')
+RUN_STATUSES = ('running', 'paused', 'finished', 'interrupted', 'corrupted')
+
+
+def collect_runs(strategy_name, modes=('backtest', 'simulation')):
+    """
+    扫描策略的工作区，返回所有运行的信息列表（按目录名倒序）
+    历史运行的摘要来自索引，只有目录发生变化（mtime 不同）的工作区才会重新读取
+    """
+    strategy_dir = STRATEGIES_DIR / strategy_name
+    runs = []
+    live_runs = active_runs.by_strategy(strategy_name)
+    now = time.time()
 
-    for mode in ['backtest', 'simulation']:
+    for mode in modes:
         # 根据qtrader的默认行为，工作区在 'strategy' 子目录下
         strategy_file_stem = (strategy_dir / 'strategy.py').stem
         mode_dir = strategy_dir / strategy_file_stem / mode
         if not mode_dir.exists():
             continue
 
+        summaries = run_index.list(strategy_name, mode)
+
         # 遍历所有运行实例目录
-        for run_dir in sorted(mode_dir.iterdir(), reverse=True):
-            if run_dir.is_dir() and not run_dir.name.startswith('.'):
-                # 生成run_id
-                run_id = f"{strategy_name}_{mode}_{run_dir.name}"
-
-                # 检查是否在active_runs中
-                if run_id in active_runs:
-                    run_info = active_runs[run_id]
-                    pid = run_info.get('pid')
-                    if pid and is_process_running(pid):
-                        # 进程活着，检查是否暂停
-                        if run_info.get('is_paused', False):
-                            status = 'paused'
-                        else:
-                            status = 'running'
-                    else:
-                        # 进程已停止，从active_runs移除
-                        del active_runs[run_id]
-                        release_port(run_info.get('port'))
-                        status = get_run_status_from_workspace(run_dir)
-                else:
-                    # 从工作区推断状态
-                    status = get_run_status_from_workspace(run_dir)
-
-                run_info = {
-                    'run_id': run_id,
-                    'workspace_dir': str(run_dir),
-                    'start_time': run_dir.stat().st_ctime,
-                    'status': status,
-                    'is_paused': status == 'paused',
-                    'is_running': run_id in active_runs,  # 标识是否在活动列表中（运行中或运行时暂停）
-                    'note': get_note(run_id)  # 添加备注字段
-                }
-
-                # 获取回测起止日期
-                start_date, end_date = get_backtest_date_range(run_dir)
-                if start_date and end_date:
-                    run_info['start_date'] = start_date
-                    run_info['end_date'] = end_date
-
-                # 如果是已完成状态，获取最终收益率
-                if status == 'finished' or status == 'interrupted':
-                    final_return = get_final_return(run_dir)
-                    if final_return is not None:
-                        run_info['final_return'] = final_return
-
-                runs[mode].append(run_info)
-
-    return jsonify({'runs': runs})
+        for entry in sorted(os.scandir(mode_dir), key=lambda e: e.name, reverse=True):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            # 生成run_id
+            run_id = f"{strategy_name}_{mode}_{entry.name}"
+            run_dir = Path(entry.path)
+
+            # 索引缺失或目录已变化时重新生成摘要
+            summary = summaries.pop(run_id, None)
+            mtime_ns = entry.stat().st_mtime_ns
+            if summary is None or summary['dir_mtime_ns'] != mtime_ns:
+                summary = update_run_summary(strategy_name, mode, run_dir, note_store.get(run_id), mtime_ns)
+                if summary is None:
+                    continue
+            status = summary['status']
+
+            # 在active_runs中的运行进程都存活（退出时由进程监视器移除），检查是否暂停
+            if run_id in live_runs:
+                status = 'paused' if live_runs[run_id].get('is_paused', False) else 'running'
+
+            # 运行时长：已结束的运行取结束时间，运行中的取当前时间
+            end_time = summary['end_time'] if status in ('finished', 'interrupted') else None
+            if status in ('running', 'paused') and run_id in active_runs:
+                end_time = now
+            run_info = {
+                'run_id': run_id,
+                'mode': mode,
+                'workspace_dir': str(run_dir),
+                'start_time': summary['start_time'],
+                'duration': end_time - summary['start_time'] if end_time and summary['start_time'] else None,
+                'status': status,
+                'is_paused': status == 'paused',
+                'is_running': run_id in active_runs,  # 标识是否在活动列表中（运行中或运行时暂停）
+                'note': summary['note'],
+                'size_bytes': summary['size_bytes'],
+                'file_count': summary['file_count']
+            }
 
-@runs_bp.route('/strategies/<strategy_name>/runs', methods=['POST'])
+            # 获取回测起止日期
+            if summary['start_date'] and summary['end_date']:
+                run_info['start_date'] = summary['start_date']
+                run_info['end_date'] = summary['end_date']
+
+            # 如果是已完成状态，获取最终收益率
+            if status in ('finished', 'interrupted') and summary['final_return'] is not None:
+                run_info['final_return'] = summary['final_return']
+
+            runs.append(run_info)
+
+        # 工作区已被删除的摘要
+        if summaries:
+            run_index.delete(summaries.keys())
+
+    return runs
+
+
+def _parse_date_arg(value, end_of_day=False):
+    """解析 YYYY-MM-DD 或 ISO 时间参数为时间戳"""
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return parsed.timestamp()
+
+
+def parse_run_filters(args):
+    """
+    解析 list_runs 的过滤参数
+    返回: 过滤函数 run_info -> bool；参数无效时抛出 ValueError
+    """
+    statuses = {value for value in args.get('status', '').split(',') if value}
+    if statuses - set(RUN_STATUSES):
+        raise ValueError(f"无效的状态: {', '.join(sorted(statuses - set(RUN_STATUSES)))}")
+    date_from = _parse_date_arg(args['date_from']) if args.get('date_from') else None
+    date_to = _parse_date_arg(args['date_to'], end_of_day=True) if args.get('date_to') else None
+    note_text = args.get('note', '').strip().lower()
+    min_return = float(args['min_return']) if args.get('min_return') else None
+    max_return = float(args['max_return']) if args.get('max_return') else None
+
+    def matches(run):
+        if statuses and run['status'] not in statuses:
+            return False
+        if date_from is not None and (run['start_time'] or 0) < date_from:
+            return False
+        if date_to is not None and (run['start_time'] or 0) > date_to:
+            return False
+        if note_text and note_text not in (run['note'] or '').lower():
+            return False
+        if min_return is not None or max_return is not None:
+            final_return = run.get('final_return')
+            if final_return is None:
+                return False
+            if min_return is not None and final_return < min_return:
+                return False
+            if max_return is not None and final_return > max_return:
+                return False
+        return True
+
+    return matches
+
+
+def run_sort_key(sort_field, descending):
+    """排序键：缺少排序值的运行始终排在最后，相同值按 run_id 排序保证翻页稳定"""
+    def key(run):
+        value = run.get(sort_field)
+        if value is None:
+            return (1, 0.0, run['run_id'])
+        return (0, -value if descending else value, run['run_id'])
+    return key
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    if not isinstance(key, list) or len(key) != 3:
+        raise ValueError('无效的游标')
+    return tuple(key)
+
+
+@runs_bp.route('/strategies/<strategy_name>/runs', methods=['GET'])
 @login_required
-def start_run(strategy_name):
+def list_runs(strategy_name):
     """
-    启动新的回测或模拟
-    请求体: {"mode": "backtest" | "simulation"}
+    列出策略的运行实例
+    查询参数（均可选）:
+        mode: backtest / simulation
+        status: 逗号分隔的状态列表，如 finished,interrupted
+        date_from / date_to: 运行开始时间范围（YYYY-MM-DD 或 ISO 时间）
+        note: 备注包含的文本（不区分大小写）
+        min_return / max_return: 最终收益率范围（没有最终收益率的运行会被排除）
+        sort: start_time（默认）/ final_return / duration；order: desc（默认）/ asc
+        limit: 每页数量，指定后分页返回；cursor: 上一页返回的 next_cursor
+    返回:
+        未指定 limit: {runs: {backtest: [...], simulation: [...]}}
+        指定 limit: {runs: [...], total, next_cursor}，next_cursor 为 null 表示没有下一页
     """
-    data = request.get_json()
-    mode = data.get('mode', 'backtest')
+    strategy_dir = STRATEGIES_DIR / strategy_name
+
+    if not strategy_dir.exists():
+        return jsonify({'error': f'策略 "{strategy_name}" 不存在'}), 404
 
+    mode = request.args.get('mode')
+    if mode and mode not in ('backtest', 'simulation'):
+        return jsonify({'error': '无效的模式'}), 400
+    sort_field = request.args.get('sort', 'start_time')
+    if sort_field not in RUN_SORT_FIELDS:
+        return jsonify({'error': f"sort 只支持: {', '.join(RUN_SORT_FIELDS)}"}), 400
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order 只支持 asc 或 desc'}), 400
+    try:
+        matches = parse_run_filters(request.args)
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'无效的查询参数: {e}'}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({'error': 'limit 必须为正整数'}), 400
+
+    runs = [run for run in collect_runs(strategy_name, (mode,) if mode else ('backtest', 'simulation'))
+            if matches(run)]
+    key = run_sort_key(sort_field, order == 'desc')
+    runs.sort(key=key)
+
+    if limit is None:
+        grouped = {'backtest': [], 'simulation': []}
+        for run in runs:
+            grouped[run['mode']].append(run)
+        return jsonify({'runs': grouped})
+
+    total = len(runs)
+    if cursor is not None:
+        runs = [run for run in runs if key(run) > cursor]
+    page = runs[:limit]
+    next_cursor = encode_cursor(key(page[-1])) if len(runs) > limit else None
+    return jsonify({'runs': page, 'total': total, 'next_cursor': next_cursor})
+
+class RunLaunchError(Exception):
+    """启动前的校验或准备失败，携带应返回给前端的HTTP状态码"""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# 同一策略同一模式的启动锁，以及最近一次启动完成时的秒级时间戳
+launch_locks = {}
+launch_locks_guard = threading.Lock()
+last_launch_second = {}
+
+# 运行器握手事件 -> 启动阶段名称
+RUNNER_EVENT_STAGES = {
+    'imported': 'imported',
+    'listening': 'server_ready',
+    'workspace_created': 'workspace_created',
+}
+
+
+def apply_config_overrides(config, overrides):
+    """
+    按点分路径覆盖配置项，例如 {"engine.start_date": "2023-06-01"}
+    """
+    for dotted_key, value in (overrides or {}).items():
+        keys = dotted_key.split('.')
+        node = config
+        for key in keys[:-1]:
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+            node = node[key]
+        node[keys[-1]] = value
+    return config
+
+
+def prepare_new_run(strategy_name, mode, config_overrides=None):
+    """
+    校验策略并生成带平台配置的临时配置文件
+    config_overrides 为点分路径的配置覆盖项（参数扫描等场景）
+    返回: (strategy_dir, temp_config_path, port)
+    """
     if mode not in ['backtest', 'simulation']:
-        return jsonify({'error': '无效的运行模式'}), 400
+        raise RunLaunchError('无效的运行模式', 400)
 
     strategy_dir = STRATEGIES_DIR / strategy_name
     if not strategy_dir.exists():
-        return jsonify({'error': f'策略 "{strategy_name}" 不存在'}), 404
+        raise RunLaunchError(f'策略 "{strategy_name}" 不存在', 404)
 
     # 读取原始配置
     config_path = strategy_dir / 'config.yaml'
     if not config_path.exists():
-        return jsonify({'error': '配置文件不存在'}), 404
+        raise RunLaunchError('配置文件不存在', 404)
 
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
     except Exception as e:
-        return jsonify({'error': f'配置文件解析失败: {str(e)}'}), 500
+        raise RunLaunchError(f'配置文件解析失败: {str(e)}', 500)
+
+    apply_config_overrides(config, config_overrides)
 
     # 分配端口
     try:
         port = get_available_port()
     except RuntimeError as e:
-        return jsonify({'error': str(e)}), 500
+        raise RunLaunchError(str(e), 500)
 
     # 修改配置
     if 'server' not in config:
@@ -352,80 +773,93 @@ def start_run(strategy_name):
         config['engine'] = {}
     config['engine']['mode'] = mode
 
-    # 创建临时配置文件
-    temp_config_path = strategy_dir / f'_temp_config_{int(time.time())}.yaml'
+    # 创建临时配置文件（并发启动时同一秒内可能有多个，追加随机后缀）
+    temp_config_path = strategy_dir / f'_temp_config_{int(time.time())}_{uuid.uuid4().hex[:6]}.yaml'
     with open(temp_config_path, 'w', encoding='utf-8') as f:
         yaml.dump(config, f, allow_unicode=True)
 
-    # 启动qtrader进程
-    strategy_file = strategy_dir / 'strategy.py'
-    data_provider_file = strategy_dir / 'data_provider.py'
+    return strategy_dir, temp_config_path, port
+
+
+def launch_runner(strategy_name, mode, runner_args, temp_config_path, port, run_id=None, is_paused=False,
+                  on_stage=None, overrides=None):
+    """
+    启动运行器进程，等待握手就绪后登记到 active_runs
+    run_id 为 None 时（全新运行）根据运行器报告的工作区生成
+    on_stage(stage, **payload) 在每个启动阶段被调用
+    overrides 不为空时写入工作区的 platform_overrides.json，供复现和恢复运行使用
+    返回: (run_id, run_info)；失败时清理进程、端口和临时配置后重新抛出异常
+    """
+    strategy_dir = STRATEGIES_DIR / strategy_name
 
-    # 使用platform_runner.py启动
-    runner_script = Path(__file__).parent.parent / 'utils' / 'platform_runner.py'
+    def report(stage, **payload):
+        if on_stage:
+            on_stage(stage, **payload)
 
-    cmd = [
-        'python', str(runner_script),
-        '--config', str(temp_config_path),
-        '--strategy', str(strategy_file),
-        '--data-provider', str(data_provider_file)
-    ]
+    def on_runner_event(event):
+        if event.get('event') == 'monitor':
+            history.record(event.get('data'))
+            return
+        stage = RUNNER_EVENT_STAGES.get(event.get('event'))
+        if stage:
+            report(stage, **{k: v for k, v in event.items() if k != 'event'})
 
     process = None
+    registered = False
     try:
-        # 启动子进程
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if hasattr(subprocess, 'CREATE_NEW_PROCESS_GROUP') else 0
-        )
+        # 启动子进程（优先使用预热进程池）
+        launch_started = time.time()
+        process, launch_mode = runner_pool.launch(runner_args)
+        report('spawned', pid=process.pid, launch_mode=launch_mode)
 
-        # 轮询HTTP端点，等待 qtrader 的内部服务器完全就绪
-        wait_time = 20
-        end_time = time.time() + wait_time
-        server_ready = False
-        import requests
+        # 等待运行器通过握手报告就绪（端口、工作区与pid），启动崩溃会被立即发现
+        output = create_output_capture()
+        history = create_history()
+        ready = RunnerChannel(process, on_event=on_runner_event, output=output).wait_ready(RUNNER_READY_TIMEOUT)
 
-        while time.time() < end_time:
-            try:
-                # 尝试向 qtrader 服务器的根URL发送一个真正的HTTP GET请求
-                response = requests.get(f"http://127.0.0.1:{port}/", timeout=0.5)
-                # 只有收到 200 OK 状态码，才代表服务完全准备就绪
-                if response.status_code == 200:
-                    server_ready = True
-                    break
-            except (requests.ConnectionError, requests.Timeout):
-                # 如果连接被拒绝或超时，说明服务还未就绪，短暂等待后重试
-                time.sleep(0.5)
-
-        if not server_ready:
-            raise RuntimeError(f"在 {wait_time} 秒内 qtrader 服务器未能启动或响应。")
-
-        # 服务器已就绪，现在可以安全地查找工作区目录了
-        strategy_file_stem = (strategy_dir / 'strategy.py').stem
-        mode_dir = strategy_dir / strategy_file_stem / mode
-        workspaces = sorted(mode_dir.glob('*'), key=lambda p: p.stat().st_ctime, reverse=True)
-        if not workspaces:
-            raise RuntimeError("qtrader 服务器已启动，但未找到对应的工作区目录。")
-        workspace_dir = workspaces[0]
+        ready_latency = time.time() - launch_started
+        runner_pool.record_latency(launch_mode, ready_latency)
+
+        # 工作区由运行器在进程内识别并报告，不再按创建时间猜测
+        workspace_dir = Path(ready['workspace_dir'])
 
         # 生成run_id
-        run_id = f"{strategy_name}_{mode}_{workspace_dir.name}"
+        if run_id is None:
+            run_id = f"{strategy_name}_{mode}_{workspace_dir.name}"
+
+        if overrides:
+            save_run_overrides(workspace_dir, overrides)
+
+        # 之后的输出写入工作区日志，并推送给订阅者
+        output.attach_workspace(workspace_dir)
+        output_hub.register(run_id, output)
 
-        # 记录运行信息
-        active_runs[run_id] = {
+        # 记录运行信息（进程创建时间用于重启后重新接管时排除 pid 复用）
+        pid = ready.get('pid', process.pid)
+        run_info = {
             'strategy': strategy_name,
             'mode': mode,
-            'pid': process.pid,
-            'port': port,
+            'pid': pid,
+            'pid_create_time': get_process_create_time(pid),
+            'port': ready.get('port', port),
             'start_time': time.time(),
             'status': 'running',
             'workspace_dir': str(workspace_dir),
             'temp_config': str(temp_config_path),
-            'is_paused': False,
-            'last_heartbeat': datetime.now()
+            'is_paused': is_paused,
+            'last_heartbeat': datetime.now(),
+            'launch_mode': launch_mode,
+            'ready_latency': ready_latency
         }
+        active_runs[run_id] = run_info
+        registered = True
+        # 运行器持续通过事件通道发送监控采样，从启动起记录完整的监控历史
+        register_history(run_id, history)
+
+        # 从此由进程监视器负责发现退出（已经退出的进程会立即回收，之后只使用 run_info，不再读取 active_runs）
+        if TELEMETRY_ENABLED:
+            telemetry_sampler.register(run_id, pid, workspace_dir)
+        process_supervisor.watch(run_id, pid, process)
 
         # 创建关联文件，用于在任何情况下都能找到并清理临时配置
         try:
@@ -435,19 +869,20 @@ def start_run(strategy_name):
         except Exception as e:
             print(f"警告: 未能创建临时配置的关联文件: {e}")
 
-        print(f"[{strategy_name}] 回测已启动，监控端口: {port}")
+        print(f"[{strategy_name}] {mode} 已启动，监控端口: {run_info['port']}，{launch_mode} 启动就绪耗时 {ready_latency:.2f}s")
 
         # 通知前端更新
         socketio.emit('dashboard_update', {'strategy_name': strategy_name})
+        report('ready', run_id=run_id, port=run_info['port'], ready_latency=ready_latency)
 
-        return jsonify({
-            'success': True,
-            'message': f'{mode} 启动成功',
-            'run_id': run_id,
-            'port': port
-        })
+        return run_id, run_info
 
     except Exception as e:
+        # 已登记后失败（如进程监视注册失败）时撤销登记，避免留下没有进程的运行
+        if registered:
+            active_runs.pop(run_id, None)
+            telemetry_sampler.finish(run_id)
+            drop_history(run_id)
         # 确保在启动失败时能终止已创建的子进程
         if process and process.poll() is None:
             try:
@@ -455,43 +890,287 @@ def start_run(strategy_name):
                 p.kill()  # 强制终止进程及其所有子进程
             except psutil.NoSuchProcess:
                 pass  # 进程可能已经自行退出
-        
+
         release_port(port)
         if temp_config_path.exists():
             temp_config_path.unlink()
+        report('failed', error=str(e))
+        raise
+
+
+@contextmanager
+def launch_slot(strategy_name, mode):
+    """
+    独占同一策略同一模式的启动时段。
+    qtrader 以秒级时间戳命名工作区（run_id 也由此生成），
+    同一策略同一模式的并发启动（以及平台自建的工作区）必须错开到不同的秒，否则会落入同一个工作区
+    yield 出的 release() 可在工作区创建后提前释放时段，不必等到运行器就绪
+    """
+    key = (strategy_name, mode)
+    with launch_locks_guard:
+        launch_lock = launch_locks.setdefault(key, threading.Lock())
+
+    released = threading.Event()
+    release_guard = threading.Lock()
+
+    def release():
+        # 可能由运行器握手线程和启动线程各调用一次
+        with release_guard:
+            if released.is_set():
+                return
+            released.set()
+            last_launch_second[key] = int(time.time())
+            launch_lock.release()
+
+    launch_lock.acquire()
+    try:
+        wait = last_launch_second.get(key, 0) + 1 - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        yield release
+    finally:
+        release()
+
+
+def launch_new_run(strategy_name, mode, on_stage=None, config_overrides=None, user_data=None, shard=None):
+    """
+    准备配置并启动一个全新的运行，返回: (run_id, run_info)
+    config_overrides 覆盖 config.yaml 中的配置项，user_data 覆盖策略的 context.user_data，
+    shard 指定分片运行只交易股票池中的一部分标的
+    """
+    with launch_slot(strategy_name, mode) as release_slot:
+        strategy_dir, temp_config_path, port = prepare_new_run(strategy_name, mode, config_overrides)
+
+        def report(stage, **payload):
+            # 工作区创建后下一次启动已不会落入同一个工作区，无需等待运行器就绪
+            if stage == 'workspace_created':
+                release_slot()
+            if on_stage:
+                on_stage(stage, **payload)
+
+        # 使用platform_runner.py启动
+        runner_args = build_runner_args(
+            config=temp_config_path,
+            strategy=strategy_dir / 'strategy.py',
+            data_provider=strategy_dir / 'data_provider.py',
+            user_data=user_data,
+            shard=shard
+        )
+        overrides = None
+        if config_overrides or user_data or shard:
+            overrides = {'config': config_overrides or {}, 'user_data': user_data or {}}
+            if shard:
+                overrides['shard'] = shard
+        return launch_runner(strategy_name, mode, runner_args, temp_config_path, port,
+                             on_stage=report, overrides=overrides)
+
+
+def save_run_overrides(workspace_dir, overrides):
+    """记录运行使用的参数覆盖项"""
+    try:
+        with open(Path(workspace_dir) / OVERRIDES_FILENAME, 'w', encoding='utf-8') as f:
+            json.dump(overrides, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"警告: 未能保存参数覆盖记录: {e}")
+
+
+def load_run_overrides(workspace_dir):
+    """读取运行使用的参数覆盖项，没有则返回空字典"""
+    overrides_path = Path(workspace_dir) / OVERRIDES_FILENAME
+    if not overrides_path.exists():
+        return {}
+    try:
+        with open(overrides_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+# 异步启动票据：{launch_id: {launch_id, strategy, mode, stage, stages, run_id, error, created_at}}
+launch_tickets = {}
+launch_tickets_lock = threading.Lock()  # 票据由多个启动线程并发更新和清理
+LAUNCH_TICKET_TTL = 3600  # 已结束票据的保留时间（秒）
+launch_executor = ThreadPoolExecutor(
+    max_workers=global_config.get('launcher', {}).get('max_workers', 8),
+    thread_name_prefix='run-launcher'
+)
+
+
+def submit_launch(strategy_name, mode, listener=None, config_overrides=None, user_data=None, shard=None):
+    """
+    提交一个后台启动任务并立即返回启动票据
+    每个启动阶段都会以 run_launch_progress 事件推送给前端，
+    并回调 listener(stage, **payload)（如调度器需要跟踪启动结果）
+    """
+    # 清理过期的已结束票据
+    now = time.time()
+    with launch_tickets_lock:
+        for old_id, old_ticket in list(launch_tickets.items()):
+            if old_ticket['stage'] in ('ready', 'failed') and now - old_ticket['created_at'] > LAUNCH_TICKET_TTL:
+                del launch_tickets[old_id]
+
+    launch_id = uuid.uuid4().hex
+    ticket = {
+        'launch_id': launch_id,
+        'strategy': strategy_name,
+        'mode': mode,
+        'stage': 'submitted',
+        'stages': [],
+        'run_id': None,
+        'error': None,
+        'created_at': time.time()
+    }
+    with launch_tickets_lock:
+        launch_tickets[launch_id] = ticket
+
+    def on_stage(stage, **payload):
+        with launch_tickets_lock:
+            ticket['stage'] = stage
+            ticket['stages'].append({'stage': stage, 'time': time.time()})
+            if stage == 'ready':
+                ticket['run_id'] = payload.get('run_id')
+            elif stage == 'failed':
+                ticket['error'] = payload.get('error')
+        socketio.emit('run_launch_progress', {
+            'launch_id': launch_id,
+            'strategy_name': strategy_name,
+            'mode': mode,
+            'stage': stage,
+            **payload
+        })
+        if listener:
+            listener(stage, **payload)
+
+    def run_launch():
+        try:
+            launch_new_run(strategy_name, mode, on_stage=on_stage,
+                           config_overrides=config_overrides, user_data=user_data, shard=shard)
+        except RunLaunchError as e:
+            # 准备阶段的失败不会经过 launch_runner，需要单独上报
+            on_stage('failed', error=str(e))
+        except Exception as e:
+            print(f"[{strategy_name}] 异步启动失败: {e}")
+
+    launch_executor.submit(run_launch)
+    return ticket
+
+
+def find_launched_run(item):
+    """
+    调度器恢复启动中的条目时调用：运行器已报告创建工作区的，返回对应的 run_id
+    优先匹配重新接管的运行；工作区存在但不在登记表中（如运行已在后端停止期间结束）时按工作区生成 run_id
+    """
+    workspace_dir = item.get('workspace_dir')
+    if not workspace_dir:
+        return None
+    for run_id, run_info in list(active_runs.items()):
+        if run_info.get('workspace_dir') and Path(run_info['workspace_dir']) == Path(workspace_dir):
+            return run_id
+    if Path(workspace_dir).is_dir():
+        return f"{item['strategy']}_{item['mode']}_{Path(workspace_dir).name}"
+    return None
+
+
+# 运行队列与调度器（由 app.py 在 reattach_runs 之后调用 run_scheduler.start()）
+QUEUE_FILE = Path(__file__).parent.parent.parent / 'data' / 'run_queue.json'
+scheduler_config = global_config.get('scheduler', {})
+run_scheduler = RunScheduler(
+    QUEUE_FILE,
+    submit_fn=submit_launch,
+    count_active=lambda: count_live_runs(),
+    max_concurrency=scheduler_config.get('max_concurrency'),
+    cores_per_run=scheduler_config.get('cores_per_run', 1),
+    memory_per_run_mb=scheduler_config.get('memory_per_run_mb', 512),
+    min_free_memory_mb=scheduler_config.get('min_free_memory_mb', 1024),
+    poll_interval=scheduler_config.get('poll_interval', 2),
+    on_change=lambda: socketio.emit('run_queue_update', {}),
+    find_launched=find_launched_run
+)
+
+
+@runs_bp.route('/strategies/<strategy_name>/runs', methods=['POST'])
+@login_required
+def start_run(strategy_name):
+    """
+    启动新的回测或模拟
+    请求体: {"mode": "backtest" | "simulation", "async": false, "queue": false, "priority": 0}
+    async 为 true 时立即返回启动票据，启动进度通过 run_launch_progress 事件推送
+    queue 为 true 时进入运行队列，由调度器在资源允许时启动
+    """
+    data = request.get_json() or {}
+    mode = data.get('mode', 'backtest')
+
+    if mode not in ['backtest', 'simulation']:
+        return jsonify({'error': '无效的运行模式'}), 400
+
+    if not (STRATEGIES_DIR / strategy_name).exists():
+        return jsonify({'error': f'策略 "{strategy_name}" 不存在'}), 404
+
+    if data.get('queue'):
+        item = run_scheduler.submit(strategy_name, mode, priority=data.get('priority', 0))
+        return jsonify({
+            'success': True,
+            'message': f'{mode} 已加入运行队列',
+            'queue_id': item['queue_id'],
+            'position': run_scheduler.get(item['queue_id']).get('position')
+        }), 202
+
+    if data.get('async'):
+        ticket = submit_launch(strategy_name, mode)
+        return jsonify({
+            'success': True,
+            'message': f'{mode} 已提交启动',
+            'launch_id': ticket['launch_id']
+        }), 202
+
+    try:
+        run_id, run_info = launch_new_run(strategy_name, mode)
+    except RunLaunchError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
         return jsonify({'error': f'启动失败: {str(e)}'}), 500
 
+    return jsonify({
+        'success': True,
+        'message': f'{mode} 启动成功',
+        'run_id': run_id,
+        'port': run_info['port'],
+        'launch_mode': run_info['launch_mode'],
+        'ready_latency': run_info['ready_latency']
+    })
 
-@runs_bp.route('/runs/<run_id>/status', methods=['GET'])
+
+@runs_bp.route('/launches/<launch_id>', methods=['GET'])
 @login_required
-def get_run_status(run_id):
-    """获取运行实例的状态"""
-    if run_id in active_runs:
-        run_info = active_runs[run_id]
-        pid = run_info.get('pid')
+def get_launch(launch_id):
+    """查询异步启动票据的当前阶段"""
+    with launch_tickets_lock:
+        ticket = launch_tickets.get(launch_id)
+        ticket = dict(ticket, stages=list(ticket['stages'])) if ticket else None
+    if not ticket:
+        return jsonify({'error': '启动票据不存在'}), 404
+    return jsonify(ticket)
 
-        if pid and is_process_running(pid):
-            return jsonify({
-                'status': 'running',
-                'port': run_info.get('port'),
-                'workspace_dir': run_info.get('workspace_dir')
-            })
-        else:
-            # 进程已停止，从工作区推断状态
-            workspace_dir = run_info.get('workspace_dir')
-            status = get_run_status_from_workspace(workspace_dir)
 
-            # 清理active_runs
-            print(f"[{run_info.get('strategy')}] 回测已结束。")
+@runs_bp.route('/runner-pool', methods=['GET'])
+@login_required
+def get_runner_pool_stats():
+    """获取预热进程池状态及启动就绪耗时统计"""
+    return jsonify(runner_pool.get_stats())
 
-            socketio.emit('dashboard_update', {'strategy_name': run_info.get('strategy')})
-            del active_runs[run_id]
-            release_port(run_info.get('port'))
 
-            return jsonify({
-                'status': status,
-                'workspace_dir': workspace_dir
-            })
+@runs_bp.route('/runs/<run_id>/status', methods=['GET'])
+@login_required
+def get_run_status(run_id):
+    """获取运行实例的状态"""
+    run_info = active_runs.get(run_id)
+    if run_info is not None:
+        # 进程退出时由进程监视器移出 active_runs，这里的运行都是存活的
+        return jsonify({
+            'status': 'running',
+            'port': run_info.get('port'),
+            'workspace_dir': run_info.get('workspace_dir')
+        })
     else:
         workspace_dir = _get_historical_workspace_dir(run_id)
         if not workspace_dir or not workspace_dir.exists():
@@ -533,13 +1212,13 @@ def control_run(run_id):
 
         # 更新状态
         if action == 'pause':
-            active_runs[run_id]['is_paused'] = True
+            active_runs.update_run(run_id, is_paused=True)
             socketio.emit('run_status_changed', {
                 'run_id': run_id,
                 'is_paused': True
             })
         elif action == 'resume':
-            active_runs[run_id]['is_paused'] = False
+            active_runs.update_run(run_id, is_paused=False)
             socketio.emit('run_status_changed', {
                 'run_id': run_id,
                 'is_paused': False
@@ -631,98 +1310,56 @@ def resume_run(run_id):
         yaml.dump(config, f, allow_unicode=True)
 
     # 使用platform_runner.py启动恢复
-    runner_script = Path(__file__).parent.parent / 'utils' / 'platform_runner.py'
-    data_provider_file = strategy_dir / 'data_provider.py'
+    # 如果指定以暂停模式启动，会附加 --start-paused 参数；
+    # 参数扫描产生的 user_data 和分片运行的 shard 覆盖项需要重新下发，否则恢复后的分片会交易整个股票池
+    overrides = load_run_overrides(workspace_dir)
+    runner_args = build_runner_args(
+        config=temp_config_path,
+        resume_from=pause_pkl_path,
+        data_provider=strategy_dir / 'data_provider.py',
+        start_paused=start_paused,
+        user_data=overrides.get('user_data'),
+        shard=overrides.get('shard')
+    )
 
-    cmd = [
-        'python', str(runner_script),
-        '--config', str(temp_config_path),
-        '--resume-from', str(pause_pkl_path),
-        '--data-provider', str(data_provider_file)
-    ]
-
-    # 如果指定以暂停模式启动，添加参数
-    if start_paused:
-        cmd.append('--start-paused')
-
-    process = None
     try:
-        # 启动子进程
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if hasattr(subprocess, 'CREATE_NEW_PROCESS_GROUP') else 0
+        run_id, run_info = launch_runner(
+            strategy_name, mode, runner_args, temp_config_path, port,
+            run_id=run_id, is_paused=start_paused, overrides=overrides
         )
+    except Exception as e:
+        return jsonify({'error': f'恢复失败: {str(e)}'}), 500
 
-        # 等待服务器启动
-        wait_time = 20
-        end_time = time.time() + wait_time
-        server_ready = False
-
-        while time.time() < end_time:
-            try:
-                response = requests.get(f"http://127.0.0.1:{port}/", timeout=0.5)
-                if response.status_code == 200:
-                    server_ready = True
-                    break
-            except (requests.ConnectionError, requests.Timeout):
-                time.sleep(0.5)
-
-        if not server_ready:
-            process.kill()
-            release_port(port)
-            if temp_config_path.exists():
-                temp_config_path.unlink()
-            raise RuntimeError(f"在 {wait_time} 秒内 qtrader 服务器未能启动或响应。")
-
-        # 记录运行信息
-        active_runs[run_id] = {
-            'strategy': strategy_name,
-            'mode': mode,
-            'pid': process.pid,
-            'port': port,
-            'start_time': time.time(),
-            'status': 'running',
-            'workspace_dir': str(workspace_dir),
-            'temp_config': str(temp_config_path),
-            'is_paused': start_paused,
-            'last_heartbeat': datetime.now()
-        }
-
-        # 创建关联文件，用于在任何情况下都能找到并清理临时配置
-        try:
-            link_file_path = strategy_dir / f".{run_id}.link"
-            with open(link_file_path, 'w', encoding='utf-8') as f:
-                f.write(temp_config_path.name)
-        except Exception as e:
-            print(f"警告: 未能创建临时配置的关联文件: {e}")
-
-        print(f"[{strategy_name}] 从暂停状态恢复运行，监控端口: {port}")
+    return jsonify({
+        'success': True,
+        'message': '从暂停状态恢复成功',
+        'run_id': run_id,
+        'port': run_info['port'],
+        'launch_mode': run_info['launch_mode'],
+        'ready_latency': run_info['ready_latency']
+    })
 
-        # 通知前端更新
-        socketio.emit('dashboard_update', {'strategy_name': strategy_name})
+@runs_bp.route('/runs/<run_id>/metrics', methods=['GET'])
+@login_required
+def get_run_metrics(run_id):
+    """
+    获取运行的绩效指标
+    查询参数: risk_free_rate（年化无风险利率，默认 0）
+    """
+    try:
+        risk_free_rate = float(request.args.get('risk_free_rate', 0))
+    except ValueError:
+        return jsonify({'error': '无效的 risk_free_rate'}), 400
 
-        return jsonify({
-            'success': True,
-            'message': '从暂停状态恢复成功',
-            'run_id': run_id,
-            'port': port
-        })
+    status, workspace_dir = get_run_state(run_id)
+    if not workspace_dir:
+        return jsonify({'error': '运行实例不存在'}), 404
 
-    except Exception as e:
-        # 确保在恢复失败时能终止已创建的子进程
-        if process and process.poll() is None:
-            try:
-                p = psutil.Process(process.pid)
-                p.kill()  # 强制终止进程及其所有子进程
-            except psutil.NoSuchProcess:
-                pass  # 进程可能已经自行退出
+    metrics = get_equity_metrics(workspace_dir, risk_free_rate=risk_free_rate)
+    if metrics is None:
+        return jsonify({'error': '未找到资金曲线 equity.csv'}), 404
 
-        release_port(port)
-        if temp_config_path.exists():
-            temp_config_path.unlink()
-        return jsonify({'error': f'恢复失败: {str(e)}'}), 500
+    return jsonify({'run_id': run_id, 'status': status, 'metrics': metrics})
 
 @runs_bp.route('/runs/<run_id>/report', methods=['GET'])
 @login_required
@@ -742,10 +1379,22 @@ def get_report(run_id):
 
     return send_file(report_path, mimetype='text/html')
 
+def resolve_workspace_path(workspace_dir, relative_path):
+    """把相对路径解析为工作区内的绝对路径，越出工作区（如包含 ..）时返回 None"""
+    root = Path(workspace_dir).resolve()
+    path = (root / relative_path).resolve()
+    if path != root and root not in path.parents:
+        return None
+    return path
+
 @runs_bp.route('/runs/<run_id>/files', methods=['GET'])
 @login_required
 def list_run_files(run_id):
-    """列出运行实例的所有文件"""
+    """
+    逐层列出运行实例的文件
+    查询参数: path 为要列出的子目录（相对工作区，默认根目录）
+    返回: {path, dirs: [{name, relative_path, mtime}], files: [{name, relative_path, size, mtime}]}
+    """
     if run_id in active_runs:
         workspace_dir = Path(active_runs[run_id]['workspace_dir'])
     else:
@@ -756,21 +1405,37 @@ def list_run_files(run_id):
     if not workspace_dir.exists():
         return jsonify({'error': '工作区不存在'}), 404
 
+    relative = request.args.get('path', '').strip('/')
+    directory = resolve_workspace_path(workspace_dir, relative)
+    if directory is None:
+        return jsonify({'error': '非法文件路径'}), 403
+    if not directory.is_dir():
+        return jsonify({'error': '目录不存在'}), 404
+
+    dirs = []
     files = []
-    for file_path in workspace_dir.rglob('*'):
-        if file_path.is_file():
-            files.append({
-                'name': file_path.name,
-                'relative_path': str(file_path.relative_to(workspace_dir)),
-                'size': file_path.stat().st_size
-            })
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        item = {
+            'name': entry.name,
+            'relative_path': f'{relative}/{entry.name}' if relative else entry.name,
+            'mtime': stat.st_mtime
+        }
+        if entry.is_dir():
+            dirs.append(item)
+        else:
+            item['size'] = stat.st_size
+            files.append(item)
 
-    return jsonify({'files': files})
+    return jsonify({'path': relative, 'dirs': dirs, 'files': files})
 
 @runs_bp.route('/runs/<run_id>/download/<path:filepath>', methods=['GET'])
 @login_required
 def download_file(run_id, filepath):
-    """下载运行实例的文件"""
+    """下载运行实例的文件（支持 HTTP Range 请求）"""
     if run_id in active_runs:
         workspace_dir = Path(active_runs[run_id]['workspace_dir'])
     else:
@@ -778,18 +1443,74 @@ def download_file(run_id, filepath):
         if not workspace_dir:
             return jsonify({'error': '无效的run_id或找不到工作区'}), 400
 
-    file_path = workspace_dir / filepath
+    # 安全检查：确保文件在工作区内
+    file_path = resolve_workspace_path(workspace_dir, filepath)
+    if file_path is None:
+        return jsonify({'error': '非法文件路径'}), 403
 
     if not file_path.exists() or not file_path.is_file():
         return jsonify({'error': '文件不存在'}), 404
 
-    # 安全检查：确保文件在工作区内
+    return send_file(file_path, as_attachment=True, conditional=True)
+
+# 查看器单次返回的上限
+MAX_VIEW_LINES = 5000
+MAX_VIEW_BYTES = 4 * 1024 * 1024
+
+@runs_bp.route('/runs/<run_id>/view/<path:filepath>', methods=['GET'])
+@login_required
+def view_file(run_id, filepath):
+    """
+    分段查看运行实例的文本文件（日志、CSV 等），不传输整个文件
+    查询参数:
+        mode=lines（默认）: offset 起始行号（从 0 开始），limit 行数 -> {lines, offset, total_lines, next_offset}
+        mode=tail: lines 末尾行数 -> {lines, size, truncated}（truncated 表示向前扫描达到字节上限，行数可能不足）
+        mode=bytes: start 起始字节，length 字节数 -> {content, start, end, size}
+    单次最多返回 MAX_VIEW_LINES 行或 MAX_VIEW_BYTES 字节
+    """
+    if run_id in active_runs:
+        workspace_dir = Path(active_runs[run_id]['workspace_dir'])
+    else:
+        workspace_dir = _get_historical_workspace_dir(run_id)
+        if not workspace_dir:
+            return jsonify({'error': '无效的run_id或找不到工作区'}), 400
+
+    file_path = resolve_workspace_path(workspace_dir, filepath)
+    if file_path is None:
+        return jsonify({'error': '非法文件路径'}), 403
+    if not file_path.is_file():
+        return jsonify({'error': '文件不存在'}), 404
+
+    mode = request.args.get('mode', 'lines')
     try:
-        file_path.relative_to(workspace_dir)
+        if mode == 'lines':
+            offset = int(request.args.get('offset', 0))
+            limit = min(int(request.args.get('limit', 200)), MAX_VIEW_LINES)
+            result = read_lines(file_path, offset, max(limit, 0))
+        elif mode == 'tail':
+            count = min(int(request.args.get('lines', 200)), MAX_VIEW_LINES)
+            lines, size, truncated = tail_lines(file_path, max(count, 0))
+            result = {'lines': lines, 'size': size, 'truncated': truncated}
+        elif mode == 'bytes':
+            start = int(request.args.get('start', 0))
+            length = min(int(request.args.get('length', 64 * 1024)), MAX_VIEW_BYTES)
+            data, size = read_bytes(file_path, start, length)
+            start = max(0, min(start, size))
+            result = {
+                'content': data.decode('utf-8', errors='replace'),
+                'start': start,
+                'end': start + len(data),
+                'size': size
+            }
+        else:
+            return jsonify({'error': 'mode 只支持 lines、tail 或 bytes'}), 400
     except ValueError:
-        return jsonify({'error': '非法文件路径'}), 403
+        return jsonify({'error': '无效的查询参数'}), 400
+    except OSError as e:
+        return jsonify({'error': f'读取文件失败: {e}'}), 500
 
-    return send_file(file_path, as_attachment=True)
+    result['path'] = filepath
+    return jsonify(result)
 
 @runs_bp.route('/runs/<run_id>/final_status', methods=['GET'])
 @login_required
@@ -828,7 +1549,7 @@ def get_final_status(run_id):
 @login_required
 def download_workspace(run_id):
     """
-    打包并下载整个workspace目录
+    打包并下载整个workspace目录（流式生成ZIP）
     """
     if run_id in active_runs:
         workspace_dir = Path(active_runs[run_id]['workspace_dir'])
@@ -840,28 +1561,17 @@ def download_workspace(run_id):
     if not workspace_dir.exists():
         return jsonify({'error': '工作区不存在'}), 404
 
-    try:
-        # 创建临时目录用于存放zip文件
-        temp_dir = tempfile.mkdtemp()
-        zip_path = Path(temp_dir) / f'{run_id}_workspace'
-
-        # 打包整个workspace目录
-        archive_path = shutil.make_archive(
-            str(zip_path),
-            'zip',
-            workspace_dir.parent,
-            workspace_dir.name
-        )
-
-        # 发送文件后自动清理临时文件
-        return send_file(
-            archive_path,
-            as_attachment=True,
-            download_name=f'{run_id}_workspace.zip',
-            mimetype='application/zip'
-        )
-    except Exception as e:
-        return jsonify({'error': f'打包失败: {str(e)}'}), 500
+    # 边压缩边发送（分块传输），不生成临时文件；列式副本可由 CSV 重新生成，不打包
+    download_name = f'{run_id}_workspace.zip'
+    ascii_name = download_name.encode('ascii', 'ignore').decode('ascii') or 'workspace.zip'
+    return Response(
+        (chunk for chunk in iter_zip(workspace_dir, exclude_dirs={COLUMNAR_DIRNAME}) if chunk),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(download_name)}",
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 @runs_bp.route('/runs/<run_id>/delete', methods=['DELETE'])
 @login_required
@@ -903,8 +1613,9 @@ def delete_workspace(run_id):
         if workspace_dir and workspace_dir.exists():
             shutil.rmtree(workspace_dir)
 
-        # 删除对应的备注
+        # 删除对应的备注和摘要
         delete_note(run_id)
+        run_index.delete([run_id])
 
         return jsonify({
             'success': True,
@@ -940,7 +1651,118 @@ def update_note(run_id):
         return jsonify({'error': '备注保存失败'}), 500
 
 
+@runs_bp.route('/runs/<run_id>/output', methods=['GET'])
+@login_required
+def get_run_output(run_id):
+    """
+    获取运行器最近的输出
+    查询参数: after_seq 只返回序号大于该值的行（用于补齐推送中丢弃的部分），limit 最多返回的行数
+    活动运行返回内存环形缓冲区（live 为 true）；运行结束或后端重启后返回工作区 runner_output.log 的末尾
+    （live 为 false，行没有序号，after_seq 不起作用）
+    """
+    try:
+        after_seq = int(request.args.get('after_seq', 0))
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({'error': '无效的查询参数'}), 400
+
+    capture = output_hub.get(run_id)
+    if capture is not None:
+        return jsonify({'run_id': run_id, 'lines': capture.tail(after_seq, limit), 'log_file': OUTPUT_LOG_NAME,
+                        'live': True})
+
+    _, workspace_dir = get_run_state(run_id)
+    log_path = workspace_dir / OUTPUT_LOG_NAME if workspace_dir else None
+    if log_path is None or not log_path.exists():
+        return jsonify({'error': '该运行没有可用的输出', 'log_file': OUTPUT_LOG_NAME}), 404
+    try:
+        lines, _, truncated = tail_lines(log_path, limit or output_config.get('ring_lines', 2000))
+    except OSError as e:
+        return jsonify({'error': f'读取运行输出日志失败: {e}'}), 500
+    return jsonify({'run_id': run_id, 'lines': [parse_log_line(line) for line in lines], 'log_file': OUTPUT_LOG_NAME,
+                    'live': False, 'truncated': truncated})
+
+
+@runs_bp.route('/runs/<run_id>/telemetry', methods=['GET'])
+@login_required
+def get_run_telemetry(run_id):
+    """
+    获取运行的资源占用记录
+    活动运行返回实时采样缓冲，已结束的运行返回工作区中保存的 resource_usage.json
+    """
+    telemetry = telemetry_sampler.get(run_id)
+    if telemetry is not None:
+        return jsonify(dict(telemetry.export(), interval=telemetry_sampler.interval, active=True))
+
+    _, workspace_dir = get_run_state(run_id)
+    telemetry_path = workspace_dir / TELEMETRY_FILENAME if workspace_dir else None
+    if telemetry_path is None or not telemetry_path.exists():
+        return jsonify({'error': '该运行没有资源占用记录'}), 404
+    try:
+        with open(telemetry_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'读取资源占用记录失败: {e}'}), 500
+    return jsonify(dict(data, active=False))
+
+
+@runs_bp.route('/telemetry', methods=['GET'])
+@login_required
+def get_telemetry_overview():
+    """所有活动运行的最新资源占用、峰值和合计，以及主机的 CPU 核数和内存"""
+    overview = telemetry_sampler.overview()
+    memory = psutil.virtual_memory()
+    overview['host'] = {
+        'cpu_count': psutil.cpu_count(),
+        'memory_total': memory.total,
+        'memory_available': memory.available
+    }
+    return jsonify(overview)
+
+
 # Socket.IO 事件处理器
+@socketio.on('subscribe_output')
+def handle_subscribe_output(data):
+    """订阅运行器输出：先补发环形缓冲区中的内容，之后按批推送 run_output 事件"""
+    run_id = (data or {}).get('run_id')
+    if not run_id:
+        emit('error', {'message': '缺少run_id'})
+        return
+    join_room(f'run_output:{run_id}')
+    capture = output_hub.get(run_id)
+    lines = capture.tail(int(data.get('after_seq') or 0)) if capture else []
+    emit('run_output', {'run_id': run_id, 'lines': lines, 'dropped': 0, 'backlog': True})
+
+
+@socketio.on('unsubscribe_output')
+def handle_unsubscribe_output(data):
+    run_id = (data or {}).get('run_id')
+    if run_id:
+        leave_room(f'run_output:{run_id}')
+
+
+@socketio.on('subscribe_telemetry')
+def handle_subscribe_telemetry(data):
+    """
+    订阅资源采样：指定 run_id 时接收该运行的 run_telemetry 事件（先补发一次当前缓冲），
+    不指定时接收所有运行的 run_telemetry_overview 事件
+    """
+    run_id = (data or {}).get('run_id')
+    if not run_id:
+        join_room('run_telemetry')
+        return
+    join_room(f'run_telemetry:{run_id}')
+    telemetry = telemetry_sampler.get(run_id)
+    if telemetry is not None:
+        emit('run_telemetry', {'run_id': run_id, 'history': telemetry.export(), 'backlog': True})
+
+
+@socketio.on('unsubscribe_telemetry')
+def handle_unsubscribe_telemetry(data):
+    run_id = (data or {}).get('run_id')
+    leave_room(f'run_telemetry:{run_id}' if run_id else 'run_telemetry')
+
+
 @socketio.on('run_heartbeat')
 def handle_run_heartbeat(data):
     """接收前端发送的心跳，更新最后活跃时间"""
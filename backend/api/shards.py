@@ -0,0 +1,256 @@
+# myquant/backend/api/shards.py
+"""
+分片运行API - 把大股票池的回测拆分为多个并行的运行器进程
+
+适用于对每个标的独立交易的策略（股票池放在 context.user_data['symbols']）：
+1. 平台先建立一个合并工作区（与普通运行一样出现在运行列表中），写入 shards.json 清单
+2. 每个分片通过运行队列启动，只交易股票池中属于它的标的，并按比例分得 account.initial_cash
+3. 所有分片结束后，把各分片的 equity.csv、成交等输出合并到合并工作区，并生成报告
+编排由后台线程推进，清单保存在合并工作区中，后端重启后会继续。
+"""
+
+from flask import Blueprint, request, jsonify
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import yaml
+from backend.api.auth import login_required
+from backend.extensions import socketio
+from backend.api.runs import (
+    STRATEGIES_DIR, SHARD_MANIFEST_FILENAME, global_config, run_scheduler, launch_slot,
+    get_run_state, get_final_return, _get_historical_workspace_dir
+)
+from backend.utils.shard_merge import merge_shards
+
+shards_bp = Blueprint('shards', __name__)
+
+MAX_SHARDS = global_config.get('sharding', {}).get('max_shards', 64)
+
+# 编排线程检查分片进度的间隔（秒）
+POLL_INTERVAL = 5
+
+# 正在编排的分片运行：{run_id: thread}
+orchestrators = {}
+orchestrators_lock = threading.Lock()
+
+
+def load_manifest(workspace_dir):
+    manifest_path = workspace_dir / SHARD_MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(workspace_dir, manifest):
+    """原子写入分片清单"""
+    manifest_path = workspace_dir / SHARD_MANIFEST_FILENAME
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def create_merged_workspace(strategy_name, mode, config):
+    """
+    创建合并工作区，命名方式与 qtrader 的工作区相同，使其拥有正常的 run_id
+    与分片的启动共用启动时段，保证不会和分片落入同一秒
+    """
+    mode_dir = STRATEGIES_DIR / strategy_name / 'strategy' / mode
+    with launch_slot(strategy_name, mode):
+        workspace_dir = mode_dir / datetime.now().strftime('%Y%m%d_%H%M%S')
+        workspace_dir.mkdir(parents=True)
+    with open(workspace_dir / 'snapshot_config.yaml', 'w', encoding='utf-8') as f:
+        yaml.dump(config, f, allow_unicode=True)
+    return workspace_dir
+
+
+def advance_shard(shard):
+    """推进单个分片的状态，返回是否有变化"""
+    if not shard.get('run_id'):
+        item = run_scheduler.get(shard['queue_id'])
+        if item is None or item['status'] in ('failed', 'cancelled'):
+            shard['status'] = 'failed'
+            shard['error'] = (item or {}).get('error') or '分片未能启动'
+            return True
+        if not item.get('run_id'):
+            return False
+        shard['run_id'] = item['run_id']
+
+    status, workspace_dir = get_run_state(shard['run_id'])
+    if status in ('finished', 'interrupted'):
+        shard['status'] = status
+        shard['final_return'] = get_final_return(workspace_dir)
+        return True
+    if status in (None, 'corrupted'):
+        shard['status'] = 'failed'
+        shard['error'] = f'分片运行状态异常: {status}'
+        return True
+    changed = shard['status'] != status
+    shard['status'] = status
+    return changed
+
+
+def finalize_sharded_run(workspace_dir, manifest):
+    """所有分片结束后合并结果"""
+    failed = [shard['index'] + 1 for shard in manifest['shards'] if shard['status'] == 'failed']
+    if failed:
+        manifest['status'] = 'corrupted'
+        manifest['error'] = f"分片 {', '.join(map(str, failed))} 运行失败，未合并结果"
+    else:
+        shard_dirs = [get_run_state(shard['run_id'])[1] for shard in manifest['shards']]
+        try:
+            manifest['final_return'] = merge_shards(shard_dirs, manifest, workspace_dir)
+            interrupted = any(shard['status'] == 'interrupted' for shard in manifest['shards'])
+            manifest['status'] = 'interrupted' if interrupted else 'finished'
+        except Exception as e:
+            manifest['status'] = 'corrupted'
+            manifest['error'] = f'合并分片结果失败: {e}'
+    manifest['finished_at'] = time.time()
+
+
+def run_sharded(run_id, workspace_dir):
+    """编排线程：等待所有分片结束并合并"""
+    try:
+        while True:
+            manifest = load_manifest(workspace_dir)
+            if manifest is None or manifest['status'] != 'running':
+                return
+            changed = False
+            for shard in manifest['shards']:
+                if shard['status'] not in ('finished', 'interrupted', 'failed'):
+                    changed = advance_shard(shard) or changed
+            if all(shard['status'] in ('finished', 'interrupted', 'failed') for shard in manifest['shards']):
+                finalize_sharded_run(workspace_dir, manifest)
+                changed = True
+            if changed:
+                save_manifest(workspace_dir, manifest)
+                socketio.emit('dashboard_update', {'strategy_name': manifest['strategy']})
+            if manifest['status'] != 'running':
+                print(f"[{manifest['strategy']}] 分片运行 {run_id} 已结束: {manifest['status']}")
+                return
+            time.sleep(POLL_INTERVAL)
+    except Exception as e:
+        print(f"分片运行 {run_id} 编排失败: {e}")
+    finally:
+        with orchestrators_lock:
+            orchestrators.pop(run_id, None)
+
+
+def start_orchestrator(run_id, workspace_dir):
+    with orchestrators_lock:
+        if run_id in orchestrators:
+            return
+        thread = threading.Thread(target=run_sharded, args=(run_id, workspace_dir), daemon=True)
+        orchestrators[run_id] = thread
+    thread.start()
+
+
+def resume_sharded_runs():
+    """后端启动时继续编排未结束的分片运行"""
+    for manifest_path in STRATEGIES_DIR.glob(f'*/strategy/*/*/{SHARD_MANIFEST_FILENAME}'):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception:
+            continue
+        if manifest.get('status') == 'running':
+            start_orchestrator(manifest['run_id'], manifest_path.parent)
+
+
+@shards_bp.route('/strategies/<strategy_name>/sharded-runs', methods=['POST'])
+@login_required
+def create_sharded_run(strategy_name):
+    """
+    创建分片运行
+    请求体: {"shards": 4, "shard_key": "symbols", "priority": 0}
+    """
+    data = request.get_json() or {}
+    mode = data.get('mode', 'backtest')
+    shard_key = data.get('shard_key', 'symbols')
+    priority = data.get('priority', 0)
+
+    try:
+        shard_count = int(data.get('shards', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': '分片数必须为整数'}), 400
+
+    strategy_dir = STRATEGIES_DIR / strategy_name
+    if not strategy_dir.exists():
+        return jsonify({'error': f'策略 "{strategy_name}" 不存在'}), 404
+    if mode != 'backtest':
+        return jsonify({'error': '只有回测支持分片运行'}), 400
+    if not 2 <= shard_count <= MAX_SHARDS:
+        return jsonify({'error': f'分片数必须在 2 到 {MAX_SHARDS} 之间'}), 400
+
+    try:
+        with open(strategy_dir / 'config.yaml', 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+    except Exception as e:
+        return jsonify({'error': f'配置文件解析失败: {str(e)}'}), 500
+
+    initial_cash = config.get('account', {}).get('initial_cash')
+    if not initial_cash:
+        return jsonify({'error': '配置中缺少 account.initial_cash'}), 400
+    config.setdefault('engine', {})['mode'] = mode
+
+    workspace_dir = create_merged_workspace(strategy_name, mode, config)
+    run_id = f"{strategy_name}_{mode}_{workspace_dir.name}"
+
+    manifest = {
+        'run_id': run_id,
+        'strategy': strategy_name,
+        'mode': mode,
+        'shard_count': shard_count,
+        'shard_key': shard_key,
+        'initial_cash': initial_cash,
+        'status': 'running',
+        'created_at': time.time(),
+        'finished_at': None,
+        'final_return': None,
+        'error': None,
+        'shards': []
+    }
+    shard_cash = initial_cash / shard_count
+    items = run_scheduler.submit_many([{
+        'strategy_name': strategy_name,
+        'mode': mode,
+        'priority': priority,
+        'launch_options': {
+            'config_overrides': {'account.initial_cash': shard_cash},
+            'shard': {'index': index, 'count': shard_count, 'key': shard_key}
+        }
+    } for index in range(shard_count)])
+    for index, item in enumerate(items):
+        manifest['shards'].append({
+            'index': index,
+            'initial_cash': shard_cash,
+            'queue_id': item['queue_id'],
+            'run_id': None,
+            'status': 'queued',
+            'final_return': None,
+            'error': None
+        })
+
+    save_manifest(workspace_dir, manifest)
+    start_orchestrator(run_id, workspace_dir)
+    socketio.emit('dashboard_update', {'strategy_name': strategy_name})
+
+    return jsonify({
+        'success': True,
+        'message': f'已提交 {shard_count} 个分片',
+        'run_id': run_id
+    }), 202
+
+
+@shards_bp.route('/runs/<run_id>/shards', methods=['GET'])
+@login_required
+def get_sharded_run(run_id):
+    """获取分片运行的清单和每个分片的状态"""
+    workspace_dir = _get_historical_workspace_dir(run_id)
+    manifest = load_manifest(workspace_dir) if workspace_dir else None
+    if not manifest:
+        return jsonify({'error': '分片运行不存在'}), 404
+    return jsonify(manifest)
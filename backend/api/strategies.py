@@ -120,12 +120,11 @@ def delete_strategy(strategy_name):
 
     # 安全检查：删除前确认没有正在运行的实例
     from backend.api.runs import active_runs, delete_notes_by_strategy  # 使用局部导入，避免循环依赖和启动问题
-    for run_id, run_info in list(active_runs.items()):
-        if run_info.get('strategy') == strategy_name:
-            return jsonify({
-                'success': False,
-                'message': f'无法删除，策略 "{strategy_name}" 有正在运行或暂停的实例。请先停止所有相关运行。'
-            }), 400
+    if active_runs.by_strategy(strategy_name):
+        return jsonify({
+            'success': False,
+            'message': f'无法删除，策略 "{strategy_name}" 有正在运行或暂停的实例。请先停止所有相关运行。'
+        }), 400
 
     try:
         # 删除策略目录
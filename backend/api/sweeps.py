@@ -0,0 +1,414 @@
+# myquant/backend/api/sweeps.py
+"""
+参数扫描API - 对同一策略按参数网格批量回测，并汇总每个变体的结果
+
+网格的键为点分路径：
+- "user_data.<name>"：覆盖策略的 context.user_data（如 user_data.short_ma_period）
+- 其它键：覆盖 config.yaml 中的配置项（如 engine.start_date）
+值可以是列表，或 {"start": 5, "stop": 20, "step": 5} 形式的闭区间范围。
+所有变体都通过运行队列提交，由调度器按资源情况并行启动。
+"""
+
+from flask import Blueprint, request, jsonify, Response
+from pathlib import Path
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from backend.api.auth import login_required
+from backend.api.runs import STRATEGIES_DIR, global_config, run_scheduler, get_run_state
+from backend.utils.metrics import get_equity_metrics
+
+sweeps_bp = Blueprint('sweeps', __name__)
+
+# 参数扫描记录目录
+SWEEPS_DIR = Path(__file__).parent.parent.parent / 'data' / 'sweeps'
+
+USER_DATA_PREFIX = 'user_data.'
+
+# 变体不会再变化的状态
+TERMINAL_STATUSES = ('finished', 'interrupted', 'corrupted', 'failed', 'cancelled', 'missing', 'unknown')
+
+MAX_VARIANTS = global_config.get('sweeps', {}).get('max_variants', 500)
+
+# 参数扫描记录的读-改-写锁（调度器回调写入变体结果与接口请求可能并发）
+sweeps_lock = threading.RLock()
+
+# 结果表中展示的指标
+METRIC_KEYS = (
+    'final_return', 'annual_return', 'volatility', 'sharpe', 'sortino',
+    'max_drawdown', 'max_drawdown_duration', 'calmar', 'win_rate'
+)
+
+
+def expand_values(spec):
+    """把网格中单个参数的取值描述展开为列表"""
+    if isinstance(spec, list):
+        return spec
+    if isinstance(spec, dict) and 'start' in spec and 'stop' in spec:
+        start, stop, step = spec['start'], spec['stop'], spec.get('step', 1)
+        if step <= 0:
+            raise ValueError('step 必须大于 0')
+        values = []
+        value = start
+        while value <= stop + 1e-12:
+            values.append(round(value, 10) if isinstance(value, float) else value)
+            value += step
+        return values
+    return [spec]
+
+
+def expand_grid(grid):
+    """
+    展开参数网格
+    返回: [{param_key: value, ...}, ...]
+    """
+    keys = sorted(grid.keys())
+    value_lists = [expand_values(grid[key]) for key in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*value_lists)]
+
+
+def split_params(params):
+    """把变体参数拆分为 (config_overrides, user_data)"""
+    config_overrides = {}
+    user_data = {}
+    for key, value in params.items():
+        if key.startswith(USER_DATA_PREFIX):
+            user_data[key[len(USER_DATA_PREFIX):]] = value
+        else:
+            config_overrides[key] = value
+    return config_overrides, user_data
+
+
+def variant_request(strategy_name, mode, params, priority=0, tag=None):
+    """一个参数组合对应的队列提交参数（见 RunScheduler.submit_many）"""
+    config_overrides, user_data = split_params(params)
+    return {
+        'strategy_name': strategy_name,
+        'mode': mode,
+        'priority': priority,
+        'launch_options': {'config_overrides': config_overrides, 'user_data': user_data},
+        'tag': tag
+    }
+
+
+def submit_variant(strategy_name, mode, params, priority=0, tag=None):
+    """把一个参数组合提交到运行队列，返回队列条目（tag 见 RunScheduler.submit）"""
+    return run_scheduler.submit_many([variant_request(strategy_name, mode, params, priority, tag)])[0]
+
+
+def load_sweep(sweep_id):
+    sweep_path = SWEEPS_DIR / f'{sweep_id}.json'
+    if not sweep_path.exists():
+        return None
+    with open(sweep_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_sweep(sweep):
+    """原子写入参数扫描记录"""
+    SWEEPS_DIR.mkdir(parents=True, exist_ok=True)
+    sweep_path = SWEEPS_DIR / f"{sweep['sweep_id']}.json"
+    tmp_path = sweep_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sweep, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, sweep_path)
+
+
+def start_sweep(strategy_name, mode, grid, combos, priority=0, fixed_params=None):
+    """
+    创建参数扫描记录并把所有参数组合提交到运行队列
+    fixed_params 会合并到每个变体中（如走步优化为每个窗口固定的回测区间）
+    """
+    sweep_id = uuid.uuid4().hex
+    sweep = {
+        'sweep_id': sweep_id,
+        'strategy': strategy_name,
+        'mode': mode,
+        'grid': grid,
+        'fixed_params': fixed_params or {},
+        'created_at': time.time(),
+        'variants': []
+    }
+    # 持锁直到记录落盘，先启动的变体的结果回调会等待记录写入后再更新
+    with sweeps_lock:
+        items = run_scheduler.submit_many([
+            variant_request(strategy_name, mode, {**(fixed_params or {}), **params}, priority=priority,
+                            tag={'sweep_id': sweep_id, 'index': index})
+            for index, params in enumerate(combos)
+        ])
+        for index, (params, item) in enumerate(zip(combos, items)):
+            sweep['variants'].append({
+                'index': index,
+                'params': params,
+                'queue_id': item['queue_id'],
+                'run_id': None
+            })
+        save_sweep(sweep)
+    return sweep
+
+
+def record_variant_result(item):
+    """
+    调度器条目结束回调：把变体的 run_id（或失败/取消状态）写入参数扫描记录
+    队列中已结束的条目会被定期清理，结果必须在这里记录下来
+    """
+    tag = item.get('tag') or {}
+    if not tag.get('sweep_id'):
+        return
+    with sweeps_lock:
+        sweep = load_sweep(tag['sweep_id'])
+        if sweep is None:
+            return
+        variant = sweep['variants'][tag['index']]
+        if item.get('run_id'):
+            variant['run_id'] = item['run_id']
+        else:
+            variant['status'] = item['status']
+            if item.get('error'):
+                variant['error'] = item['error']
+        save_sweep(sweep)
+
+
+run_scheduler.add_finish_listener(record_variant_result)
+
+
+def variant_metrics(workspace_dir):
+    """单个变体的结果指标（累计收益率、夏普、最大回撤等，为 None 的指标省略）"""
+    metrics = get_equity_metrics(workspace_dir) or {}
+    return {key: metrics[key] for key in METRIC_KEYS if metrics.get(key) is not None}
+
+
+def resolve_variants(sweep):
+    """
+    解析每个变体的当前状态和结果
+    返回: (rows, changed)，changed 表示有新的 run_id 需要写回记录
+    """
+    rows = []
+    changed = False
+    for variant in sweep['variants']:
+        row = {'index': variant['index'], 'params': variant['params'], 'run_id': variant.get('run_id')}
+
+        if not row['run_id'] and variant.get('status'):
+            # 启动失败或已取消，结果已由 record_variant_result 记录
+            row['status'] = variant['status']
+            if variant.get('error'):
+                row['error'] = variant['error']
+        elif not row['run_id']:
+            item = run_scheduler.get(variant['queue_id'])
+            if item is None:
+                row['status'] = 'unknown'
+            elif item.get('run_id'):
+                row['run_id'] = variant['run_id'] = item['run_id']
+                changed = True
+            else:
+                row['status'] = item['status']
+                if item.get('error'):
+                    row['error'] = item['error']
+                if item.get('position'):
+                    row['position'] = item['position']
+
+        if row['run_id']:
+            status, workspace_dir = get_run_state(row['run_id'])
+            row['status'] = status or 'missing'
+            if status in ('finished', 'interrupted'):
+                row.update(variant_metrics(workspace_dir))
+
+        rows.append(row)
+    return rows, changed
+
+
+def is_sweep_complete(result):
+    """结果表中的所有变体是否都已结束（不会再变化）"""
+    return all(row['status'] in TERMINAL_STATUSES for row in result['rows'])
+
+
+def sort_value(value):
+    """
+    结果表排序用的键：能转换为数值的按数值比较，其余按字符串比较并排在数值之后
+    None 和 NaN 视为缺失，返回 None
+    """
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+    return None if math.isnan(number) else (0, number, '')
+
+
+def build_sweep_result(sweep, sort_key=None, order='desc'):
+    """生成参数扫描的结果表"""
+    rows, changed = resolve_variants(sweep)
+    if changed:
+        # 重新读取后只补写 run_id，避免覆盖期间由结果回调写入的内容
+        with sweeps_lock:
+            latest = load_sweep(sweep['sweep_id'])
+            if latest is not None:
+                for variant, row in zip(latest['variants'], rows):
+                    if row.get('run_id') and not variant.get('run_id'):
+                        variant['run_id'] = row['run_id']
+                save_sweep(latest)
+
+    if sort_key:
+        def key_of(row):
+            return sort_value(row['params'].get(sort_key) if sort_key in row['params'] else row.get(sort_key))
+        # 缺失值始终排在最后
+        keyed = [(key_of(row), row) for row in rows]
+        present = [(key, row) for key, row in keyed if key is not None]
+        present.sort(key=lambda pair: pair[0], reverse=(order == 'desc'))
+        rows = [row for _, row in present] + [row for key, row in keyed if key is None]
+
+    summary = {}
+    for row in rows:
+        summary[row['status']] = summary.get(row['status'], 0) + 1
+
+    return {
+        'sweep_id': sweep['sweep_id'],
+        'strategy': sweep['strategy'],
+        'mode': sweep['mode'],
+        'grid': sweep['grid'],
+        'fixed_params': sweep.get('fixed_params', {}),
+        'created_at': sweep['created_at'],
+        'param_keys': sorted(sweep['grid'].keys()),
+        'summary': summary,
+        'rows': rows
+    }
+
+
+@sweeps_bp.route('/strategies/<strategy_name>/sweeps', methods=['POST'])
+@login_required
+def create_sweep(strategy_name):
+    """
+    创建参数扫描
+    请求体: {"mode": "backtest", "grid": {"user_data.short_ma_period": [5, 10], ...}, "priority": 0}
+    """
+    data = request.get_json() or {}
+    mode = data.get('mode', 'backtest')
+    grid = data.get('grid') or {}
+    priority = data.get('priority', 0)
+
+    if mode not in ['backtest', 'simulation']:
+        return jsonify({'error': '无效的运行模式'}), 400
+    if not (STRATEGIES_DIR / strategy_name).exists():
+        return jsonify({'error': f'策略 "{strategy_name}" 不存在'}), 404
+    if not isinstance(grid, dict) or not grid:
+        return jsonify({'error': '参数网格不能为空'}), 400
+
+    try:
+        combos = expand_grid(grid)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'参数网格不合法: {str(e)}'}), 400
+
+    if len(combos) > MAX_VARIANTS:
+        return jsonify({'error': f'参数组合数 {len(combos)} 超过上限 {MAX_VARIANTS}'}), 400
+
+    sweep = start_sweep(strategy_name, mode, grid, combos, priority=priority)
+
+    return jsonify({
+        'success': True,
+        'message': f'已提交 {len(combos)} 个参数组合',
+        'sweep_id': sweep['sweep_id'],
+        'variants': len(combos)
+    }), 202
+
+
+@sweeps_bp.route('/strategies/<strategy_name>/sweeps', methods=['GET'])
+@login_required
+def list_sweeps(strategy_name):
+    """列出策略的所有参数扫描"""
+    sweeps = []
+    if SWEEPS_DIR.exists():
+        for sweep_path in SWEEPS_DIR.glob('*.json'):
+            try:
+                with open(sweep_path, 'r', encoding='utf-8') as f:
+                    sweep = json.load(f)
+            except Exception:
+                continue
+            if sweep.get('strategy') == strategy_name:
+                sweeps.append({
+                    'sweep_id': sweep['sweep_id'],
+                    'mode': sweep['mode'],
+                    'grid': sweep['grid'],
+                    'created_at': sweep['created_at'],
+                    'variants': len(sweep['variants'])
+                })
+    sweeps.sort(key=lambda x: x['created_at'], reverse=True)
+    return jsonify({'sweeps': sweeps})
+
+
+@sweeps_bp.route('/sweeps/<sweep_id>', methods=['GET'])
+@login_required
+def get_sweep(sweep_id):
+    """
+    获取参数扫描结果表
+    查询参数: sort（参数名或指标名，如 final_return）, order（asc | desc）
+    """
+    sweep = load_sweep(sweep_id)
+    if not sweep:
+        return jsonify({'error': '参数扫描不存在'}), 404
+    return jsonify(build_sweep_result(
+        sweep,
+        sort_key=request.args.get('sort'),
+        order=request.args.get('order', 'desc')
+    ))
+
+
+@sweeps_bp.route('/sweeps/<sweep_id>/export', methods=['GET'])
+@login_required
+def export_sweep(sweep_id):
+    """导出参数扫描结果表为CSV"""
+    sweep = load_sweep(sweep_id)
+    if not sweep:
+        return jsonify({'error': '参数扫描不存在'}), 404
+
+    result = build_sweep_result(
+        sweep,
+        sort_key=request.args.get('sort'),
+        order=request.args.get('order', 'desc')
+    )
+    param_keys = result['param_keys']
+    metric_keys = sorted({
+        key for row in result['rows'] for key in row
+        if key not in ('index', 'params', 'run_id', 'status', 'error', 'position')
+    })
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['index'] + param_keys + ['run_id', 'status'] + metric_keys)
+    for row in result['rows']:
+        writer.writerow(
+            [row['index']]
+            + [row['params'].get(key) for key in param_keys]
+            + [row.get('run_id') or '', row['status']]
+            + [row.get(key, '') for key in metric_keys]
+        )
+
+    return Response(
+        buffer.getvalue(),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=sweep_{sweep_id}.csv'}
+    )
+
+
+@sweeps_bp.route('/sweeps/<sweep_id>', methods=['DELETE'])
+@login_required
+def delete_sweep(sweep_id):
+    """删除参数扫描记录，并取消仍在排队的变体（已启动的运行保留）"""
+    sweep = load_sweep(sweep_id)
+    if not sweep:
+        return jsonify({'error': '参数扫描不存在'}), 404
+
+    with sweeps_lock:
+        cancelled = sum(1 for variant in sweep['variants'] if run_scheduler.cancel(variant['queue_id']))
+        (SWEEPS_DIR / f'{sweep_id}.json').unlink(missing_ok=True)
+
+    return jsonify({
+        'success': True,
+        'message': f'参数扫描已删除，取消了 {cancelled} 个排队中的变体'
+    })
@@ -0,0 +1,140 @@
+# myquant/backend/api/tests/test_monitoring.py
+"""监控中继的单元测试：订阅者共享上游连接、初始快照、按订阅者合并发送完整帧或增量帧（不连接上游）"""
+
+import json
+import zlib
+
+import pytest
+
+from backend.api import monitoring
+from backend.api.monitoring import MonitorRelay, Subscriber, add_subscriber, remove_subscriber
+from backend.utils.state_delta import apply_delta
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """不启动中继线程，记录发送给各订阅者的帧"""
+    frames = []
+    monkeypatch.setattr(MonitorRelay, 'start', lambda self: None)
+    monkeypatch.setattr(monitoring.main_socketio, 'emit',
+                        lambda event, payload, room=None: frames.append((room, event, payload)))
+    monkeypatch.setattr(monitoring, 'leave_room', lambda room, sid=None: None)
+    monkeypatch.setattr(monitoring, 'relays', {})
+    monkeypatch.setattr(monitoring, 'subscriptions', {})
+    monkeypatch.setattr(monitoring, 'histories', {})
+    return frames
+
+
+def subscribe(run_id, sid, port=8051, **options):
+    snapshots = []
+    monitoring.subscriptions[sid] = run_id
+    add_subscriber(run_id, port, Subscriber(sid, **options), snapshots.append)
+    return snapshots[0]
+
+
+def order_update(order_id, cash):
+    return {'orders': {'orders': [{'order_id': order_id}]}, 'overview': {'portfolio': {'cash': cash}}}
+
+
+def test_subscribers_share_one_relay_until_the_last_leaves(sent):
+    subscribe('run', 'a')
+    relay = monitoring.relays['run']
+    subscribe('run', 'b')
+    assert monitoring.relays['run'] is relay and set(relay.subscribers) == {'a', 'b'}
+
+    remove_subscriber('a')
+    assert monitoring.relays['run'] is relay and not relay._stop.is_set()
+    remove_subscriber('b')
+    assert 'run' not in monitoring.relays and relay._stop.is_set()
+    assert remove_subscriber('b') is None
+
+
+def test_port_change_replaces_relay_and_keeps_subscribers(sent):
+    subscribe('run', 'a', port=8051)
+    old = monitoring.relays['run']
+    subscribe('run', 'b', port=8052)
+    new = monitoring.relays['run']
+    assert new is not old and old._stop.is_set()
+    assert new.port == 8052 and set(new.subscribers) == {'a', 'b'}
+
+
+def test_snapshot_uses_history_registered_by_event_channel(sent):
+    history = monitoring.create_history()
+    history.record(order_update(1, 100))
+    monitoring.register_history('run', history)
+
+    snapshot = subscribe('run', 'a')
+    relay = monitoring.relays['run']
+    assert relay.history is history and not relay._owns_history
+    assert snapshot['history']['orders'] == [{'order_id': 1}]
+    # 中继收到的上游推送不会重复记录到事件通道的历史中
+    relay.on_update(order_update(2, 90))
+    assert history.export()['orders'] == [{'order_id': 1}]
+
+    monitoring.drop_history('run')
+    remove_subscriber('a')
+    subscribe('run', 'b')
+    relay = monitoring.relays['run']
+    assert relay._owns_history
+    relay.on_update(order_update(3, 80))
+    assert relay.history.export()['orders'] == [{'order_id': 3}]
+
+
+def test_frames_are_coalesced_per_subscriber(sent):
+    subscribe('run', 'full', fps=10)
+    subscribe('run', 'delta', fps=10, delta=True)
+    subscribe('run', 'packed', fps=10, delta=True, binary=True)
+    relay = monitoring.relays['run']
+    for cash in (100, 95, 90):
+        relay.on_update(order_update(1, cash))
+
+    relay.emit_frames(now=float('inf'))
+    frames = {room: (event, payload) for room, event, payload in sent}
+    # 合并后的多次推送只发送一帧
+    assert len(sent) == 3
+    assert frames['full'] == ('monitoring_update', order_update(1, 90))
+    event, key_frame = frames['delta']
+    assert event == 'monitoring_frame' and key_frame['key'] and key_frame['state'] == order_update(1, 90)
+    assert json.loads(zlib.decompress(frames['packed'][1])) == key_frame
+
+    # 没有新状态时不发送
+    sent.clear()
+    relay.emit_frames(now=float('inf'))
+    assert sent == []
+
+    relay.on_update({'overview': {'portfolio': {'cash': 85}}})
+    relay.emit_frames(now=float('inf'))
+    frames = {room: (event, payload) for room, event, payload in sent}
+    delta = frames['delta'][1]
+    assert delta['base'] == key_frame['v']
+    assert apply_delta(key_frame['state'], delta['set'], delta['unset']) == order_update(1, 85)
+    # 快照只保留仍被增量订阅者引用的版本
+    assert list(relay._snapshots) == [delta['v']]
+
+
+def test_frame_rate_limits_each_subscriber(sent):
+    subscribe('run', 'slow', fps=1)
+    subscribe('run', 'fast', fps=10)
+    relay = monitoring.relays['run']
+    start = max(sub.next_due for sub in relay.subscribers.values())
+
+    relay.on_update(order_update(1, 100))
+    relay.emit_frames(start)
+    relay.on_update(order_update(1, 90))
+    relay.emit_frames(start + 0.2)
+    assert [room for room, _, _ in sent] == ['slow', 'fast', 'fast']
+
+
+def test_delta_subscriber_starts_from_snapshot_version(sent):
+    relay_state = order_update(1, 100)
+    subscribe('run', 'first')
+    relay = monitoring.relays['run']
+    relay.on_update(relay_state)
+
+    snapshot = subscribe('run', 'late', delta=True)
+    assert snapshot['state'] == relay_state
+    relay.on_update({'overview': {'portfolio': {'cash': 70}}})
+    relay.emit_frames(now=float('inf'))
+    frame = next(payload for room, _, payload in sent if room == 'late')
+    assert frame['base'] == snapshot['v']
+    assert apply_delta(snapshot['state'], frame['set'], frame['unset']) == order_update(1, 70)
@@ -0,0 +1,337 @@
+# myquant/backend/api/tests/test_runs.py
+"""运行管理的单元测试：启动票据与启动失败回滚、后端重启后重新接管运行、历史运行摘要的增量重建、运行列表的过滤与分页"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+from backend.api import monitoring, runs
+from backend.utils.note_store import NoteStore
+from backend.utils.run_index import RunIndex
+from backend.utils.runner_events import EVENT_PREFIX
+from backend.utils.run_registry import RunRegistry
+
+
+class FakeSupervisor:
+    def __init__(self):
+        self.watched = []
+
+    def watch(self, key, pid, process=None):
+        self.watched.append((key, pid))
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = RunRegistry(tmp_path / 'runs.db')
+    monkeypatch.setattr(runs, 'active_runs', registry)
+    monkeypatch.setattr(runs, 'process_supervisor', FakeSupervisor())
+    monkeypatch.setattr(runs, 'TELEMETRY_ENABLED', False)
+    monkeypatch.setattr(runs, 'PORT_ASSIGNMENT', 'range')
+    monkeypatch.setattr(runs, 'used_ports', set())
+    return registry
+
+
+class SyncExecutor:
+    """在提交线程中直接执行启动任务"""
+
+    def submit(self, fn):
+        fn()
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    monkeypatch.setattr(runs.socketio, 'emit', lambda event, data=None, **kwargs: events.append((event, data)))
+    monkeypatch.setattr(runs, 'launch_executor', SyncExecutor())
+    monkeypatch.setattr(runs, 'launch_tickets', {})
+    return events
+
+
+def fetch_launch(launch_id):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(runs.runs_bp)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    return client.get(f'/launches/{launch_id}')
+
+
+def test_launch_ticket_records_every_stage(emitted, monkeypatch):
+    def launch_new_run(strategy_name, mode, on_stage=None, **kwargs):
+        for stage in ('spawned', 'imported', 'listening'):
+            on_stage(stage)
+        on_stage('ready', run_id='demo_backtest_1', port=8051)
+
+    monkeypatch.setattr(runs, 'launch_new_run', launch_new_run)
+    heard = []
+    ticket = runs.submit_launch('demo', 'backtest', listener=lambda stage, **payload: heard.append(stage))
+
+    assert ticket['stage'] == 'ready' and ticket['run_id'] == 'demo_backtest_1'
+    assert [entry['stage'] for entry in ticket['stages']] == ['spawned', 'imported', 'listening', 'ready']
+    assert heard == ['spawned', 'imported', 'listening', 'ready']
+    assert [data['stage'] for event, data in emitted if event == 'run_launch_progress'] == heard
+    # 查询接口返回副本，之后的阶段不会改动已返回的内容
+    body = fetch_launch(ticket['launch_id']).get_json()
+    assert body['run_id'] == 'demo_backtest_1' and len(body['stages']) == 4
+    assert fetch_launch('missing').status_code == 404
+
+
+def test_launch_ticket_reports_preparation_failure(emitted, monkeypatch):
+    def launch_new_run(strategy_name, mode, on_stage=None, **kwargs):
+        raise runs.RunLaunchError('端口不足', 503)
+
+    monkeypatch.setattr(runs, 'launch_new_run', launch_new_run)
+    ticket = runs.submit_launch('demo', 'backtest')
+    assert (ticket['stage'], ticket['error']) == ('failed', '端口不足')
+
+
+def test_expired_finished_tickets_are_pruned_on_submit(emitted, monkeypatch):
+    monkeypatch.setattr(runs, 'launch_new_run', lambda *args, **kwargs: None)
+    expired = time.time() - runs.LAUNCH_TICKET_TTL - 1
+    runs.launch_tickets.update({
+        'old_ready': {'stage': 'ready', 'created_at': expired},
+        'old_failed': {'stage': 'failed', 'created_at': expired},
+        'old_pending': {'stage': 'spawned', 'created_at': expired},
+        'recent': {'stage': 'ready', 'created_at': time.time()},
+    })
+    ticket = runs.submit_launch('demo', 'backtest')
+    assert set(runs.launch_tickets) == {'old_pending', 'recent', ticket['launch_id']}
+
+
+class FailingSupervisor:
+    def watch(self, key, pid, process=None):
+        raise OSError('too many open files')
+
+
+def test_failure_after_registration_rolls_back(registry, tmp_path, monkeypatch):
+    workspace = tmp_path / 'ws'
+    workspace.mkdir()
+    ready = EVENT_PREFIX + json.dumps({'event': 'ready', 'port': 8051, 'workspace_dir': str(workspace)})
+    process = subprocess.Popen([sys.executable, '-c', f'import time; print({ready!r}, flush=True); time.sleep(30)'],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    monkeypatch.setattr(runs.runner_pool, 'launch', lambda runner_args: (process, 'cold'))
+    monkeypatch.setattr(runs, 'output_hub', runs.OutputHub(lambda *args: None))
+    monkeypatch.setattr(runs, 'process_supervisor', FailingSupervisor())
+    monkeypatch.setattr(runs, 'STRATEGIES_DIR', tmp_path)
+    temp_config = tmp_path / '_temp_config_demo.yaml'
+    temp_config.write_text('engine: {}\n', encoding='utf-8')
+    runs.used_ports.add(8051)
+    stages = []
+
+    with pytest.raises(OSError):
+        runs.launch_runner('demo', 'backtest', [], temp_config, 8051,
+                           on_stage=lambda stage, **payload: stages.append(stage))
+
+    assert len(registry) == 0
+    assert 'demo_backtest_ws' not in monitoring.histories
+    assert process.wait(timeout=5) != 0
+    assert runs.used_ports == set()
+    assert not temp_config.exists()
+    assert stages[0] == 'spawned' and stages[-1] == 'failed'
+
+
+def register_run(registry, tmp_path, run_id, pid, create_time, pidfile_pid=None, port=8051):
+    workspace = tmp_path / run_id
+    workspace.mkdir()
+    if pidfile_pid is not None:
+        (workspace / runs.PIDFILE_NAME).write_text(json.dumps({'pid': pidfile_pid}), encoding='utf-8')
+    registry[run_id] = {
+        'strategy': 'demo',
+        'mode': 'backtest',
+        'pid': pid,
+        'pid_create_time': create_time,
+        'port': port,
+        'is_paused': True,
+        'workspace_dir': str(workspace),
+    }
+
+
+def test_reattach_keeps_only_verified_live_runs(registry, tmp_path):
+    pid = os.getpid()
+    create_time = runs.get_process_create_time(pid)
+    register_run(registry, tmp_path, 'alive', pid, create_time, pidfile_pid=pid, port=8052)
+    # pid 被复用：进程存在但创建时间不同
+    register_run(registry, tmp_path, 'reused', pid, create_time - 100, pidfile_pid=pid, port=8053)
+    # 工作区的 pid 文件不属于该进程
+    register_run(registry, tmp_path, 'foreign', pid, create_time, pidfile_pid=pid + 1, port=8054)
+    register_run(registry, tmp_path, 'no_pidfile', pid, create_time, port=8055)
+
+    runs.reattach_runs()
+
+    assert list(registry) == ['alive']
+    assert registry['alive']['is_paused'] is True
+    assert runs.used_ports == {8052}
+    assert runs.process_supervisor.watched == [('alive', pid)]
+    # 清除的记录同时从数据库中删除
+    assert list(RunRegistry(tmp_path / 'runs.db')) == ['alive']
+
+
+def test_reattach_skips_port_reservation_in_os_mode(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(runs, 'PORT_ASSIGNMENT', 'os')
+    pid = os.getpid()
+    register_run(registry, tmp_path, 'alive', pid, runs.get_process_create_time(pid), pidfile_pid=pid)
+
+    runs.reattach_runs()
+
+    assert list(registry) == ['alive']
+    assert runs.used_ports == set()
+
+
+@pytest.fixture
+def strategy_root(tmp_path, monkeypatch, registry):
+    """临时的策略目录、摘要索引和备注存储"""
+    monkeypatch.setattr(runs, 'STRATEGIES_DIR', tmp_path / 'strategies')
+    monkeypatch.setattr(runs, 'run_index', RunIndex(tmp_path / 'index.db'))
+    monkeypatch.setattr(runs, 'note_store', NoteStore(tmp_path / 'index.db'))
+    monkeypatch.setattr(runs, 'COLUMNAR_ENABLED', False)
+    rebuilt = []
+    original = runs.update_run_summary
+
+    def update_run_summary(strategy_name, mode, workspace_dir, *args, **kwargs):
+        rebuilt.append(Path(workspace_dir).name)
+        return original(strategy_name, mode, workspace_dir, *args, **kwargs)
+
+    monkeypatch.setattr(runs, 'update_run_summary', update_run_summary)
+    return rebuilt
+
+
+def make_workspace(name, mode='backtest'):
+    workspace = runs.STRATEGIES_DIR / 'demo' / 'strategy' / mode / name
+    workspace.mkdir(parents=True)
+    (workspace / 'equity.csv').write_text('date,total_value,returns\n2023-01-03,101,0.01\n', encoding='utf-8')
+    return workspace
+
+
+def bump_mtime(path, seconds=10):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10 ** 9))
+
+
+def test_collect_runs_rebuilds_only_changed_workspaces(strategy_root):
+    rebuilt = strategy_root
+    first = make_workspace('20230101_090000')
+    make_workspace('20230102_090000')
+
+    runs_list = runs.collect_runs('demo')
+    assert [run['run_id'] for run in runs_list] == ['demo_backtest_20230102_090000', 'demo_backtest_20230101_090000']
+    assert sorted(rebuilt) == ['20230101_090000', '20230102_090000']
+
+    rebuilt.clear()
+    runs.collect_runs('demo')
+    assert rebuilt == []
+
+    # 新增文件改变目录 mtime，只重建这一个工作区
+    (first / 'trades.csv').write_text('id\n1\n', encoding='utf-8')
+    bump_mtime(first)
+    runs_list = runs.collect_runs('demo')
+    assert rebuilt == ['20230101_090000']
+    assert {run['run_id']: run['file_count'] for run in runs_list}['demo_backtest_20230101_090000'] == 2
+
+
+def test_collect_runs_drops_summaries_of_deleted_workspaces(strategy_root):
+    workspace = make_workspace('20230101_090000')
+    runs.collect_runs('demo')
+    assert runs.run_index.get('demo_backtest_20230101_090000') is not None
+
+    shutil.rmtree(workspace)
+    assert runs.collect_runs('demo') == []
+    assert runs.run_index.get('demo_backtest_20230101_090000') is None
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """只注册运行管理蓝图的应用，会话已登录"""
+    monkeypatch.setattr(runs, 'STRATEGIES_DIR', tmp_path / 'strategies')
+    (tmp_path / 'strategies' / 'demo').mkdir(parents=True)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(runs.runs_bp)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    return client
+
+
+def fake_runs(count):
+    """start_time 递增、final_return 交替出现缺失的运行列表"""
+    return [{
+        'run_id': f'demo_backtest_{i:03d}',
+        'mode': 'backtest' if i % 4 else 'simulation',
+        'start_time': datetime(2023, 1, 1 + i).timestamp(),
+        'duration': float(i % 5),
+        'status': 'finished' if i % 3 else 'interrupted',
+        'note': '好' if i % 2 else '',
+        'final_return': None if i % 7 == 0 else (i % 10) / 100,
+    } for i in range(count)]
+
+
+def fetch_all_pages(client, limit, **params):
+    query = dict(params, limit=limit)
+    seen, totals = [], set()
+    while True:
+        body = client.get('/strategies/demo/runs', query_string=query).get_json()
+        assert len(body['runs']) <= limit
+        seen.extend(run['run_id'] for run in body['runs'])
+        totals.add(body['total'])
+        if body['next_cursor'] is None:
+            return seen, totals
+        query['cursor'] = body['next_cursor']
+
+
+@pytest.mark.parametrize('sort, order', [
+    ('start_time', 'desc'), ('start_time', 'asc'), ('final_return', 'desc'), ('duration', 'asc'),
+])
+def test_list_runs_pages_match_unpaginated_order(client, monkeypatch, sort, order):
+    monkeypatch.setattr(runs, 'collect_runs', lambda strategy_name, modes: [
+        run for run in fake_runs(23) if run['mode'] in modes
+    ])
+    params = {'sort': sort, 'order': order}
+    full = client.get('/strategies/demo/runs', query_string=params).get_json()['runs']
+    expected = [run['run_id'] for run in full['backtest']] + [run['run_id'] for run in full['simulation']]
+
+    pages, totals = fetch_all_pages(client, 4, **params)
+    assert sorted(pages) == sorted(expected)
+    assert len(pages) == len(set(pages)) == 23
+    assert totals == {23}
+    # 缺少排序值的运行排在最后
+    values = [next(run for run in fake_runs(23) if run['run_id'] == run_id)[sort] for run_id in pages]
+    present = [value for value in values if value is not None]
+    assert values[:len(present)] == present
+    assert present == sorted(present, reverse=(order == 'desc'))
+
+
+def test_list_runs_filters_apply_before_paging(client, monkeypatch):
+    monkeypatch.setattr(runs, 'collect_runs', lambda strategy_name, modes: [
+        run for run in fake_runs(30) if run['mode'] in modes
+    ])
+    params = {'status': 'finished', 'note': '好', 'min_return': '0.03', 'mode': 'backtest',
+              'date_from': '2023-01-05', 'date_to': '2023-01-25'}
+    expected = {
+        run['run_id'] for run in fake_runs(30)
+        if run['mode'] == 'backtest' and run['status'] == 'finished' and run['note'] == '好'
+        and run['final_return'] is not None and run['final_return'] >= 0.03
+        and datetime(2023, 1, 5).timestamp() <= run['start_time'] <= datetime(2023, 1, 25, 23, 59, 59).timestamp()
+    }
+    assert expected
+
+    pages, totals = fetch_all_pages(client, 2, **params)
+    assert set(pages) == expected and len(pages) == len(expected)
+    assert totals == {len(expected)}
+
+
+@pytest.mark.parametrize('params', [
+    {'status': 'bogus'}, {'sort': 'note'}, {'order': 'up'}, {'limit': '0'}, {'limit': 'x'},
+    {'limit': '5', 'cursor': 'not-a-cursor'}, {'min_return': 'abc'}, {'mode': 'live'},
+])
+def test_list_runs_rejects_invalid_parameters(client, monkeypatch, params):
+    monkeypatch.setattr(runs, 'collect_runs', lambda strategy_name, modes: [])
+    assert client.get('/strategies/demo/runs', query_string=params).status_code == 400
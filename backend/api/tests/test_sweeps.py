@@ -0,0 +1,149 @@
+# myquant/backend/api/tests/test_sweeps.py
+"""参数扫描的单元测试（运行队列和工作区状态用假的实现代替）"""
+
+import pytest
+
+from backend.api import sweeps
+from backend.api.sweeps import (
+    build_sweep_result, expand_grid, expand_values, load_sweep, record_variant_result, sort_value, split_params,
+    start_sweep
+)
+
+
+@pytest.fixture
+def sweeps_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sweeps, 'SWEEPS_DIR', tmp_path / 'sweeps')
+    return tmp_path / 'sweeps'
+
+
+class FakeScheduler:
+    """记录提交的请求，按 queue_id 返回预设的条目状态"""
+
+    def __init__(self):
+        self.requests = []
+        self.items = {}
+
+    def submit_many(self, requests):
+        items = []
+        for request in requests:
+            queue_id = f'q{len(self.requests)}'
+            self.requests.append(request)
+            self.items[queue_id] = {'queue_id': queue_id, 'status': 'queued', 'position': len(self.requests)}
+            items.append({'queue_id': queue_id, **request})
+        return items
+
+    def get(self, queue_id):
+        return self.items.get(queue_id)
+
+
+@pytest.fixture
+def scheduler(sweeps_dir, monkeypatch):
+    scheduler = FakeScheduler()
+    monkeypatch.setattr(sweeps, 'run_scheduler', scheduler)
+    return scheduler
+
+
+def make_rows(values, key='sharpe'):
+    return [{'index': index, 'params': {}, 'run_id': None, 'status': 'finished', key: value}
+            for index, value in enumerate(values)]
+
+
+def test_sort_value_coerces_numbers_and_marks_missing():
+    assert sort_value(2) == sort_value('2.0') == (0, 2.0, '')
+    assert sort_value(True) == (0, 1.0, '')
+    assert sort_value('ma') == (1, 0.0, 'ma')
+    assert sort_value(None) is None
+    assert sort_value(float('nan')) is None
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_sort_mixed_values_without_type_error(sweeps_dir, monkeypatch, order):
+    rows = make_rows([1.5, None, '3', 'ma', 0.5, float('nan'), 2])
+    monkeypatch.setattr(sweeps, 'resolve_variants', lambda sweep: (rows, False))
+    sweep = {'sweep_id': 's1', 'strategy': 'demo', 'mode': 'backtest', 'grid': {}, 'created_at': 0, 'variants': []}
+
+    result = build_sweep_result(sweep, sort_key='sharpe', order=order)
+    ordered = [row['sharpe'] for row in result['rows']]
+    present = ['ma', '3', 2, 1.5, 0.5] if order == 'desc' else [0.5, 1.5, 2, '3', 'ma']
+    assert ordered[:5] == present
+    # 缺失值无论升序降序都排在最后
+    assert ordered[5] is None and ordered[6] != ordered[6]
+
+
+def test_expand_values_lists_ranges_and_scalars():
+    assert expand_values([1, 'a']) == [1, 'a']
+    assert expand_values({'start': 5, 'stop': 20, 'step': 5}) == [5, 10, 15, 20]
+    # 浮点步长累积误差不会丢掉终点，结果按 10 位小数取整
+    assert expand_values({'start': 0.1, 'stop': 0.3, 'step': 0.1}) == [0.1, 0.2, 0.3]
+    assert expand_values({'start': 1, 'stop': 3}) == [1, 2, 3]
+    assert expand_values(7) == [7]
+    with pytest.raises(ValueError):
+        expand_values({'start': 1, 'stop': 3, 'step': 0})
+
+
+def test_expand_grid_is_cartesian_product_in_key_order():
+    combos = expand_grid({'user_data.b': [1, 2], 'engine.start_date': ['2023-01-01'], 'user_data.a': {'start': 1, 'stop': 2}})
+    assert len(combos) == 4
+    assert combos[0] == {'engine.start_date': '2023-01-01', 'user_data.a': 1, 'user_data.b': 1}
+    assert combos[-1] == {'engine.start_date': '2023-01-01', 'user_data.a': 2, 'user_data.b': 2}
+    assert expand_grid({}) == [{}]
+
+
+def test_split_params():
+    assert split_params({'user_data.fast': 5, 'engine.start_date': '2023-01-01'}) == (
+        {'engine.start_date': '2023-01-01'}, {'fast': 5})
+
+
+def test_start_sweep_submits_every_variant_with_tag(scheduler):
+    combos = expand_grid({'user_data.fast': [5, 10]})
+    sweep = start_sweep('demo', 'backtest', {'user_data.fast': [5, 10]}, combos, priority=3,
+                        fixed_params={'engine.end_date': '2023-06-30'})
+
+    assert [request['tag'] for request in scheduler.requests] == [
+        {'sweep_id': sweep['sweep_id'], 'index': 0}, {'sweep_id': sweep['sweep_id'], 'index': 1}]
+    assert scheduler.requests[1]['priority'] == 3
+    assert scheduler.requests[1]['launch_options'] == {
+        'config_overrides': {'engine.end_date': '2023-06-30'}, 'user_data': {'fast': 10}}
+    saved = load_sweep(sweep['sweep_id'])
+    # 变体记录中只保存网格参数，固定参数单独保存
+    assert [variant['params'] for variant in saved['variants']] == combos
+    assert [variant['queue_id'] for variant in saved['variants']] == ['q0', 'q1']
+    assert saved['fixed_params'] == {'engine.end_date': '2023-06-30'}
+
+
+def test_record_variant_result_writes_run_id_or_failure(scheduler):
+    sweep = start_sweep('demo', 'backtest', {'user_data.fast': [5, 10]}, expand_grid({'user_data.fast': [5, 10]}))
+    record_variant_result({'tag': {'sweep_id': sweep['sweep_id'], 'index': 0}, 'run_id': 'demo_run_0', 'status': 'started'})
+    record_variant_result({'tag': {'sweep_id': sweep['sweep_id'], 'index': 1}, 'status': 'failed', 'error': 'boom'})
+    # 不属于参数扫描的条目被忽略
+    record_variant_result({'tag': {'wf_id': 'w1'}, 'status': 'failed'})
+
+    variants = load_sweep(sweep['sweep_id'])['variants']
+    assert variants[0]['run_id'] == 'demo_run_0' and 'status' not in variants[0]
+    assert variants[1]['run_id'] is None
+    assert (variants[1]['status'], variants[1]['error']) == ('failed', 'boom')
+
+
+def test_build_sweep_result_collects_states_and_persists_new_run_ids(scheduler, monkeypatch):
+    grid = {'user_data.fast': [5, 10, 15, 20]}
+    sweep = start_sweep('demo', 'backtest', grid, expand_grid(grid))
+    record_variant_result({'tag': {'sweep_id': sweep['sweep_id'], 'index': 0}, 'run_id': 'run_a', 'status': 'started'})
+    # 结果回调之前已被调度器启动的变体，只能从队列条目中取得 run_id
+    scheduler.items['q1'].update(status='started', run_id='run_b')
+    scheduler.items['q2'].update(status='failed', error='no port')
+    del scheduler.items['q3']
+
+    states = {'run_a': ('finished', '/ws/a'), 'run_b': ('running', '/ws/b')}
+    monkeypatch.setattr(sweeps, 'get_run_state', lambda run_id: states[run_id])
+    monkeypatch.setattr(sweeps, 'variant_metrics', lambda workspace_dir: {'sharpe': 1.2, 'workspace': workspace_dir})
+
+    result = build_sweep_result(load_sweep(sweep['sweep_id']))
+    rows = result['rows']
+    assert [row['status'] for row in rows] == ['finished', 'running', 'failed', 'unknown']
+    assert rows[0]['sharpe'] == 1.2 and rows[0]['workspace'] == '/ws/a'
+    assert 'sharpe' not in rows[1]
+    assert rows[2]['error'] == 'no port'
+    assert result['summary'] == {'finished': 1, 'running': 1, 'failed': 1, 'unknown': 1}
+    assert result['param_keys'] == ['user_data.fast']
+    assert not sweeps.is_sweep_complete(result)
+    assert [variant['run_id'] for variant in load_sweep(sweep['sweep_id'])['variants']] == ['run_a', 'run_b', None, None]
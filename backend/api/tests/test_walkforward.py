@@ -0,0 +1,133 @@
+# myquant/backend/api/tests/test_walkforward.py
+"""走步优化的单元测试：窗口切分、收益拼接、样本外回测结果的记录与窗口推进"""
+
+from datetime import datetime
+
+import pytest
+
+from backend.api import walkforward
+from backend.api.walkforward import (
+    advance_window, build_windows, load_walkforward, record_oos_result, run_walkforward, save_walkforward,
+    stitch_equity
+)
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.items = {}
+        self.cancelled = []
+
+    def get(self, queue_id):
+        return self.items.get(queue_id)
+
+    def cancel(self, queue_id):
+        self.cancelled.append(queue_id)
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(walkforward, 'WALKFORWARD_DIR', tmp_path / 'walkforward')
+    scheduler = FakeScheduler()
+    monkeypatch.setattr(walkforward, 'run_scheduler', scheduler)
+    return scheduler
+
+
+def make_walkforward(*windows):
+    wf = {'wf_id': 'wf1', 'strategy': 'demo', 'mode': 'backtest', 'metric': 'sharpe', 'metric_order': 'desc',
+          'status': 'running', 'windows': list(windows)}
+    save_walkforward(wf)
+    return wf
+
+
+def make_window(index=0, status='out_of_sample', **fields):
+    window = {'index': index, 'status': status, 'oos_start': '2023-04-01', 'oos_end': '2023-06-30',
+              'sweep_id': f's{index}', 'oos_queue_id': f'q{index}'}
+    window.update(fields)
+    return window
+
+
+def test_build_windows_clamps_month_end_and_truncates_last_window():
+    windows = build_windows(datetime(2023, 1, 31), datetime(2023, 12, 15), {'months': 6}, {'months': 3})
+    assert [(w['is_start'], w['is_end'], w['oos_start'], w['oos_end']) for w in windows] == [
+        ('2023-01-31', '2023-07-30', '2023-07-31', '2023-10-30'),
+        ('2023-04-30', '2023-10-29', '2023-10-30', '2023-12-15'),
+    ]
+    assert build_windows(datetime(2023, 1, 1), datetime(2023, 3, 1), {'months': 6}, {'months': 3}) == []
+    with pytest.raises(ValueError):
+        build_windows(datetime(2023, 1, 1), datetime(2024, 1, 1), {'months': 1}, {'months': 1}, {'days': 0, 'months': 0})
+
+
+def test_stitch_equity_compounds_segments():
+    curve = stitch_equity([(0, [('d1', 0.1), ('d2', 0.2)]), (1, []), (2, [('d3', -0.5)])])
+    assert [point['window'] for point in curve] == [0, 0, 2]
+    assert curve[-1]['returns'] == pytest.approx(1.2 * 0.5 - 1)
+
+
+def test_in_sample_window_submits_oos_run_with_best_params(scheduler, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(walkforward, 'load_sweep', lambda sweep_id: {'sweep_id': sweep_id})
+    monkeypatch.setattr(walkforward, '_pick_best', lambda sweep, metric, order: (
+        True, {'params': {'user_data.fast': 10}, 'run_id': 'is_run', 'sharpe': 1.5}))
+
+    def submit_variant(strategy_name, mode, params, priority=0, tag=None):
+        submitted.append((params, tag))
+        return {'queue_id': 'q9'}
+
+    monkeypatch.setattr(walkforward, 'submit_variant', submit_variant)
+    wf = make_walkforward(make_window(status='in_sample'))
+
+    assert advance_window(wf, wf['windows'][0]) is True
+    window = wf['windows'][0]
+    assert (window['status'], window['oos_queue_id'], window['best_metric']) == ('out_of_sample', 'q9', 1.5)
+    assert submitted == [({'user_data.fast': 10, 'engine.start_date': '2023-04-01', 'engine.end_date': '2023-06-30'},
+                          {'wf_id': 'wf1', 'window': 0})]
+
+
+def test_record_oos_result_persists_run_id_and_failures(scheduler):
+    make_walkforward(make_window(0), make_window(1))
+    record_oos_result({'tag': {'wf_id': 'wf1', 'window': 0}, 'run_id': 'oos_run', 'status': 'started'})
+    record_oos_result({'tag': {'wf_id': 'wf1', 'window': 1}, 'status': 'failed', 'error': 'no port'})
+    record_oos_result({'tag': {'sweep_id': 's0', 'index': 0}, 'status': 'failed'})  # 参数扫描的条目被忽略
+
+    first, second = load_walkforward('wf1')['windows']
+    assert first['oos_run_id'] == 'oos_run'
+    assert (second['oos_queue_status'], second['oos_error']) == ('failed', 'no port')
+
+
+def test_pruned_queue_item_uses_recorded_run_id(scheduler, monkeypatch):
+    monkeypatch.setattr(walkforward, 'get_run_state', lambda run_id: ('finished', f'/ws/{run_id}'))
+    monkeypatch.setattr(walkforward, 'get_final_return', lambda workspace_dir: 0.05)
+    # 队列条目已被清理，但结束回调记录过 run_id
+    wf = make_walkforward(make_window(oos_run_id='oos_run'))
+
+    assert advance_window(wf, wf['windows'][0]) is True
+    assert (wf['windows'][0]['status'], wf['windows'][0]['oos_return']) == ('done', 0.05)
+
+
+def test_pruned_queue_item_without_run_id_fails(scheduler):
+    wf = make_walkforward(make_window(oos_queue_status='failed', oos_error='no port'), make_window(1))
+    scheduler.items['q1'] = {'queue_id': 'q1', 'status': 'queued'}
+
+    assert advance_window(wf, wf['windows'][0]) is True
+    assert (wf['windows'][0]['status'], wf['windows'][0]['error']) == ('failed', 'no port')
+    # 仍在排队的条目不变
+    assert advance_window(wf, wf['windows'][1]) is False
+    assert wf['windows'][1]['status'] == 'out_of_sample'
+
+
+def test_orchestrator_keeps_results_recorded_while_advancing(scheduler, monkeypatch):
+    make_walkforward(make_window(0, status='in_sample'))
+
+    def advance_window(wf, window):
+        # 推进期间调度器回调写入了样本外结果
+        record_oos_result({'tag': {'wf_id': 'wf1', 'window': 0}, 'run_id': 'oos_run', 'status': 'started'})
+        window['status'] = 'failed'
+        return True
+
+    monkeypatch.setattr(walkforward, 'advance_window', advance_window)
+    run_walkforward('wf1')
+
+    wf = load_walkforward('wf1')
+    assert wf['status'] == 'failed'
+    assert wf['windows'][0]['oos_run_id'] == 'oos_run'
+    assert 'wf1' not in walkforward.wf_locks
@@ -0,0 +1,499 @@
+# myquant/backend/api/walkforward.py
+"""
+走步优化API - 滚动样本内参数搜索 + 样本外验证
+
+把 [start_date, end_date] 切分为滚动窗口，每个窗口包含一段样本内区间和紧随其后的样本外区间：
+1. 所有窗口的样本内参数扫描同时提交到运行队列，并行执行
+2. 某个窗口的扫描全部结束后，立即用最优参数在其样本外区间启动一次回测
+3. 所有样本外回测结束后，按时间顺序把各段收益曲线复利拼接为一条完整曲线
+编排由后台线程推进，状态持久化在 data/walkforward/ 下，后端重启后会继续。
+"""
+
+from flask import Blueprint, request, jsonify
+from pathlib import Path
+from datetime import datetime, timedelta
+import calendar
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+import yaml
+from backend.api.auth import login_required
+from backend.api.runs import STRATEGIES_DIR, run_scheduler, get_run_state, get_final_return
+from backend.api.sweeps import (
+    MAX_VARIANTS, expand_grid, start_sweep, load_sweep, build_sweep_result, is_sweep_complete, submit_variant
+)
+from backend.utils.metrics import load_equity
+
+walkforward_bp = Blueprint('walkforward', __name__)
+
+# 走步优化记录目录
+WALKFORWARD_DIR = Path(__file__).parent.parent.parent / 'data' / 'walkforward'
+
+# 编排线程检查进度的间隔（秒）
+POLL_INTERVAL = 5
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# 正在编排的走步优化：{wf_id: thread}
+orchestrators = {}
+orchestrators_lock = threading.Lock()
+
+# 每个走步优化记录的读-改-写锁：{wf_id: lock}
+wf_locks = {}
+# 已请求取消的走步优化，编排线程在推进的间隙检查
+cancel_requests = set()
+
+
+def get_wf_lock(wf_id):
+    with orchestrators_lock:
+        return wf_locks.setdefault(wf_id, threading.Lock())
+
+
+def parse_date(value):
+    """解析 YYYY-MM-DD 日期（yaml 中未加引号的日期会被解析为 date 对象）"""
+    return datetime.strptime(str(value)[:10], DATE_FORMAT)
+
+
+def add_period(date, period):
+    """日期加上一段周期，period 形如 {"months": 12} 或 {"days": 90}"""
+    months = int(period.get('months', 0))
+    if months:
+        month_index = date.month - 1 + months
+        year = date.year + month_index // 12
+        month = month_index % 12 + 1
+        day = min(date.day, calendar.monthrange(year, month)[1])
+        date = date.replace(year=year, month=month, day=day)
+    return date + timedelta(days=int(period.get('days', 0)))
+
+
+def build_windows(start_date, end_date, in_sample, out_of_sample, step=None):
+    """
+    切分滚动窗口
+    返回: [{index, is_start, is_end, oos_start, oos_end}, ...]，最后一个样本外区间截断到 end_date
+    """
+    step = step or out_of_sample
+    windows = []
+    window_start = start_date
+    while True:
+        oos_start = add_period(window_start, in_sample)
+        if oos_start > end_date:
+            break
+        oos_end = min(add_period(oos_start, out_of_sample) - timedelta(days=1), end_date)
+        windows.append({
+            'index': len(windows),
+            'is_start': window_start.strftime(DATE_FORMAT),
+            'is_end': (oos_start - timedelta(days=1)).strftime(DATE_FORMAT),
+            'oos_start': oos_start.strftime(DATE_FORMAT),
+            'oos_end': oos_end.strftime(DATE_FORMAT)
+        })
+        next_start = add_period(window_start, step)
+        if next_start <= window_start:
+            raise ValueError('step 必须为正')
+        window_start = next_start
+    return windows
+
+
+def load_walkforward(wf_id):
+    wf_path = WALKFORWARD_DIR / f'{wf_id}.json'
+    if not wf_path.exists():
+        return None
+    with open(wf_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_walkforward(wf):
+    """原子写入走步优化记录"""
+    WALKFORWARD_DIR.mkdir(parents=True, exist_ok=True)
+    wf_path = WALKFORWARD_DIR / f"{wf['wf_id']}.json"
+    tmp_path = wf_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(wf, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, wf_path)
+
+
+def read_equity_returns(workspace_dir):
+    """
+    读取工作区资金曲线的 (日期, 累计收益率) 序列（优先使用列式副本）
+    日期取第一列
+    """
+    equity = load_equity(workspace_dir)
+    if equity is None:
+        return []
+    dates, nav = equity
+    return [(str(date), float(value) - 1) for date, value in zip(dates, nav) if value == value]
+
+
+def stitch_equity(segments):
+    """
+    按顺序复利拼接多段累计收益曲线
+    segments: [(window_index, [(date, cumulative_return), ...]), ...]
+    返回: [{date, window, returns}, ...]，returns 为拼接后的累计收益率
+    """
+    curve = []
+    base_nav = 1.0
+    for window_index, points in segments:
+        if not points:
+            continue
+        for date, cumulative_return in points:
+            curve.append({
+                'date': date,
+                'window': window_index,
+                'returns': base_nav * (1 + cumulative_return) - 1
+            })
+        base_nav *= 1 + points[-1][1]
+    return curve
+
+
+def _pick_best(sweep, metric, metric_order):
+    """从样本内扫描结果中选出指标最优的变体"""
+    result = build_sweep_result(sweep, sort_key=metric, order=metric_order)
+    if not is_sweep_complete(result):
+        return False, None
+    for row in result['rows']:
+        if row['status'] == 'finished' and row.get(metric) is not None:
+            return True, row
+    return True, None
+
+
+def advance_window(wf, window):
+    """推进单个窗口的状态，返回是否有变化"""
+    if window['status'] == 'in_sample':
+        sweep = load_sweep(window['sweep_id'])
+        if sweep is None:
+            window['status'] = 'failed'
+            window['error'] = '样本内参数扫描记录丢失'
+            return True
+        complete, best = _pick_best(sweep, wf['metric'], wf['metric_order'])
+        if not complete:
+            return False
+        if best is None:
+            window['status'] = 'failed'
+            window['error'] = '样本内没有得到有效结果'
+            return True
+        window['best_params'] = best['params']
+        window['best_run_id'] = best['run_id']
+        window['best_metric'] = best.get(wf['metric'])
+        item = submit_variant(wf['strategy'], wf['mode'], {
+            **best['params'],
+            'engine.start_date': window['oos_start'],
+            'engine.end_date': window['oos_end']
+        }, priority=wf.get('priority', 0), tag={'wf_id': wf['wf_id'], 'window': window['index']})
+        window['oos_queue_id'] = item['queue_id']
+        window['status'] = 'out_of_sample'
+        return True
+
+    if window['status'] == 'out_of_sample':
+        if not window.get('oos_run_id'):
+            # run_id 通常已由 record_oos_result 写入；队列条目被清理后只有从未记录过 run_id 才算失败
+            item = run_scheduler.get(window['oos_queue_id'])
+            if item is not None and item.get('run_id'):
+                window['oos_run_id'] = item['run_id']
+            elif item is None or item['status'] in ('failed', 'cancelled') or window.get('oos_queue_status'):
+                window['status'] = 'failed'
+                window['error'] = (item or {}).get('error') or window.get('oos_error') or '样本外回测未能启动'
+                return True
+            else:
+                return False
+
+        status, workspace_dir = get_run_state(window['oos_run_id'])
+        if status in ('finished', 'interrupted'):
+            window['status'] = 'done'
+            window['oos_return'] = get_final_return(workspace_dir)
+            return True
+        if status in (None, 'corrupted'):
+            window['status'] = 'failed'
+            window['error'] = f'样本外回测状态异常: {status}'
+            return True
+    return False
+
+
+def record_oos_result(item):
+    """
+    调度器条目结束回调：把样本外回测的 run_id（或失败/取消状态）写入走步优化记录
+    队列中已结束的条目会被定期清理，不能只靠轮询队列取得 run_id
+    """
+    tag = item.get('tag') or {}
+    if not tag.get('wf_id'):
+        return
+    with get_wf_lock(tag['wf_id']):
+        wf = load_walkforward(tag['wf_id'])
+        if wf is None:
+            return
+        window = next((w for w in wf['windows'] if w['index'] == tag['window']), None)
+        if window is None:
+            return
+        if item.get('run_id'):
+            window['oos_run_id'] = item['run_id']
+        else:
+            window['oos_queue_status'] = item['status']
+            if item.get('error'):
+                window['oos_error'] = item['error']
+        save_walkforward(wf)
+
+
+run_scheduler.add_finish_listener(record_oos_result)
+
+# 由 record_oos_result 写入、编排线程保存时需要保留的窗口字段
+OOS_RESULT_KEYS = ('oos_run_id', 'oos_queue_status', 'oos_error')
+
+
+def finalize_walkforward(wf):
+    """拼接所有已完成窗口的样本外收益曲线"""
+    segments = []
+    for window in wf['windows']:
+        if window['status'] != 'done':
+            continue
+        _, workspace_dir = get_run_state(window['oos_run_id'])
+        segments.append((window['index'], read_equity_returns(workspace_dir) if workspace_dir else []))
+
+    curve = stitch_equity(segments)
+    with open(WALKFORWARD_DIR / f"{wf['wf_id']}_equity.csv", 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['date', 'window', 'returns'])
+        writer.writeheader()
+        writer.writerows(curve)
+
+    wf['combined_return'] = curve[-1]['returns'] if curve else None
+    wf['status'] = 'finished' if curve else 'failed'
+    wf['finished_at'] = time.time()
+
+
+def run_walkforward(wf_id):
+    """编排线程：推进各窗口直到全部结束"""
+    try:
+        while True:
+            wf = load_walkforward(wf_id)
+            if wf is None or wf['status'] != 'running' or wf_id in cancel_requests:
+                return
+            changed = False
+            for window in wf['windows']:
+                if wf_id in cancel_requests:
+                    break
+                changed = advance_window(wf, window) or changed
+            if all(window['status'] in ('done', 'failed') for window in wf['windows']):
+                finalize_walkforward(wf)
+                changed = True
+            if changed:
+                # 推进期间可能已被取消：重新读取状态后再写入，不覆盖取消结果
+                with get_wf_lock(wf_id):
+                    current = load_walkforward(wf_id)
+                    cancelled = wf_id in cancel_requests or current is None or current['status'] != 'running'
+                    if not cancelled:
+                        # 推进期间 record_oos_result 可能已写入样本外结果，保存时不覆盖
+                        for window, saved in zip(wf['windows'], current['windows']):
+                            for key in OOS_RESULT_KEYS:
+                                if key in saved and key not in window:
+                                    window[key] = saved[key]
+                        save_walkforward(wf)
+                if cancelled:
+                    # 本轮新提交的样本外回测同样取消（取消会同步触发 record_oos_result，须在锁外进行）
+                    for window in wf['windows']:
+                        if window.get('oos_queue_id'):
+                            run_scheduler.cancel(window['oos_queue_id'])
+                    return
+            if wf['status'] != 'running':
+                print(f"[{wf['strategy']}] 走步优化 {wf_id} 已结束: {wf['status']}")
+                return
+            time.sleep(POLL_INTERVAL)
+    except Exception as e:
+        print(f"走步优化 {wf_id} 编排失败: {e}")
+    finally:
+        with orchestrators_lock:
+            orchestrators.pop(wf_id, None)
+            wf_locks.pop(wf_id, None)
+        cancel_requests.discard(wf_id)
+
+
+def start_orchestrator(wf_id):
+    with orchestrators_lock:
+        if wf_id in orchestrators:
+            return
+        thread = threading.Thread(target=run_walkforward, args=(wf_id,), daemon=True)
+        orchestrators[wf_id] = thread
+    thread.start()
+
+
+def resume_walkforwards():
+    """后端启动时继续编排未结束的走步优化"""
+    if not WALKFORWARD_DIR.exists():
+        return
+    for wf_path in WALKFORWARD_DIR.glob('*.json'):
+        try:
+            with open(wf_path, 'r', encoding='utf-8') as f:
+                wf = json.load(f)
+        except Exception:
+            continue
+        if wf.get('status') == 'running':
+            start_orchestrator(wf['wf_id'])
+
+
+@walkforward_bp.route('/strategies/<strategy_name>/walkforward', methods=['POST'])
+@login_required
+def create_walkforward(strategy_name):
+    """
+    创建走步优化
+    请求体: {
+        "mode": "backtest",
+        "grid": {"user_data.short_ma_period": [5, 10, 20]},
+        "start_date": "2020-01-01", "end_date": "2023-12-31",   // 默认取 config.yaml
+        "in_sample": {"months": 12}, "out_of_sample": {"months": 3}, "step": {"months": 3},
+        "metric": "final_return", "metric_order": "desc", "priority": 0
+    }
+    """
+    data = request.get_json() or {}
+    mode = data.get('mode', 'backtest')
+    grid = data.get('grid') or {}
+    in_sample = data.get('in_sample') or {}
+    out_of_sample = data.get('out_of_sample') or {}
+
+    strategy_dir = STRATEGIES_DIR / strategy_name
+    if not strategy_dir.exists():
+        return jsonify({'error': f'策略 "{strategy_name}" 不存在'}), 404
+    if mode not in ['backtest', 'simulation']:
+        return jsonify({'error': '无效的运行模式'}), 400
+    if not isinstance(grid, dict) or not grid:
+        return jsonify({'error': '参数网格不能为空'}), 400
+    if not in_sample or not out_of_sample:
+        return jsonify({'error': '必须指定 in_sample 和 out_of_sample 周期'}), 400
+
+    # 默认使用策略配置中的回测区间
+    start_date, end_date = data.get('start_date'), data.get('end_date')
+    if not start_date or not end_date:
+        try:
+            with open(strategy_dir / 'config.yaml', 'r', encoding='utf-8') as f:
+                engine = (yaml.safe_load(f) or {}).get('engine', {})
+        except Exception as e:
+            return jsonify({'error': f'配置文件解析失败: {str(e)}'}), 500
+        start_date = start_date or engine.get('start_date')
+        end_date = end_date or engine.get('end_date')
+
+    try:
+        windows = build_windows(parse_date(start_date), parse_date(end_date), in_sample, out_of_sample, data.get('step'))
+        combos = expand_grid(grid)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'参数不合法: {str(e)}'}), 400
+
+    if not windows:
+        return jsonify({'error': '回测区间不足以切分出任何窗口'}), 400
+    if len(windows) * len(combos) > MAX_VARIANTS:
+        return jsonify({'error': f'总运行数 {len(windows) * len(combos)} 超过上限 {MAX_VARIANTS}'}), 400
+
+    wf = {
+        'wf_id': uuid.uuid4().hex,
+        'strategy': strategy_name,
+        'mode': mode,
+        'grid': grid,
+        'start_date': str(start_date),
+        'end_date': str(end_date),
+        'in_sample': in_sample,
+        'out_of_sample': out_of_sample,
+        'step': data.get('step') or out_of_sample,
+        'metric': data.get('metric', 'final_return'),
+        'metric_order': data.get('metric_order', 'desc'),
+        'priority': data.get('priority', 0),
+        'status': 'running',
+        'created_at': time.time(),
+        'finished_at': None,
+        'combined_return': None,
+        'windows': windows
+    }
+
+    # 所有窗口的样本内扫描一次性提交，由调度器并行执行
+    for window in windows:
+        sweep = start_sweep(strategy_name, mode, grid, combos, priority=wf['priority'], fixed_params={
+            'engine.start_date': window['is_start'],
+            'engine.end_date': window['is_end']
+        })
+        window['sweep_id'] = sweep['sweep_id']
+        window['status'] = 'in_sample'
+
+    save_walkforward(wf)
+    start_orchestrator(wf['wf_id'])
+
+    return jsonify({
+        'success': True,
+        'message': f'已创建 {len(windows)} 个窗口的走步优化',
+        'wf_id': wf['wf_id'],
+        'windows': windows
+    }), 202
+
+
+@walkforward_bp.route('/strategies/<strategy_name>/walkforward', methods=['GET'])
+@login_required
+def list_walkforwards(strategy_name):
+    """列出策略的所有走步优化"""
+    items = []
+    if WALKFORWARD_DIR.exists():
+        for wf_path in WALKFORWARD_DIR.glob('*.json'):
+            try:
+                with open(wf_path, 'r', encoding='utf-8') as f:
+                    wf = json.load(f)
+            except Exception:
+                continue
+            if wf.get('strategy') == strategy_name:
+                items.append({key: wf.get(key) for key in (
+                    'wf_id', 'mode', 'status', 'start_date', 'end_date', 'created_at', 'combined_return'
+                )})
+    items.sort(key=lambda x: x['created_at'], reverse=True)
+    return jsonify({'walkforwards': items})
+
+
+@walkforward_bp.route('/walkforward/<wf_id>', methods=['GET'])
+@login_required
+def get_walkforward(wf_id):
+    """获取走步优化的状态和每个窗口的结果"""
+    wf = load_walkforward(wf_id)
+    if not wf:
+        return jsonify({'error': '走步优化不存在'}), 404
+    return jsonify(wf)
+
+
+@walkforward_bp.route('/walkforward/<wf_id>/equity', methods=['GET'])
+@login_required
+def get_walkforward_equity(wf_id):
+    """获取拼接后的样本外收益曲线"""
+    wf = load_walkforward(wf_id)
+    if not wf:
+        return jsonify({'error': '走步优化不存在'}), 404
+    equity_path = WALKFORWARD_DIR / f'{wf_id}_equity.csv'
+    if not equity_path.exists():
+        return jsonify({'error': '样本外收益曲线尚未生成', 'status': wf['status']}), 404
+
+    with open(equity_path, 'r', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    return jsonify({
+        'wf_id': wf_id,
+        'dates': [row['date'] for row in rows],
+        'windows': [int(row['window']) for row in rows],
+        'returns': [float(row['returns']) for row in rows],
+        'combined_return': wf.get('combined_return')
+    })
+
+
+@walkforward_bp.route('/walkforward/<wf_id>', methods=['DELETE'])
+@login_required
+def cancel_walkforward(wf_id):
+    """取消走步优化：停止编排并取消所有仍在排队的运行"""
+    wf = load_walkforward(wf_id)
+    if not wf:
+        return jsonify({'error': '走步优化不存在'}), 404
+
+    with get_wf_lock(wf_id):
+        wf = load_walkforward(wf_id)
+        if wf['status'] == 'running':
+            cancel_requests.add(wf_id)
+            wf['status'] = 'cancelled'
+            wf['finished_at'] = time.time()
+            save_walkforward(wf)
+
+    cancelled = 0
+    for window in wf['windows']:
+        sweep = load_sweep(window.get('sweep_id')) if window.get('sweep_id') else None
+        for variant in (sweep or {}).get('variants', []):
+            cancelled += run_scheduler.cancel(variant['queue_id'])
+        if window.get('oos_queue_id'):
+            cancelled += run_scheduler.cancel(window['oos_queue_id'])
+
+    return jsonify({'success': True, 'message': f'走步优化已取消，取消了 {cancelled} 个排队中的运行'})
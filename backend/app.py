@@ -12,6 +12,10 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
+# 生产模式（server.async_mode 为 gevent）需要在导入 Flask 等模块之前打补丁
+from backend.utils.concurrency import configure_async_mode, serve_gevent
+ASYNC_MODE = configure_async_mode(project_root / 'myquant_config.json')
+
 from flask import Flask, session
 from flask_cors import CORS
 import json
@@ -42,7 +46,7 @@ CORS(app, origins=[frontend_origin], supports_credentials=True)
 
 # 创建SocketIO实例
 from backend.extensions import socketio
-socketio.init_app(app, cors_allowed_origins="*", async_mode='threading')
+socketio.init_app(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
 
 logger.info("SDK客户端初始化成功")
 
@@ -52,12 +56,24 @@ from backend.api.strategies import strategies_bp
 from backend.api.runs import runs_bp
 from backend.api.docs import docs_bp
 from backend.api.libraries import libraries_bp
+from backend.api.queue import queue_bp
+from backend.api.sweeps import sweeps_bp
+from backend.api.walkforward import walkforward_bp
+from backend.api.shards import shards_bp
+from backend.api.compare import compare_bp
+from backend.api.dashboard import dashboard_bp
 
 app.register_blueprint(auth_bp, url_prefix='/api')
 app.register_blueprint(strategies_bp, url_prefix='/api')
 app.register_blueprint(runs_bp, url_prefix='/api')
 app.register_blueprint(docs_bp, url_prefix='/api')
 app.register_blueprint(libraries_bp, url_prefix='/api')
+app.register_blueprint(queue_bp, url_prefix='/api')
+app.register_blueprint(sweeps_bp, url_prefix='/api')
+app.register_blueprint(walkforward_bp, url_prefix='/api')
+app.register_blueprint(shards_bp, url_prefix='/api')
+app.register_blueprint(compare_bp, url_prefix='/api')
+app.register_blueprint(dashboard_bp, url_prefix='/api')
 
 # 导入Socket.IO事件处理器
 from backend.api.monitoring import register_socketio_events
@@ -87,6 +103,10 @@ def cleanup_idle_paused_runs():
 
                     logger.info(f"清理空闲的暂停实例: {run_id}")
 
+                    # 先从 active_runs 移除，进程监视器收到退出事件时不再按结束处理
+                    if active_runs.pop(run_id, None) is None:
+                        continue
+
                     # 终止进程
                     pid = info.get('pid')
                     if pid:
@@ -107,9 +127,6 @@ def cleanup_idle_paused_runs():
                     if port:
                         release_port(port)
 
-                    # 从 active_runs 移除
-                    del active_runs[run_id]
-
                     # 通知前端：仍然是暂停状态（进程终止但 pause.pkl 还在）
                     socketio.emit('run_status_changed', {
                         'run_id': run_id,
@@ -136,5 +153,29 @@ if __name__ == '__main__':
     cleanup_thread.start()
     logger.info("后台清理线程已启动")
 
-    logger.info(f"启动 MyQuant Platform 服务器: http://{host}:{port}")
-    socketio.run(app, host=host, port=port, debug=False, allow_unsafe_werkzeug=True)
+    # 重新接管上次退出前仍在运行的 qtrader 进程
+    from backend.api.runs import reattach_runs
+    reattach_runs()
+
+    # 启动预热运行器进程池
+    from backend.api.runs import runner_pool
+    runner_pool.start()
+
+    # 启动运行调度器（恢复持久化的队列）
+    from backend.api.runs import run_scheduler
+    run_scheduler.start()
+
+    # 继续编排未结束的走步优化
+    from backend.api.walkforward import resume_walkforwards
+    resume_walkforwards()
+
+    # 继续编排未结束的分片运行
+    from backend.api.shards import resume_sharded_runs
+    resume_sharded_runs()
+
+    logger.info(f"启动 MyQuant Platform 服务器: http://{host}:{port} (async_mode: {ASYNC_MODE})")
+    if ASYNC_MODE == 'gevent':
+        # gevent 的 WSGI 服务器，HTTP 与 WebSocket 都由协程处理
+        serve_gevent(app, host, port)
+    else:
+        socketio.run(app, host=host, port=port, debug=False, allow_unsafe_werkzeug=True)
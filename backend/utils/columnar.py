@@ -0,0 +1,156 @@
+# myquant/backend/utils/columnar.py
+"""
+运行产物的列式副本。
+
+运行结束（finished / interrupted）后，把工作区根目录下的 CSV（equity.csv、成交、订单、持仓等）
+逐列转换为 .npy 文件，存放在 <工作区>/columnar/<文件名>/ 下：
+- 数值列保存为 float64（空值为 NaN），其余列保存为定长 Unicode 数组
+- 标识类的列即使看起来像数字也保留为字符串：第一列（时间）、列名表明是日期/时间/代码/编号的列
+  （见 is_identifier_column），以及带前导零的整数（如股票代码 000001）或超过 15 位的整数
+- _meta.json 记录列名、列文件、行数以及源 CSV 的 mtime 和大小，源文件变化后副本自动视为过期
+读取时使用内存映射（np.load(mmap_mode='r')），只有真正访问的列和行才会读入内存。
+
+在 notebook 中使用:
+    from backend.utils.columnar import load_table
+    equity = load_table('strategies/xxx/strategy/backtest/20250101_093000', 'equity')
+    equity['returns'][-1]
+"""
+
+import csv
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+COLUMNAR_DIRNAME = 'columnar'
+META_FILENAME = '_meta.json'
+# 副本格式版本，列类型规则变化后旧副本视为过期并重新生成
+FORMAT_VERSION = 2
+
+# 列名（按 _ 和空白切分后）含有这些词，或以 date / time 结尾的列保留为字符串
+IDENTIFIER_TOKENS = ('date', 'time', 'datetime', 'timestamp', 'dt', 'symbol', 'code', 'id', 'name', 'exchange')
+# 带前导零的整数（代码）或超过 15 位的整数（float64 无法精确表示的编号、时间戳）
+IDENTIFIER_VALUE = re.compile(r'^[+-]?(0\d+|\d{16,})$')
+
+
+def _source_stamp(csv_path):
+    stat = Path(csv_path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def is_identifier_column(name):
+    """按列名判断是否为日期、时间、代码等标识列"""
+    tokens = [token for token in re.split(r'[_\s]+', name.strip().lower()) if token]
+    return any(token in IDENTIFIER_TOKENS or token.endswith(('date', 'time')) for token in tokens)
+
+
+def _to_array(values, keep_strings=False):
+    """
+    数值列转为 float64（空字符串为 NaN），无法转换的列保留为字符串
+    keep_strings 为 True，或存在带前导零、超长的整数值时整列保留为字符串
+    """
+    array = np.array(values, dtype=str) if values else np.array([], dtype=str)
+    if keep_strings or any(IDENTIFIER_VALUE.match(value) for value in values):
+        return array
+    empty = array == ''
+    try:
+        numeric = np.full(array.shape, np.nan)
+        numeric[~empty] = array[~empty].astype(float)
+        return numeric
+    except ValueError:
+        return array
+
+
+def table_dir(workspace_dir, name):
+    return Path(workspace_dir) / COLUMNAR_DIRNAME / name
+
+
+def is_fresh(workspace_dir, name):
+    """列式副本是否存在且与源 CSV 一致"""
+    csv_path = Path(workspace_dir) / f'{name}.csv'
+    meta_path = table_dir(workspace_dir, name) / META_FILENAME
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return (meta.get('version') == FORMAT_VERSION
+                and [meta['mtime_ns'], meta['size']] == list(_source_stamp(csv_path)))
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def convert_csv(csv_path, out_dir):
+    """把一个 CSV 转换为按列存放的 .npy 文件，先写入临时目录再整体替换"""
+    csv_path = Path(csv_path)
+    out_dir = Path(out_dir)
+    stamp = _source_stamp(csv_path)
+
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = [row for row in reader if row]
+    columns = list(zip(*rows)) if rows else [()] * len(header)
+
+    tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    meta = {'version': FORMAT_VERSION, 'source': csv_path.name, 'mtime_ns': stamp[0], 'size': stamp[1],
+            'rows': len(rows), 'columns': []}
+    for index, name in enumerate(header):
+        values = list(columns[index]) if index < len(columns) else []
+        # 第一列是时间（各产物都以它排序），始终保留为字符串
+        array = _to_array(values, keep_strings=index == 0 or is_identifier_column(name))
+        filename = f'c{index}.npy'
+        np.save(tmp_dir / filename, array)
+        meta['columns'].append({'name': name, 'file': filename, 'dtype': array.dtype.str})
+    with open(tmp_dir / META_FILENAME, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return meta
+
+
+def convert_workspace(workspace_dir):
+    """
+    转换工作区根目录下所有 CSV 的列式副本（已是最新的跳过）
+    返回: 本次转换的表名列表
+    """
+    converted = []
+    for csv_path in sorted(Path(workspace_dir).glob('*.csv')):
+        name = csv_path.stem
+        if is_fresh(workspace_dir, name):
+            continue
+        try:
+            convert_csv(csv_path, table_dir(workspace_dir, name))
+            converted.append(name)
+        except (OSError, ValueError, csv.Error) as e:
+            print(f"转换列式副本失败 ({csv_path}): {e}")
+    return converted
+
+
+def needs_conversion(workspace_dir):
+    """工作区是否有 CSV 缺少最新的列式副本"""
+    return any(not is_fresh(workspace_dir, path.stem) for path in Path(workspace_dir).glob('*.csv'))
+
+
+def load_table(workspace_dir, name, columns=None, mmap=True):
+    """
+    以内存映射方式读取列式副本
+    返回: {列名: ndarray}（保持 CSV 中的列顺序）；副本不存在或已过期时返回 None
+    """
+    if not is_fresh(workspace_dir, name):
+        return None
+    directory = table_dir(workspace_dir, name)
+    with open(directory / META_FILENAME, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    # 空数组无法内存映射
+    mmap_mode = 'r' if mmap and meta['rows'] else None
+    table = {}
+    for column in meta['columns']:
+        if columns is None or column['name'] in columns:
+            table[column['name']] = np.load(directory / column['file'], mmap_mode=mmap_mode)
+    return table
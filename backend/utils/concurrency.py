@@ -0,0 +1,81 @@
+# myquant/backend/utils/concurrency.py
+"""
+后端的并发模式（myquant_config.json 中的 server.async_mode）。
+
+- threading（默认）：Werkzeug 开发服务器，每个阻塞调用（启动握手、pip 安装、final_status 等待、监控中继）占用一个操作系统线程
+- gevent（生产）：启动时对标准库打 monkey patch，socket / subprocess / time.sleep / threading 等都变为协作式，
+  由 gevent 的 WSGI 服务器提供 HTTP 和 WebSocket 服务，数千个连接和后台任务只占用少量线程；
+  CPU 密集的计算（numpy 指标、列式转换）通过 run_cpu_bound 放到原生线程池执行，避免阻塞事件循环
+
+本模块必须在导入 Flask、threading 相关模块之前调用 configure_async_mode，因此只依赖标准库的 json。
+"""
+
+import json
+import sys
+
+ASYNC_MODES = ('threading', 'gevent')
+ASYNC_MODE = 'threading'
+
+
+def configure_async_mode(config_path):
+    """
+    读取配置并在需要时打补丁，返回实际使用的模式
+    配置为 gevent 但未安装 gevent 时退回 threading
+    """
+    global ASYNC_MODE
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            mode = json.load(f).get('server', {}).get('async_mode', 'threading')
+    except (OSError, ValueError):
+        mode = 'threading'
+
+    if mode not in ASYNC_MODES:
+        print(f"未知的 server.async_mode: {mode}，使用 threading", file=sys.stderr)
+        mode = 'threading'
+
+    if mode == 'gevent':
+        try:
+            from gevent import monkey
+        except ImportError:
+            print("server.async_mode 为 gevent 但未安装 gevent（pip install gevent），使用 threading", file=sys.stderr)
+            mode = 'threading'
+        else:
+            monkey.patch_all()
+
+    ASYNC_MODE = mode
+    return mode
+
+
+def run_cpu_bound(fn, *args, **kwargs):
+    """
+    执行 CPU 密集的函数并返回结果
+    gevent 模式下在原生线程池中执行（当前协程让出，其它请求照常处理），threading 模式下直接调用
+    fn 中不应使用 threading 锁（打补丁后是协程锁，不能跨原生线程使用）
+    """
+    if ASYNC_MODE != 'gevent':
+        return fn(*args, **kwargs)
+    from gevent import get_hub
+    return get_hub().threadpool.apply(fn, args, kwargs)
+
+
+def serve_gevent(app, host, port):
+    """
+    gevent 模式下启动 WSGI 服务器（代替 socketio.run）
+    - 安装了 gevent-websocket 时由它处理 WebSocket，否则退回 simple-websocket
+    - 连接开启 TCP_NODELAY：pywsgi 分两次写入响应头和响应体，keep-alive 连接上
+      Nagle 算法与客户端的延迟确认叠加会让每个请求多等约 40ms
+    """
+    import socket
+    from gevent import pywsgi
+    try:
+        from geventwebsocket.handler import WebSocketHandler as handler_class
+    except ImportError:
+        handler_class = pywsgi.WSGIHandler
+
+    class NoDelayWSGIServer(pywsgi.WSGIServer):
+        def handle(self, sock, address):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            super().handle(sock, address)
+
+    # 与 socketio.run(debug=False) 一致，不输出访问日志
+    NoDelayWSGIServer((host, port), app, handler_class=handler_class, log=None).serve_forever()
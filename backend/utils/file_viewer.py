@@ -0,0 +1,186 @@
+# myquant/backend/utils/file_viewer.py
+"""
+大文件分段查看。
+
+工作区中的日志和 CSV 可能有数 GB（tick 级运行），前端查看时只读取需要的部分：
+- read_bytes: 按字节范围读取
+- tail_lines: 从文件末尾向前读取最后 N 行（最多向前扫描 MAX_TAIL_BYTES 字节）
+- read_lines: 按行号分页，依赖行索引
+
+行索引每隔 LINE_INDEX_STEP 行记录一次该行的起始字节偏移，按文件路径缓存；
+文件只是追加了内容（运行中的日志）时从上次索引到的位置继续扫描，不会从头重建。
+扫描在 run_cpu_bound 中执行，只持有该文件自己的锁，其它文件的查看不受影响。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.utils.concurrency import run_cpu_bound
+
+LINE_INDEX_STEP = 1000
+SCAN_CHUNK_SIZE = 4 * 1024 * 1024
+TAIL_BLOCK_SIZE = 64 * 1024
+MAX_TAIL_BYTES = 8 * 1024 * 1024
+INDEX_CACHE_SIZE = 64
+
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()  # 只保护缓存本身，扫描期间不持有
+_path_locks = {}  # {path: [lock, 使用者数]}：同一文件的索引更新串行执行，没有使用者时才会被清理
+
+
+def _decode(data):
+    return data.decode('utf-8', errors='replace')
+
+
+class LineIndex:
+    """一个文件的稀疏行索引"""
+
+    def __init__(self):
+        self.checkpoints = [0]  # 第 i * LINE_INDEX_STEP 行的起始偏移
+        self.newlines = 0
+        self.size = 0
+        self.mtime_ns = None
+        self.last_byte = b''
+
+    @property
+    def total_lines(self):
+        # 最后一行没有换行符时也计为一行
+        return self.newlines + (1 if self.size and self.last_byte != b'\n' else 0)
+
+    def copy(self):
+        index = LineIndex()
+        index.checkpoints = list(self.checkpoints)
+        index.newlines = self.newlines
+        index.size = self.size
+        index.mtime_ns = self.mtime_ns
+        index.last_byte = self.last_byte
+        return index
+
+    def extend(self, path, size, mtime_ns):
+        """从已索引的位置继续扫描到 size"""
+        with open(path, 'rb') as f:
+            f.seek(self.size)
+            offset = self.size
+            while offset < size:
+                chunk = f.read(min(SCAN_CHUNK_SIZE, size - offset))
+                if not chunk:
+                    break
+                positions = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)
+                if positions.size:
+                    # 第 n 个换行符之后是第 n 行（从 0 开始）的起点
+                    line_numbers = self.newlines + 1 + np.arange(positions.size)
+                    hits = positions[line_numbers % LINE_INDEX_STEP == 0]
+                    self.checkpoints.extend(int(offset + position + 1) for position in hits)
+                    self.newlines += int(positions.size)
+                offset += len(chunk)
+                self.last_byte = chunk[-1:]
+        self.size = offset
+        self.mtime_ns = mtime_ns
+
+
+def get_line_index(path):
+    """
+    取得（必要时创建或增量更新）文件的行索引
+    增量更新在副本上进行，其它请求正在使用的旧索引不会被修改
+    """
+    path = os.fspath(path)
+    with _index_lock:
+        entry = _path_locks.setdefault(path, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            return _update_line_index(path)
+    finally:
+        with _index_lock:
+            entry[1] -= 1
+            # 索引已被淘汰且没有其它请求持有或等待该锁时一并清理
+            if entry[1] == 0 and path not in _index_cache and _path_locks.get(path) is entry:
+                del _path_locks[path]
+
+
+def _update_line_index(path):
+    """在持有该文件的锁时调用"""
+    stat = os.stat(path)
+    with _index_lock:
+        index = _index_cache.get(path)
+    if index is None or stat.st_size < index.size:
+        index = LineIndex()
+    elif index.mtime_ns != stat.st_mtime_ns or index.size != stat.st_size:
+        index = index.copy()
+    if index.mtime_ns != stat.st_mtime_ns or index.size != stat.st_size:
+        run_cpu_bound(index.extend, path, stat.st_size, stat.st_mtime_ns)
+
+    with _index_lock:
+        _index_cache[path] = index
+        _index_cache.move_to_end(path)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            evicted, _ = _index_cache.popitem(last=False)
+            evicted_entry = _path_locks.get(evicted)
+            if evicted_entry is not None and evicted_entry[1] == 0:
+                del _path_locks[evicted]
+    return index
+
+
+def read_bytes(path, start, length):
+    """读取 [start, start + length) 字节，返回 (data, 文件大小)"""
+    size = os.path.getsize(path)
+    start = max(0, min(start, size))
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(max(0, length)), size
+
+
+def read_lines(path, offset, limit):
+    """
+    按行号分页读取
+    返回: {lines, offset, total_lines, next_offset}，next_offset 为 None 表示已到文件末尾
+    """
+    index = get_line_index(path)
+    total_lines = index.total_lines
+    offset = max(0, min(offset, total_lines))
+    checkpoint = min(offset // LINE_INDEX_STEP, len(index.checkpoints) - 1)
+    lines = []
+    with open(path, 'rb') as f:
+        f.seek(index.checkpoints[checkpoint])
+        for _ in range(offset - checkpoint * LINE_INDEX_STEP):
+            f.readline()
+        while len(lines) < limit:
+            line = f.readline()
+            if not line:
+                break
+            lines.append(_decode(line).rstrip('\r\n'))
+    end = offset + len(lines)
+    return {
+        'lines': lines,
+        'offset': offset,
+        'total_lines': total_lines,
+        'next_offset': end if end < total_lines else None
+    }
+
+
+def tail_lines(path, count, max_bytes=MAX_TAIL_BYTES):
+    """
+    读取最后 count 行，返回 (lines, 文件大小, truncated)
+    最多向前扫描 max_bytes 字节；扫描到上限仍不足 count 行时 truncated 为 True（行很长的文件只返回上限内的完整行）
+    """
+    size = os.path.getsize(path)
+    blocks = []
+    newlines = 0
+    position = size
+    with open(path, 'rb') as f:
+        # 多读一个换行符，保证第一行是完整的
+        while position > 0 and newlines <= count and size - position < max_bytes:
+            read_size = min(TAIL_BLOCK_SIZE, position, max_bytes - (size - position))
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            newlines += block.count(b'\n')
+            blocks.append(block)
+    lines = b''.join(reversed(blocks)).splitlines()
+    if position > 0:
+        lines = lines[1:]
+    truncated = position > 0 and newlines <= count
+    return [_decode(line) for line in lines[-count:]] if count else [], size, truncated
@@ -0,0 +1,304 @@
+# myquant/backend/utils/metrics.py
+"""
+运行绩效指标计算。
+
+从工作区的资金曲线（优先使用列式副本，否则向量化解析 equity.csv）读取净值（分钟/tick 频率的运行先按交易日取收盘净值），
+计算一组标准指标：累计/年化收益率、波动率、夏普、索提诺、最大回撤及其持续天数、卡玛比率、胜率。
+结果按工作区缓存，以 equity.csv 的 mtime 和大小作为缓存键，文件不变时不会重新解析。
+多个运行的对比把各自的净值对齐到同一日期索引上，组成矩阵后一次性计算。
+"""
+
+import csv
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from backend.utils.columnar import load_table
+from backend.utils.concurrency import run_cpu_bound
+
+EQUITY_FILENAME = 'equity.csv'
+EQUITY_TABLE = 'equity'
+TRADING_DAYS_PER_YEAR = 252
+
+# 最多缓存的条目数（每个工作区的净值序列和指标各占一条）
+CACHE_SIZE = 2048
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _finite(value):
+    """把 numpy 数值转换为可 JSON 序列化的 float，NaN/inf 转为 None"""
+    if value is None:
+        return None
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _equity_from_columns(dates, columns):
+    """由日期列和 {列名: 数组} 得出 (dates, nav)"""
+    if 'returns' in columns:
+        values = np.asarray(columns['returns'], dtype=float)
+        nav = 1.0 + values
+    elif 'total_value' in columns:
+        values = np.asarray(columns['total_value'], dtype=float)
+        nav = values / values[0] if values.size else values
+    else:
+        return None
+    if values.size == 0:
+        return None
+    return np.asarray(dates), nav
+
+
+def load_equity(workspace_dir):
+    """
+    读取资金曲线，优先使用列式副本（内存映射），没有时向量化解析 equity.csv
+    返回: (dates, nav)，dates 为字符串数组（第一列），nav 为以初始资金为 1 的净值数组；文件不存在或为空时返回 None
+    净值优先由累计收益率 returns 列得出，没有该列时用 total_value 归一化
+    """
+    table = load_table(workspace_dir, EQUITY_TABLE)
+    if table:
+        names = list(table)
+        return _equity_from_columns(table[names[0]], table)
+
+    equity_csv = Path(workspace_dir) / EQUITY_FILENAME
+    if not equity_csv.exists():
+        return None
+    with open(equity_csv, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f), None)
+    if not header:
+        return None
+
+    wanted = [name for name in ('returns', 'total_value') if name in header][:1]
+    if not wanted:
+        return None
+    dates = np.loadtxt(equity_csv, delimiter=',', skiprows=1, usecols=0, dtype=str, ndmin=1, encoding='utf-8')
+    values = np.loadtxt(equity_csv, delimiter=',', skiprows=1, usecols=header.index(wanted[0]), dtype=float,
+                        ndmin=1, encoding='utf-8')
+    return _equity_from_columns(dates, {wanted[0]: values})
+
+
+def daily_nav(dates, nav):
+    """日内频率的资金曲线按交易日取最后一个净值（日期取时间戳的前10个字符）"""
+    days = dates.astype('U10')
+    if days.size < 2 or not np.any(days[1:] == days[:-1]):
+        return days, nav
+    last_of_day = np.append(np.flatnonzero(days[1:] != days[:-1]), days.size - 1)
+    return days[last_of_day], nav[last_of_day]
+
+
+def drawdown_series(nav):
+    """回撤序列（相对历史最高净值，初始净值为 1）"""
+    peak = np.maximum.accumulate(np.maximum(nav, 1.0))
+    return nav / peak - 1.0
+
+
+def compute_metrics(dates, nav, risk_free_rate=0.0):
+    """根据资金曲线计算绩效指标"""
+    days, nav = daily_nav(dates, nav)
+    n = nav.size
+
+    # 第一天相对初始资金（净值 1）计算收益
+    returns = nav / np.concatenate(([1.0], nav[:-1])) - 1.0
+    total_return = nav[-1] - 1.0
+    annual_return = nav[-1] ** (TRADING_DAYS_PER_YEAR / n) - 1.0 if nav[-1] > 0 else None
+
+    excess = returns - risk_free_rate / TRADING_DAYS_PER_YEAR
+    volatility = sharpe = sortino = None
+    if n > 1:
+        std = returns.std(ddof=1)
+        volatility = std * np.sqrt(TRADING_DAYS_PER_YEAR)
+        if std > 0:
+            sharpe = excess.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR)
+        downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+        if downside > 0:
+            sortino = excess.mean() / downside * np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    # 最大回撤及持续时间（从前一个高点到重新创出新高之间的交易日数）
+    drawdown = drawdown_series(nav)
+    trough = int(np.argmin(drawdown))
+    max_drawdown = drawdown[trough]
+    peak_index = int(np.argmax(nav[:trough + 1])) if nav[:trough + 1].max() >= 1.0 else None
+    at_peak = np.concatenate(([-1], np.flatnonzero(drawdown >= 0), [n]))
+    max_drawdown_duration = int(np.max(np.diff(at_peak)) - 1)
+
+    calmar = None
+    if annual_return is not None and max_drawdown < 0:
+        calmar = annual_return / abs(max_drawdown)
+
+    active_days = np.count_nonzero(returns)
+    win_rate = np.count_nonzero(returns > 0) / active_days if active_days else None
+
+    return {
+        'start_date': str(days[0]),
+        'end_date': str(days[-1]),
+        'trading_days': int(n),
+        'final_return': _finite(total_return),
+        'total_return': _finite(total_return),
+        'annual_return': _finite(annual_return),
+        'volatility': _finite(volatility),
+        'sharpe': _finite(sharpe),
+        'sortino': _finite(sortino),
+        'max_drawdown': _finite(max_drawdown),
+        'max_drawdown_start': str(days[peak_index]) if peak_index is not None else str(days[0]),
+        'max_drawdown_end': str(days[trough]),
+        'max_drawdown_duration': max_drawdown_duration,
+        'calmar': _finite(calmar),
+        'win_rate': _finite(win_rate)
+    }
+
+
+def _cached(kind, workspace_dir, compute):
+    """
+    按工作区缓存 compute() 的结果，缓存键为 equity.csv 的 (mtime, size)
+    运行中的工作区每次写入资金曲线后缓存自动失效；没有 equity.csv 时返回 None
+    compute 经 run_cpu_bound 在原生线程中执行，不能取锁，也不能再调用 _cached
+    """
+    equity_csv = Path(workspace_dir) / EQUITY_FILENAME
+    try:
+        stat = equity_csv.stat()
+    except OSError:
+        return None
+
+    key = (kind, str(Path(workspace_dir).resolve()))
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    value = run_cpu_bound(compute)
+
+    with _cache_lock:
+        _cache[key] = (stamp, value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def get_daily_nav(workspace_dir):
+    """获取工作区按交易日的净值序列 (days, nav)（带缓存），没有资金曲线时返回 None"""
+    def compute():
+        try:
+            equity = load_equity(workspace_dir)
+        except ValueError as e:
+            print(f"Error reading equity.csv: {e}")
+            return None
+        return daily_nav(*equity) if equity else None
+    return _cached('daily_nav', workspace_dir, compute)
+
+
+def get_equity_metrics(workspace_dir, risk_free_rate=0.0):
+    """获取工作区的绩效指标（带缓存），没有资金曲线时返回 None"""
+    # 净值序列在调用方取得：交给 run_cpu_bound 的函数只做 NumPy 计算，不能重入 _cached（不能在原生线程中取锁）
+    daily = get_daily_nav(workspace_dir)
+    if daily is None:
+        return None
+
+    def compute():
+        return compute_metrics(*daily, risk_free_rate=risk_free_rate)
+    return _cached(('metrics', risk_free_rate), workspace_dir, compute)
+
+
+def _to_list(array, decimals=6):
+    """numpy 数组转为嵌套列表（保留 decimals 位小数以减小响应体积），NaN/inf 转为 None"""
+    array = np.asarray(array, dtype=float)
+    result = np.round(array, decimals).astype(object)
+    result[~np.isfinite(array)] = None
+    return result.tolist()
+
+
+def align_navs(series):
+    """
+    把多条按交易日的净值序列对齐到同一日期索引（所有序列日期的并集）
+    每条序列在自己的区间内向前填充，区间之外为 NaN
+    返回: (index, matrix)，matrix 形状为 (序列数, 日期数)
+    """
+    index = np.unique(np.concatenate([days for days, _ in series]))
+    matrix = np.full((len(series), index.size), np.nan)
+    for row, (days, nav) in enumerate(series):
+        matrix[row, np.searchsorted(index, days)] = nav
+        last = np.searchsorted(index, days[-1])
+        matrix[row, last + 1:] = -np.inf  # 区间结束后的位置不参与向前填充
+
+    # 向前填充：每个位置取该行到此为止最后一个有值的位置
+    valid = ~np.isnan(matrix)
+    positions = np.where(valid, np.arange(index.size), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    filled = np.take_along_axis(matrix, positions, axis=1)
+    filled[~np.maximum.accumulate(valid, axis=1)] = np.nan
+    filled[np.isinf(filled)] = np.nan
+    return index, filled
+
+
+def _sample_columns(size, max_points):
+    """在时间轴上均匀抽取最多 max_points 个位置（总是包含首尾）"""
+    if not max_points or size <= max_points:
+        return np.arange(size)
+    return np.unique(np.linspace(0, size - 1, int(max_points)).round().astype(int))
+
+
+def compare_navs(series, rolling_window=60, base_index=0, max_points=500):
+    """
+    对比多条净值序列，所有指标都在公共区间（所有序列都有数据的日期）上以矩阵运算得出
+    series: [(days, nav), ...]
+    max_points 限制返回的时间序列点数（只影响输出，指标仍基于全部数据计算）
+    返回: dates、各序列的累计收益与回撤、收益相关系数矩阵、回撤重叠度矩阵、滚动夏普、相对基准的超额收益
+    """
+    index, matrix = align_navs(series)
+    common = ~np.isnan(matrix).any(axis=0)
+    dates = index[common]
+    nav = matrix[:, common]
+    if dates.size == 0:
+        raise ValueError('所选运行没有公共的日期区间')
+
+    # 以公共区间起点为基准重新归一
+    nav = nav / nav[:, :1]
+    returns = nav[:, 1:] / nav[:, :-1] - 1.0
+    peak = np.maximum.accumulate(nav, axis=1)
+    drawdown = nav / peak - 1.0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = np.corrcoef(returns) if returns.shape[1] > 1 else np.full((len(series),) * 2, np.nan)
+
+        # 回撤重叠度：两者同时处于回撤的天数 / 任一处于回撤的天数
+        in_drawdown = (drawdown < -1e-12).astype(float)
+        both = in_drawdown @ in_drawdown.T
+        days_in_drawdown = in_drawdown.sum(axis=1)
+        overlap = both / (days_in_drawdown[:, None] + days_in_drawdown[None, :] - both)
+
+        # 滚动夏普：用累加和一次性得到所有窗口的均值与方差
+        window = int(rolling_window)
+        rolling_sharpe = np.full(returns.shape, np.nan)
+        if 1 < window <= returns.shape[1]:
+            zeros = np.zeros((returns.shape[0], 1))
+            cumsum = np.concatenate((zeros, np.cumsum(returns, axis=1)), axis=1)
+            cumsum_sq = np.concatenate((zeros, np.cumsum(returns ** 2, axis=1)), axis=1)
+            window_sum = cumsum[:, window:] - cumsum[:, :-window]
+            window_sum_sq = cumsum_sq[:, window:] - cumsum_sq[:, :-window]
+            mean = window_sum / window
+            variance = (window_sum_sq - window * mean ** 2) / (window - 1)
+            std = np.sqrt(np.maximum(variance, 0.0))
+            rolling_sharpe[:, window - 1:] = mean / std * np.sqrt(TRADING_DAYS_PER_YEAR)
+
+        relative = nav / nav[base_index] - 1.0
+
+    columns = _sample_columns(dates.size, max_points)
+    sharpe_columns = _sample_columns(dates.size - 1, max_points)
+    return {
+        'dates': dates[columns].tolist(),
+        'cumulative_returns': _to_list(nav[:, columns] - 1.0),
+        'drawdowns': _to_list(drawdown[:, columns]),
+        'total_returns': _to_list(nav[:, -1] - 1.0),
+        'max_drawdowns': _to_list(drawdown.min(axis=1)),
+        'correlation': _to_list(correlation),
+        'drawdown_overlap': _to_list(overlap),
+        'rolling_window': window,
+        'rolling_sharpe_dates': dates[1:][sharpe_columns].tolist(),
+        'rolling_sharpe': _to_list(rolling_sharpe[:, sharpe_columns]),
+        'relative_performance': _to_list(relative[:, columns])
+    }
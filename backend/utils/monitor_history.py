@@ -0,0 +1,120 @@
+# myquant/backend/utils/monitor_history.py
+"""
+监控数据的历史缓冲（供中途打开监控页面的订阅者补齐图表）。
+
+运行器事件通道转发的监控采样（或中继收到的 update）都会被记录：
+- 时间序列：overview.portfolio（账户权益等）和 overview.benchmark 中的数值字段，以 overview.current_dt 为时间
+- 订单：orders.orders 中出现过的订单，按订单号去重后保留最近 max_orders 条
+
+时间序列的点数上限为 capacity：写满后隔一个点丢弃一个，并把之后的采样间隔加倍，
+这样无论运行多长，缓冲区都以均匀降采样的形式覆盖整个运行过程，内存占用固定。
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+# 序列名 -> update 中的路径
+SERIES_PATHS = {
+    'equity': ('overview', 'portfolio'),
+    'benchmark': ('overview', 'benchmark'),
+}
+TIME_PATH = ('overview', 'current_dt')
+ORDERS_PATH = ('orders', 'orders')
+ORDER_ID_KEYS = ('order_id', 'id')
+
+
+def _get_path(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+class SeriesBuffer:
+    """单个时间序列的降采样缓冲：{time: [...], fields: {字段名: [...]}}"""
+
+    def __init__(self, capacity):
+        self.capacity = max(2, capacity)
+        self.stride = 1
+        self._skipped = 0
+        self.times = []
+        self.fields = {}
+
+    def add(self, time, values):
+        if self.times and self.times[-1] == time:
+            # 同一时间点的多次推送只保留最新值
+            index = len(self.times) - 1
+        else:
+            self._skipped += 1
+            if self._skipped < self.stride:
+                return
+            self._skipped = 0
+            if len(self.times) >= self.capacity:
+                self._halve()
+            index = len(self.times)
+            self.times.append(time)
+            for column in self.fields.values():
+                column.append(None)
+        for name, value in values.items():
+            column = self.fields.setdefault(name, [None] * len(self.times))
+            column[index] = value
+
+    def _halve(self):
+        # 保留偶数位置的点：首个点（运行起点）不丢，之后按加倍后的间隔追加的点与保留的点对齐
+        self.times = self.times[::2]
+        self.fields = {name: column[::2] for name, column in self.fields.items()}
+        self.stride *= 2
+
+    def export(self):
+        return {'time': list(self.times), 'fields': {name: list(column) for name, column in self.fields.items()}}
+
+
+class MonitorHistory:
+    """一个运行的监控历史（记录在事件通道线程中进行，导出在订阅处理中进行，两者以锁互斥）"""
+
+    def __init__(self, capacity=1000, max_orders=200):
+        self.series = {name: SeriesBuffer(capacity) for name in SERIES_PATHS}
+        self.max_orders = max_orders
+        self.orders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, update):
+        if not isinstance(update, dict):
+            return
+        with self._lock:
+            self._record(update)
+
+    def _record(self, update):
+        time = _get_path(update, TIME_PATH)
+        if time is not None:
+            for name, path in SERIES_PATHS.items():
+                node = _get_path(update, path)
+                if isinstance(node, dict):
+                    values = {
+                        key: value for key, value in node.items()
+                        if isinstance(value, (int, float)) and not isinstance(value, bool)
+                    }
+                    if values:
+                        self.series[name].add(time, values)
+
+        orders = _get_path(update, ORDERS_PATH)
+        if isinstance(orders, list):
+            for order in orders:
+                if not isinstance(order, dict):
+                    continue
+                key = next((order[k] for k in ORDER_ID_KEYS if k in order), None)
+                if key is None:
+                    key = json.dumps(order, sort_keys=True, default=str)
+                self.orders.pop(key, None)
+                self.orders[key] = order
+            while len(self.orders) > self.max_orders:
+                self.orders.popitem(last=False)
+
+    def export(self):
+        with self._lock:
+            return {
+                'series': {name: buffer.export() for name, buffer in self.series.items() if buffer.times},
+                'orders': list(self.orders.values())
+            }
@@ -0,0 +1,94 @@
+# myquant/backend/utils/note_store.py
+"""
+运行备注存储。
+
+备注原本保存在 data/run_notes.json 中，每次查询单条备注都要重新读取并解析整个文件，
+每次修改都要整体重写文件（写入中途出错会损坏全部备注）。
+NoteStore 把备注保存在 SQLite 中，并在内存中保留一份字典：
+- 查询直接读内存，支持按 run_id 列表批量获取
+- 修改逐条写穿到数据库（单条语句的事务，原子且增量）
+- 支持按 run_id 前缀批量删除（删除策略时使用）
+首次启动时自动导入旧的 run_notes.json，导入后原文件重命名为 run_notes.json.migrated
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_notes (
+    run_id TEXT PRIMARY KEY,
+    note TEXT NOT NULL
+);
+"""
+
+
+class NoteStore:
+    """以 run_id 为键的备注表：内存字典 + SQLite 写穿"""
+
+    def __init__(self, db_path, legacy_file=None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        if legacy_file:
+            self._import_legacy(Path(legacy_file))
+        self._notes = dict(self._conn.execute('SELECT run_id, note FROM run_notes').fetchall())
+
+    def _import_legacy(self, legacy_file):
+        """导入旧版 JSON 备注文件（只执行一次）"""
+        if not legacy_file.exists():
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                notes = json.load(f)
+        except Exception as e:
+            print(f"导入旧备注文件失败: {e}")
+            return
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO run_notes (run_id, note) VALUES (?, ?)',
+                [(run_id, note) for run_id, note in notes.items() if note]
+            )
+        legacy_file.replace(legacy_file.with_name(legacy_file.name + '.migrated'))
+
+    def get(self, run_id):
+        return self._notes.get(run_id, '')
+
+    def get_many(self, run_ids):
+        """批量获取备注: {run_id: note}，没有备注的 run_id 对应空字符串"""
+        return {run_id: self._notes.get(run_id, '') for run_id in run_ids}
+
+    def all(self):
+        with self._lock:
+            return dict(self._notes)
+
+    def set(self, run_id, note):
+        """设置备注，空备注等同于删除"""
+        if not note:
+            self.delete(run_id)
+            return
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO run_notes (run_id, note) VALUES (?, ?)', (run_id, note))
+            self._notes[run_id] = note
+
+    def delete(self, run_id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM run_notes WHERE run_id = ?', (run_id,))
+            self._notes.pop(run_id, None)
+
+    def delete_prefix(self, prefix):
+        """删除 run_id 以 prefix 开头的所有备注，返回删除的 run_id 列表"""
+        with self._lock, self._conn:
+            # 主键上的范围查询，避免 LIKE 对 '_' 等通配符的转义问题
+            rows = self._conn.execute(
+                'SELECT run_id FROM run_notes WHERE run_id >= ? AND run_id < ?', (prefix, prefix + '\uffff')
+            ).fetchall()
+            run_ids = [row[0] for row in rows]
+            self._conn.executemany('DELETE FROM run_notes WHERE run_id = ?', rows)
+            for run_id in run_ids:
+                self._notes.pop(run_id, None)
+        return run_ids
@@ -5,11 +5,24 @@ MyQuant平台专用的QTrader启动器。
 它的核心职责是设置正确的 Python 环境（将 myquant 项目的根目录添加到 sys.path），
 以便策略代码能够成功 `from myquant.backend.clients import ...`，
 然后调用 qtrader 的标准回测运行器。
+
+以 `--warm` 模式启动时，启动器会先预加载重量级模块，然后阻塞在 stdin 上，
+等待后端写入一行 JSON 格式的启动参数（与命令行参数相同的 argv 列表）。
+
+启动过程中的关键阶段会以 `@@MYQUANT_EVENT {json}` 行的形式写到 stdout，
+后端据此得知进程已就绪（监听端口、工作区路径、pid），无需轮询。
+运行过程中监控数据的采样也通过同一通道（monitor 事件）发给后端，用于记录监控历史。
 """
 
 import sys
 import argparse
+import importlib
+import json
 import os
+import socket
+import threading
+import time
+import traceback
 from pathlib import Path
 
 # 确保 myquant 模块可以被导入
@@ -27,15 +40,331 @@ sys.path.insert(0, str(project_root))
 
 from qtrader.runner.backtest_runner import BacktestRunner
 
-if __name__ == '__main__':
+# 事件行前缀，须与 backend/utils/runner_events.py 中的 EVENT_PREFIX 保持一致
+EVENT_PREFIX = '@@MYQUANT_EVENT '
+
+# 工作区中的 pid 文件，须与 backend/api/runs.py 中的 PIDFILE_NAME 保持一致
+PIDFILE_NAME = 'runner.pid'
+
+# 转发给后端记录监控历史的字段，须与 backend/utils/monitor_history.py 中的路径保持一致
+MONITOR_FIELDS = {'overview': ('current_dt', 'portfolio', 'benchmark'), 'orders': ('orders',)}
+# 监控样本的最小转发间隔（秒），引擎推送再快也不会刷屏 stdout
+MONITOR_SAMPLE_INTERVAL = 0.2
+
+
+class DetachableStream:
+    """
+    包装 stdout / stderr：后端退出后管道断开，之后的输出被丢弃，
+    避免仍在运行的回测/模拟因 BrokenPipeError 中断，等待新的后端重新接管
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def _detach(self):
+        self._stream = open(os.devnull, 'w', encoding='utf-8')
+
+    def write(self, data):
+        try:
+            return self._stream.write(data)
+        except (OSError, ValueError):
+            self._detach()
+            return len(data)
+
+    def flush(self):
+        try:
+            self._stream.flush()
+        except (OSError, ValueError):
+            self._detach()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class ReadyReporter:
+    """
+    在进程内观察 qtrader 的启动过程，并向后端报告阶段事件。
+
+    - 监听端口：拦截 socket.listen，只认配置中 server.port 指定的端口（策略或第三方库自己监听的端口不会被误认）；
+      配置的端口为 0（由操作系统分配）时无法事先知道，取第一个 TCP 监听端口
+    - 工作区：拦截 os.mkdir，识别在 <策略目录>/<策略文件名>/<mode>/ 下新建的目录
+    两者都就绪后报告一次 ready。
+    """
+
+    def __init__(self, mode_dir=None, workspace_dir=None, expected_port=None):
+        self.mode_dir = Path(mode_dir).resolve() if mode_dir else None
+        self.workspace_dir = str(workspace_dir) if workspace_dir else None
+        self.expected_port = expected_port or None
+        self.port = None
+        self._ready_sent = False
+        self._lock = threading.Lock()
+
+    def emit(self, event, **payload):
+        payload['event'] = event
+        with self._lock:
+            try:
+                sys.__stdout__.write(EVENT_PREFIX + json.dumps(payload, ensure_ascii=False, default=str) + '\n')
+                sys.__stdout__.flush()
+            except (OSError, ValueError):
+                pass  # 后端已退出
+
+    def install(self):
+        reporter = self
+        original_listen = socket.socket.listen
+        original_mkdir = os.mkdir
+
+        def listen(sock, *args, **kwargs):
+            original_listen(sock, *args, **kwargs)
+            if reporter.port is None and sock.family in (socket.AF_INET, socket.AF_INET6):
+                port = sock.getsockname()[1]
+                if reporter.expected_port is None or port == reporter.expected_port:
+                    reporter.port = port
+                    reporter.emit('listening', port=reporter.port)
+                    reporter._check_ready()
+
+        def mkdir(path, *args, **kwargs):
+            original_mkdir(path, *args, **kwargs)
+            if reporter.workspace_dir is None and reporter.mode_dir is not None:
+                created = Path(os.fsdecode(path)).resolve()
+                if created.parent == reporter.mode_dir:
+                    reporter.workspace_dir = str(created)
+                    reporter.emit('workspace_created', workspace_dir=reporter.workspace_dir)
+                    reporter._check_ready()
+
+        socket.socket.listen = listen
+        os.mkdir = mkdir
+
+    def install_monitor_tap(self, interval=MONITOR_SAMPLE_INTERVAL):
+        """
+        截获监控服务器推送的 update，按 interval 节流后以 monitor 事件转发给后端记录历史，
+        后端不需要为每个运行保持一条监控连接；订单列表没有变化时不重复发送
+        """
+        try:
+            import socketio
+        except ImportError:
+            return
+        reporter = self
+        original_emit = socketio.Server.emit
+        state = {'last': 0.0, 'orders': None}
+
+        def emit(server, event, *args, **kwargs):
+            if event == 'update':
+                try:
+                    reporter._forward_monitor(args[0] if args else kwargs.get('data'), state, interval)
+                except Exception:
+                    pass  # 历史记录失败不能影响监控推送
+            return original_emit(server, event, *args, **kwargs)
+
+        socketio.Server.emit = emit
+
+    def _forward_monitor(self, data, state, interval):
+        if not isinstance(data, dict):
+            return
+        now = time.monotonic()
+        if now - state['last'] < interval:
+            return
+        state['last'] = now
+        sample = {}
+        for section, keys in MONITOR_FIELDS.items():
+            node = data.get(section)
+            if isinstance(node, dict):
+                picked = {key: node[key] for key in keys if key in node}
+                if picked:
+                    sample[section] = picked
+        orders = sample.get('orders', {}).get('orders')
+        if orders is not None:
+            if orders == state['orders']:
+                del sample['orders']
+            else:
+                state['orders'] = orders
+        if sample:
+            self.emit('monitor', data=sample)
+
+    def _check_ready(self):
+        if self._ready_sent or self.port is None or self.workspace_dir is None:
+            return
+        self._ready_sent = True
+        self.write_pidfile()
+        self.emit('ready', pid=os.getpid(), port=self.port, workspace_dir=self.workspace_dir)
+
+    def write_pidfile(self):
+        """在工作区写入 pid 文件，后端重启后据此确认进程仍属于这个运行"""
+        try:
+            with open(Path(self.workspace_dir) / PIDFILE_NAME, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'port': self.port}, f)
+        except OSError as e:
+            print(f"写入 pid 文件失败: {e}", file=sys.stderr)
+
+
+class PinnedUserData(dict):
+    """
+    固定了部分键的 user_data 字典。
+
+    策略通常在 initialize 中写死参数（如 short_ma_period），
+    平台下发的覆盖值必须在这些赋值之后依然生效，因此对固定键的写入会被忽略。
+    """
+
+    def __init__(self, data, pinned):
+        super().__init__(data)
+        super().update(pinned)
+        self._pinned = dict(pinned)
+
+    def __setitem__(self, key, value):
+        if key not in self._pinned:
+            super().__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pin(self, key, value):
+        """固定一个新的键（如分片后的股票池）"""
+        self._pinned[key] = value
+        super().__setitem__(key, value)
+
+    def __reduce__(self):
+        # 暂停状态序列化为普通 dict，恢复时由平台重新下发覆盖值
+        return (dict, (dict(self),))
+
+
+def parse_shard(value):
+    """解析 "INDEX/COUNT" 形式的分片参数，返回 (index, count)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f'无效的分片参数: {value}')
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f'无效的分片参数: {value}')
+    return index, count
+
+
+def apply_shard(user_data, shard):
+    """
+    只保留股票池中属于当前分片的标的（按顺序轮流分配，使各分片规模均衡）
+    分片后的股票池被固定，策略之后的赋值不会覆盖它
+    """
+    index, count, key = shard
+    universe = user_data.get(key)
+    if not isinstance(universe, (list, tuple)):
+        raise ValueError(f"分片运行要求策略在 initialize 中把股票池设置到 context.user_data['{key}']")
+    sliced = list(universe)[index::count]
+    user_data.pin(key, sliced)
+    user_data.sharded = True
+    print(f"Shard {index + 1}/{count}: {len(sliced)} of {len(universe)} symbols")
+
+
+def install_user_data_overrides(overrides, shard=None):
+    """
+    包装所有策略子类的 initialize，使 context.user_data 带上平台下发的覆盖值
+    shard 为 (index, count, key) 时，在 initialize 之后把 user_data[key] 股票池切分到当前分片
+    """
+    from qtrader.strategy.base import Strategy
+
+    original_init_subclass = Strategy.__dict__.get('__init_subclass__')
+
+    def wrap_initialize(initialize):
+        def wrapped(self, context, *args, **kwargs):
+            # 子类通过 super() 调用父类 initialize 时沿用同一个 user_data，分片只做一次
+            if not isinstance(getattr(context, 'user_data', None), PinnedUserData):
+                context.user_data = PinnedUserData(getattr(context, 'user_data', None) or {}, overrides)
+            result = initialize(self, context, *args, **kwargs)
+            if shard and not getattr(context.user_data, 'sharded', False):
+                apply_shard(context.user_data, shard)
+            return result
+        wrapped.__wrapped__ = initialize
+        return wrapped
+
+    def init_subclass(cls, **kwargs):
+        if original_init_subclass is not None:
+            original_init_subclass.__get__(None, cls)(**kwargs)
+        else:
+            super(Strategy, cls).__init_subclass__(**kwargs)
+        if 'initialize' in cls.__dict__:
+            cls.initialize = wrap_initialize(cls.__dict__['initialize'])
+
+    Strategy.__init_subclass__ = classmethod(init_subclass)
+
+
+def read_runner_config(config_path):
+    """从配置文件读取运行模式和监控端口（0 表示由操作系统分配）"""
+    import yaml
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    port = (config.get('server') or {}).get('port') or 0
+    return config.get('engine', {}).get('mode', 'backtest'), int(port)
+
+
+def create_reporter(args):
+    """根据启动参数推断工作区位置和监控端口，创建就绪报告器"""
+    mode, port = read_runner_config(args.config)
+    if args.resume_from:
+        # 恢复运行沿用暂停状态文件所在的工作区
+        return ReadyReporter(workspace_dir=Path(args.resume_from).resolve().parent, expected_port=port)
+    # 工作区由 qtrader 创建在 <策略目录>/<策略文件名>/<mode>/ 下
+    strategy_path = Path(args.strategy).resolve()
+    mode_dir = strategy_path.parent / strategy_path.stem / mode
+    return ReadyReporter(mode_dir=mode_dir, expected_port=port)
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description='MyQuant Platform Runner')
-    parser.add_argument('--config', required=True, help='配置文件路径')
+    parser.add_argument('--config', help='配置文件路径')
     parser.add_argument('--strategy', help='策略文件路径')
     parser.add_argument('--data-provider', help='数据提供者文件路径')
     parser.add_argument('--start-paused', action='store_true', help='启动后立即暂停')
     parser.add_argument('--resume-from', help='从暂停状态文件恢复')
+    parser.add_argument('--user-data', help='覆盖 context.user_data 的参数（JSON），用于参数扫描')
+    parser.add_argument('--shard', help='分片运行："INDEX/COUNT"，只交易股票池中属于该分片的标的')
+    parser.add_argument('--shard-key', default='symbols', help='股票池在 context.user_data 中的键名')
+    parser.add_argument('--warm', action='store_true', help='预热模式：预加载模块后从stdin等待启动参数')
+    parser.add_argument('--preload', default='', help='预热模式下需要预加载的模块，逗号分隔')
+    return parser
 
-    args = parser.parse_args()
+
+def preload_modules(module_names):
+    """预加载模块，单个模块导入失败不影响其它模块"""
+    for name in module_names:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"预加载模块 {name} 失败: {e}", file=sys.stderr)
+
+
+def wait_for_launch(parser):
+    """
+    阻塞等待后端通过stdin下发启动参数。
+    返回解析后的参数；stdin 被关闭（后端退出）时返回 None。
+    """
+    line = sys.stdin.readline()
+    if not line.strip():
+        return None
+    args = parser.parse_args(json.loads(line))
+    # 预热期间可能安装了新的库，清除导入器缓存以便策略能找到它们
+    importlib.invalidate_caches()
+    return args
+
+
+def run(args, reporter):
+    # 逐行刷新，后端能实时捕获输出
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(line_buffering=True)
+    sys.stdout = DetachableStream(sys.stdout)
+    sys.stderr = DetachableStream(sys.stderr)
+    reporter.emit('imported', pid=os.getpid())
+    reporter.install()
+    reporter.install_monitor_tap()
+
+    overrides = json.loads(args.user_data) if args.user_data else {}
+    shard = (*parse_shard(args.shard), args.shard_key) if args.shard else None
+    if overrides or shard:
+        install_user_data_overrides(overrides, shard)
+        print(f"User data overrides: {overrides}")
 
     print("=" * 60)
     print("MyQuant Platform Runner - 正在启动 QTrader...")
@@ -62,4 +391,25 @@ if __name__ == '__main__':
             strategy_path=args.strategy,
             data_provider_path=args.data_provider,
             start_paused=args.start_paused
-        )
\ No newline at end of file
+        )
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.warm:
+        preload_modules([m for m in args.preload.split(',') if m])
+        args = wait_for_launch(parser)
+        if args is None:
+            sys.exit(0)
+
+    if not args.config:
+        parser.error('缺少 --config 参数')
+
+    reporter = create_reporter(args)
+    try:
+        run(args, reporter)
+    except Exception as e:
+        reporter.emit('failed', error=str(e), traceback=traceback.format_exc())
+        raise
@@ -0,0 +1,122 @@
+# myquant/backend/utils/process_supervisor.py
+"""
+运行器进程的退出监视。
+
+原来运行结束只有在有人调用 list_runs / get_run_status 等接口、用 psutil 探测进程时才会被发现。
+ProcessSupervisor 在进程退出的同时回调 on_exit，由调用方更新运行状态、释放资源并推送事件：
+- Linux 5.3+：为每个进程打开一个 pidfd（os.pidfd_open），单个监视线程用 selectors（epoll）等待，
+  进程退出时对应的 pidfd 变为可读，延迟在毫秒级，且不受 pid 复用影响
+- 其它平台（或内核不支持 pidfd）：每个进程一个等待线程，
+  后端自己启动的子进程用 Popen.wait()，后端重启后重新接管的进程用 psutil.Process.wait()
+后端自己启动的子进程在回调前会被 wait 回收，不会残留僵尸进程。
+"""
+
+import os
+import selectors
+import subprocess
+import threading
+
+import psutil
+
+
+class ProcessSupervisor:
+    """监视一组进程，任一进程退出时回调 on_exit(key, pid, returncode)"""
+
+    def __init__(self, on_exit):
+        """
+        on_exit 在监视线程中调用；returncode 只有后端自己启动的子进程才能取得，否则为 None
+        """
+        self.on_exit = on_exit
+        self.use_pidfd = hasattr(os, 'pidfd_open')
+        self._watches = {}  # {pidfd: (key, pid, process)}
+        self._selector = None
+        self._wakeup = None  # (读端, 写端)：登记新进程后唤醒监视线程
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def watch(self, key, pid, process=None):
+        """
+        开始监视进程；监视开始前已经退出的进程会立即回调
+        process: 后端自己启动的 subprocess.Popen（pid 一致时用于回收进程并取得退出码）
+        """
+        if process is not None and process.pid != pid:
+            process = None
+
+        if self.use_pidfd:
+            try:
+                pidfd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                self._exited(key, pid, process)
+                return
+            except OSError as e:
+                # 内核不支持（ENOSYS）或被沙箱禁止时退回等待线程
+                print(f"pidfd 不可用，改用等待线程监视进程: {e}")
+                self.use_pidfd = False
+            else:
+                with self._lock:
+                    if self._selector is None:
+                        self._selector = selectors.DefaultSelector()
+                        self._wakeup = os.pipe()
+                        self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+                        self._thread = threading.Thread(target=self._run, daemon=True, name='process-supervisor')
+                        self._thread.start()
+                    self._watches[pidfd] = (key, pid, process)
+                    self._selector.register(pidfd, selectors.EVENT_READ)
+                # gevent 打补丁后的选择器不会感知等待期间新登记的 fd，需要唤醒一次
+                os.write(self._wakeup[1], b'\0')
+                return
+
+        threading.Thread(target=self._wait, args=(key, pid, process), daemon=True,
+                         name=f'process-supervisor-{pid}').start()
+
+    def watched_count(self):
+        """正在通过 pidfd 监视的进程数（等待线程方式不计入）"""
+        with self._lock:
+            return len(self._watches)
+
+    def _run(self):
+        """监视线程：等待任一 pidfd 可读（进程已退出）"""
+        while True:
+            try:
+                events = self._selector.select()
+            except OSError as e:
+                print(f"进程监视线程等待失败: {e}")
+                continue
+            for selector_key, _ in events:
+                if selector_key.fd == self._wakeup[0]:
+                    os.read(self._wakeup[0], 4096)
+                    continue
+                with self._lock:
+                    watch = self._watches.pop(selector_key.fd, None)
+                    self._selector.unregister(selector_key.fd)
+                os.close(selector_key.fd)
+                if watch is not None:
+                    self._exited(*watch)
+
+    def _wait(self, key, pid, process):
+        """等待线程：阻塞到进程退出"""
+        if process is None:
+            try:
+                proc = psutil.Process(pid)
+                # 已退出但还未被父进程回收的僵尸进程也算结束
+                while proc.status() != psutil.STATUS_ZOMBIE:
+                    try:
+                        proc.wait(timeout=0.2)
+                        break
+                    except psutil.TimeoutExpired:
+                        pass
+            except psutil.NoSuchProcess:
+                pass
+        self._exited(key, pid, process)
+
+    def _exited(self, key, pid, process):
+        returncode = None
+        if process is not None:
+            try:
+                returncode = process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+        try:
+            self.on_exit(key, pid, returncode)
+        except Exception as e:
+            print(f"处理进程退出失败 ({key}, pid: {pid}): {e}")
@@ -0,0 +1,145 @@
+# myquant/backend/utils/run_index.py
+"""
+历史运行摘要索引。
+
+list_runs 原本要为每个工作区 glob 状态文件、解析配置快照、读完整个 equity.csv 并重新加载备注文件。
+RunIndex 把这些结果（状态、回测区间、最终收益率、备注、工作区大小）缓存在 SQLite 中：
+- 每条摘要记录生成时工作区目录的 mtime，目录发生变化（新增/删除文件）时惰性重建
+- 运行状态变化、备注修改、工作区删除时由调用方主动更新
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_summaries (
+    run_id TEXT PRIMARY KEY,
+    strategy TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    workspace_dir TEXT NOT NULL,
+    dir_mtime_ns INTEGER NOT NULL,
+    start_time REAL,
+    end_time REAL,
+    status TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    final_return REAL,
+    note TEXT NOT NULL DEFAULT '',
+    size_bytes INTEGER,
+    file_count INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_summaries_strategy ON run_summaries (strategy, mode);
+CREATE INDEX IF NOT EXISTS idx_run_summaries_start ON run_summaries (strategy, start_time);
+"""
+
+SUMMARY_FIELDS = (
+    'run_id', 'strategy', 'mode', 'workspace_dir', 'dir_mtime_ns', 'start_time', 'end_time', 'status',
+    'start_date', 'end_date', 'final_return', 'note', 'size_bytes', 'file_count', 'updated_at'
+)
+
+
+def workspace_size(workspace_dir):
+    """工作区的总字节数和文件数"""
+    total = 0
+    count = 0
+    for path in Path(workspace_dir).rglob('*'):
+        try:
+            if path.is_file():
+                total += path.stat().st_size
+                count += 1
+        except OSError:
+            continue
+    return total, count
+
+
+class RunIndex:
+    """以 run_id 为主键、按 (strategy, mode) 索引的运行摘要表"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """为旧版本数据库补充新增的列；补列后已有摘要全部标记为过期，下次列出时重建"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(run_summaries)')}
+        if 'end_time' not in columns:
+            with self._conn:
+                self._conn.execute('ALTER TABLE run_summaries ADD COLUMN end_time REAL')
+                self._conn.execute('UPDATE run_summaries SET dir_mtime_ns = -1')
+
+    def _row_to_summary(self, row):
+        return dict(zip(SUMMARY_FIELDS, row))
+
+    def get(self, run_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_FIELDS)} FROM run_summaries WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return self._row_to_summary(row) if row else None
+
+    def list(self, strategy_name, mode=None):
+        """返回策略（可选限定模式）的所有摘要: {run_id: summary}"""
+        sql = f"SELECT {', '.join(SUMMARY_FIELDS)} FROM run_summaries WHERE strategy = ?"
+        params = [strategy_name]
+        if mode:
+            sql += ' AND mode = ?'
+            params.append(mode)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return {row[0]: self._row_to_summary(row) for row in rows}
+
+    def strategy_stats(self):
+        """
+        按策略汇总索引: {strategy: {counts: {status: n}, size_bytes, latest_run}}
+        latest_run 为开始时间最晚的一条摘要
+        """
+        stats = {}
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT strategy, status, COUNT(*), COALESCE(SUM(size_bytes), 0) '
+                'FROM run_summaries GROUP BY strategy, status'
+            ).fetchall()
+            latest_rows = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_FIELDS)} FROM run_summaries AS r "
+                'WHERE start_time = (SELECT MAX(start_time) FROM run_summaries WHERE strategy = r.strategy)'
+            ).fetchall()
+        for strategy, status, count, size_bytes in rows:
+            entry = stats.setdefault(strategy, {'counts': {}, 'size_bytes': 0, 'latest_run': None})
+            entry['counts'][status] = count
+            entry['size_bytes'] += size_bytes
+        for row in latest_rows:
+            summary = self._row_to_summary(row)
+            entry = stats.get(summary['strategy'])
+            if entry is not None and (entry['latest_run'] is None or summary['run_id'] > entry['latest_run']['run_id']):
+                entry['latest_run'] = summary
+        return stats
+
+    def upsert(self, summary):
+        summary = dict(summary, note=summary.get('note') or '', updated_at=time.time())
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO run_summaries ({', '.join(SUMMARY_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in SUMMARY_FIELDS)})",
+                [summary.get(field) for field in SUMMARY_FIELDS]
+            )
+        return summary
+
+    def set_note(self, run_id, note):
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE run_summaries SET note = ? WHERE run_id = ?', (note or '', run_id))
+
+    def delete(self, run_ids):
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM run_summaries WHERE run_id = ?', [(run_id,) for run_id in run_ids])
+
+    def delete_strategy(self, strategy_name):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM run_summaries WHERE strategy = ?', (strategy_name,))
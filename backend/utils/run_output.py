@@ -0,0 +1,195 @@
+# myquant/backend/utils/run_output.py
+"""
+运行器 stdout / stderr 的捕获与推送。
+
+RunnerChannel 的读取线程把每一行输出交给 OutputCapture，读取线程只在内存中入队：
+- 环形缓冲区保留最近 ring_lines 行（带递增序号），供新订阅者补齐和启动失败时展示
+- 待写入日志和待推送的行各放入一个有上限的队列，超出上限时丢弃最旧的行并计数
+
+OutputHub 在单独的线程中按固定间隔处理各运行的队列：
+- 把待写入的行写入 <工作区>/runner_output.log，超过 max_bytes 时滚动（保留 backup_count 个旧文件）
+- 把待推送的行批量交给 emit 回调（Socket.IO 推送），每批最多 max_batch_lines 行
+磁盘和推送再慢也只会积压或丢弃队列中的行，读取管道的线程永远不会被阻塞。
+运行结束后输出不再保存在内存中，完整输出见工作区的日志文件（可用 parse_log_line 解析）。
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+OUTPUT_LOG_NAME = 'runner_output.log'
+
+
+class OutputCapture:
+    """单个运行器进程的输出缓冲"""
+
+    def __init__(self, ring_lines=2000, max_bytes=10 * 1024 * 1024, backup_count=3, max_pending_lines=5000):
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_pending_lines = max_pending_lines
+        self.log_path = None
+        self.closed = False
+        self._ring = deque(maxlen=ring_lines)
+        self._pending = deque()
+        self._dropped = 0
+        self._unwritten = deque()  # 待写入日志文件的行（只由 OutputHub 的线程写入）
+        self._unwritten_dropped = 0
+        self._seq = 0
+        self._file = None
+        self._file_size = 0
+        self._lock = threading.Lock()
+
+    def append(self, stream, text):
+        """记录一行输出（由读取线程调用，只在内存中入队，不做任何可能阻塞的操作）"""
+        with self._lock:
+            self._seq += 1
+            entry = {'seq': self._seq, 'stream': stream, 'text': text, 'time': time.time()}
+            self._ring.append(entry)
+            if len(self._pending) >= self.max_pending_lines:
+                self._pending.popleft()
+                self._dropped += 1
+            self._pending.append(entry)
+            if len(self._unwritten) >= self.max_pending_lines:
+                self._unwritten.popleft()
+                self._unwritten_dropped += 1
+            self._unwritten.append(entry)
+
+    def write_pending(self):
+        """把待写入的行写入日志文件（由 OutputHub 的线程调用，工作区就绪前不写）"""
+        if self.log_path is None:
+            return
+        with self._lock:
+            entries = list(self._unwritten)
+            self._unwritten.clear()
+            dropped, self._unwritten_dropped = self._unwritten_dropped, 0
+        if not entries and not dropped:
+            return
+        if self._file is None:
+            try:
+                self._file = open(self.log_path, 'a', encoding='utf-8')
+                self._file_size = self.log_path.stat().st_size
+            except OSError as e:
+                print(f"创建运行输出日志失败: {e}")
+                self.log_path = None
+                return
+        try:
+            if dropped:
+                self._write(f"[platform] 日志写入跟不上输出，丢弃了 {dropped} 行\n")
+            for entry in entries:
+                self._write(f"[{entry['stream']}] {entry['text']}\n")
+            self._file.flush()
+        except (OSError, ValueError) as e:
+            print(f"写入运行输出日志失败: {e}")
+            self._close_file()
+            self.log_path = None
+
+    def _write(self, line):
+        self._file.write(line)
+        self._file_size += len(line.encode('utf-8'))
+        if self._file_size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.log_path.with_name(f'{self.log_path.name}.{index}')
+            if source.exists():
+                os.replace(source, self.log_path.with_name(f'{self.log_path.name}.{index + 1}'))
+        if self.backup_count > 0:
+            os.replace(self.log_path, self.log_path.with_name(f'{self.log_path.name}.1'))
+        else:
+            self.log_path.unlink()
+        self._file = open(self.log_path, 'a', encoding='utf-8')
+        self._file_size = 0
+
+    def attach_workspace(self, workspace_dir):
+        """工作区就绪后开始写日志文件（就绪前缓冲的输出也会补写），文件由 OutputHub 的线程打开"""
+        with self._lock:
+            if self.log_path is None:
+                self.log_path = Path(workspace_dir) / OUTPUT_LOG_NAME
+
+    def take_pending(self, limit):
+        """取出最多 limit 行待推送输出，返回 (lines, dropped)"""
+        with self._lock:
+            lines = [self._pending.popleft() for _ in range(min(limit, len(self._pending)))]
+            dropped, self._dropped = self._dropped, 0
+            return lines, dropped
+
+    def has_pending(self):
+        return bool(self._pending) or self._dropped > 0
+
+    def has_unwritten(self):
+        return self.log_path is not None and (bool(self._unwritten) or self._unwritten_dropped > 0)
+
+    def tail(self, after_seq=0, limit=None):
+        """环形缓冲区中序号大于 after_seq 的行"""
+        with self._lock:
+            lines = [entry for entry in self._ring if entry['seq'] > after_seq]
+        return lines[-limit:] if limit else lines
+
+    def tail_text(self, count=20):
+        return '\n'.join(entry['text'] for entry in self.tail(limit=count))
+
+    def close(self):
+        """进程输出结束（由读取线程调用）；剩余的行由 OutputHub 写完后再关闭日志文件"""
+        self.closed = True
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+class OutputHub:
+    """按 run_id 登记输出缓冲，并在后台线程中批量推送"""
+
+    def __init__(self, emit, flush_interval=0.25, max_batch_lines=500):
+        self.emit = emit
+        self.flush_interval = flush_interval
+        self.max_batch_lines = max_batch_lines
+        self._captures = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, run_id, capture):
+        with self._lock:
+            self._captures[run_id] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name='run-output', daemon=True)
+                self._thread.start()
+
+    def get(self, run_id):
+        return self._captures.get(run_id)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                captures = list(self._captures.items())
+            for run_id, capture in captures:
+                capture.write_pending()
+                if capture.has_pending():
+                    lines, dropped = capture.take_pending(self.max_batch_lines)
+                    try:
+                        self.emit(run_id, lines, dropped)
+                    except Exception as e:
+                        print(f"推送运行输出失败 ({run_id}): {e}")
+                elif capture.closed and not capture.has_unwritten():
+                    # 进程已退出且输出已全部写入和推送
+                    capture._close_file()
+                    with self._lock:
+                        if self._captures.get(run_id) is capture:
+                            del self._captures[run_id]
+
+
+def parse_log_line(line):
+    """把日志文件中的一行还原为 {stream, text}（格式见 OutputCapture.write_pending）"""
+    if line.startswith('[') and '] ' in line:
+        stream, text = line[1:].split('] ', 1)
+        return {'stream': stream, 'text': text}
+    return {'stream': 'stdout', 'text': line}
@@ -0,0 +1,165 @@
+# myquant/backend/utils/run_registry.py
+"""
+持久化的活动运行登记表。
+
+active_runs 原本是纯内存字典，后端重启后所有仍在运行的 qtrader 进程都会失去管理。
+RunRegistry 保持字典接口（供现有代码直接使用），同时把每条记录写穿到 SQLite：
+- 读取走内存缓存，并维护按策略的二级索引
+- 新增、删除以及通过 update_run 修改的字段会立即持久化
+- 后端启动时从数据库加载，由调用方校验进程后重新接管
+"""
+
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from datetime import datetime
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS active_runs (
+    run_id TEXT PRIMARY KEY,
+    strategy TEXT NOT NULL,
+    mode TEXT,
+    pid INTEGER,
+    port INTEGER,
+    is_paused INTEGER NOT NULL DEFAULT 0,
+    workspace_dir TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_active_runs_strategy ON active_runs (strategy);
+"""
+
+# 内存中使用 datetime、数据库中保存 ISO 字符串的字段
+DATETIME_FIELDS = ('last_heartbeat',)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f'无法序列化的类型: {type(value).__name__}')
+
+
+class RunRegistry(MutableMapping):
+    """以 run_id 为键的活动运行登记表：内存字典 + SQLite 写穿"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._runs = {}
+        self._by_strategy = {}
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def _load(self):
+        rows = self._conn.execute('SELECT run_id, data FROM active_runs').fetchall()
+        for run_id, data in rows:
+            try:
+                info = json.loads(data)
+            except ValueError:
+                continue
+            for field in DATETIME_FIELDS:
+                # 心跳时间从重新加载时开始计算，避免重启期间被误判为空闲
+                if field in info:
+                    info[field] = datetime.now()
+            self._cache(run_id, info)
+
+    def _persist(self, run_id, info):
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO active_runs (run_id, strategy, mode, pid, port, is_paused, workspace_dir, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    run_id,
+                    info.get('strategy', ''),
+                    info.get('mode'),
+                    info.get('pid'),
+                    info.get('port'),
+                    1 if info.get('is_paused') else 0,
+                    str(info['workspace_dir']) if info.get('workspace_dir') else None,
+                    json.dumps(info, ensure_ascii=False, default=_encode)
+                )
+            )
+
+    def _cache(self, run_id, info):
+        self._runs[run_id] = info
+        self._by_strategy.setdefault(info.get('strategy'), set()).add(run_id)
+
+    # ------------------------------------------------------------------
+    # 字典接口
+    # ------------------------------------------------------------------
+    def __getitem__(self, run_id):
+        return self._runs[run_id]
+
+    def __setitem__(self, run_id, info):
+        with self._lock:
+            if run_id in self._runs:
+                self._uncache(run_id)
+            self._cache(run_id, info)
+            self._persist(run_id, info)
+
+    def __delitem__(self, run_id):
+        with self._lock:
+            self._uncache(run_id)
+            with self._conn:
+                self._conn.execute('DELETE FROM active_runs WHERE run_id = ?', (run_id,))
+
+    def _uncache(self, run_id):
+        info = self._runs.pop(run_id)
+        run_ids = self._by_strategy.get(info.get('strategy'))
+        if run_ids is not None:
+            run_ids.discard(run_id)
+            if not run_ids:
+                del self._by_strategy[info.get('strategy')]
+
+    def __contains__(self, run_id):
+        return run_id in self._runs
+
+    def __iter__(self):
+        return iter(list(self._runs))
+
+    def __len__(self):
+        return len(self._runs)
+
+    def items(self):
+        # 返回快照，遍历期间其它线程增删记录不会出错
+        with self._lock:
+            return list(self._runs.items())
+
+    def values(self):
+        with self._lock:
+            return list(self._runs.values())
+
+    def pop(self, run_id, *default):
+        # 多个线程可能同时回收同一个运行，取出和删除需要是原子的
+        with self._lock:
+            if run_id not in self._runs:
+                if default:
+                    return default[0]
+                raise KeyError(run_id)
+            info = self._runs[run_id]
+            del self[run_id]
+            return info
+
+    # ------------------------------------------------------------------
+    # 扩展操作
+    # ------------------------------------------------------------------
+    def update_run(self, run_id, **fields):
+        """修改一条运行记录的字段并持久化（直接修改字典中的值不会写入数据库）"""
+        with self._lock:
+            info = self._runs[run_id]
+            info.update(fields)
+            self._persist(run_id, info)
+
+    def by_strategy(self, strategy_name):
+        """返回某个策略的所有活动运行: {run_id: run_info}"""
+        with self._lock:
+            return {run_id: self._runs[run_id] for run_id in self._by_strategy.get(strategy_name, ())}
@@ -0,0 +1,338 @@
+# myquant/backend/utils/run_scheduler.py
+"""
+运行队列与调度器。
+
+提交的运行先进入持久化队列（data/run_queue.json），由调度线程按优先级和提交顺序
+逐个放行。放行条件同时考虑：
+- 最大并发数（max_concurrency，默认 CPU核数 / cores_per_run）
+- 空闲 CPU 核数（按系统 CPU 使用率折算）
+- 可用内存（需为新运行预留 memory_per_run_mb，并保留 min_free_memory_mb）
+真正的启动通过注入的 submit_fn 交给异步启动器完成，调度器只负责排队和准入。
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import psutil
+
+# 队列条目状态
+QUEUED = 'queued'
+LAUNCHING = 'launching'
+STARTED = 'started'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (STARTED, FAILED, CANCELLED)
+
+
+class RunScheduler:
+    """持久化运行队列 + 资源感知的准入调度"""
+
+    def __init__(self, queue_file, submit_fn, count_active, max_concurrency=None, cores_per_run=1,
+                 memory_per_run_mb=512, min_free_memory_mb=1024, poll_interval=2, history_ttl=3600,
+                 on_change=None, find_launched=None):
+        """
+        submit_fn(strategy_name, mode, listener, **launch_options) 提交一次异步启动，listener(stage, **payload) 接收启动阶段
+        count_active() 返回当前活动运行数
+        find_launched(item) 在恢复上次退出时仍在启动中的条目时调用，返回该条目已经启动的运行的 run_id（没有则为 None）
+        """
+        self.queue_file = Path(queue_file)
+        self.submit_fn = submit_fn
+        self.count_active = count_active
+        self.cpu_count = psutil.cpu_count() or 1
+        self.cores_per_run = max(0.1, float(cores_per_run))
+        self.max_concurrency = int(max_concurrency) if max_concurrency else max(1, int(self.cpu_count // self.cores_per_run))
+        self.memory_per_run_mb = memory_per_run_mb
+        self.min_free_memory_mb = min_free_memory_mb
+        self.poll_interval = poll_interval
+        self.history_ttl = history_ttl
+        self.on_change = on_change
+        self.find_launched = find_launched
+        self.finish_listeners = []
+        self.items = {}
+        self.blocked_reason = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def _load(self):
+        if not self.queue_file.exists():
+            return
+        try:
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except Exception as e:
+            print(f"加载运行队列失败: {e}")
+            return
+        # 上次退出时尚未确认启动结果的条目保持 LAUNCHING，由 start() 在运行登记表恢复后核对
+        for item in items:
+            self.items[item['queue_id']] = item
+
+    def _recover_launching(self):
+        """
+        核对上次退出时仍在启动中的条目：
+        - 运行器已经启动（登记表中有该运行，或已创建工作区）：标记为 STARTED，不再重复启动
+        - 还没有启动迹象：重新排队
+        """
+        started = []
+        with self._cond:
+            for item in self.items.values():
+                if item['status'] != LAUNCHING:
+                    continue
+                run_id = None
+                if self.find_launched:
+                    try:
+                        run_id = self.find_launched(item)
+                    except Exception as e:
+                        print(f"核对启动中的条目失败 ({item['queue_id']}): {e}")
+                if run_id:
+                    item['status'] = STARTED
+                    item['run_id'] = run_id
+                    item['finished_at'] = time.time()
+                    started.append(item)
+                else:
+                    item['status'] = QUEUED
+                    item['admitted_at'] = None
+            self._changed()
+        for item in started:
+            print(f"队列条目 {item['queue_id']} 在上次退出前已启动运行 {item['run_id']}，不再重复启动")
+            self._finished(item)
+
+    def _save(self):
+        """原子写入队列文件（调用方需持有锁）"""
+        try:
+            self.queue_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.queue_file.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self.items.values()), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.queue_file)
+        except Exception as e:
+            print(f"保存运行队列失败: {e}")
+
+    def _changed(self):
+        """持久化并通知（调用方需持有锁）"""
+        self._save()
+        self._cond.notify_all()
+        if self.on_change:
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"队列变更通知失败: {e}")
+
+    def add_finish_listener(self, fn):
+        """
+        登记条目结束（启动成功、失败或取消）时的回调 fn(item)
+        已结束的条目会在 history_ttl 后被清理，需要长期保留结果的调用方（如参数扫描）应在回调中自行记录
+        """
+        self.finish_listeners.append(fn)
+
+    def _finished(self, item):
+        """通知条目已结束（不持有锁时调用）"""
+        for fn in self.finish_listeners:
+            try:
+                fn(dict(item))
+            except Exception as e:
+                print(f"队列条目结束回调失败 ({item['queue_id']}): {e}")
+
+    # ------------------------------------------------------------------
+    # 队列操作
+    # ------------------------------------------------------------------
+    def submit(self, strategy_name, mode, priority=0, launch_options=None, tag=None):
+        """
+        提交一个运行到队列，返回队列条目
+        launch_options 会原样传给 submit_fn（如参数扫描的配置覆盖项）
+        tag 由调用方自定义（需可 JSON 序列化），随条目保存并在结束回调中原样带回
+        """
+        return self.submit_many([{
+            'strategy_name': strategy_name,
+            'mode': mode,
+            'priority': priority,
+            'launch_options': launch_options,
+            'tag': tag
+        }])[0]
+
+    def submit_many(self, requests):
+        """
+        批量提交运行，返回队列条目列表（与 requests 顺序一致）
+        requests 中每一项是 submit 的关键字参数；所有条目加入后只写一次队列文件、只通知一次，
+        参数扫描等一次提交成百上千个运行时不会逐条重写整个队列
+        """
+        now = time.time()
+        items = [{
+            'queue_id': uuid.uuid4().hex,
+            'strategy': request['strategy_name'],
+            'mode': request['mode'],
+            'priority': request.get('priority', 0),
+            'launch_options': request.get('launch_options') or {},
+            'status': QUEUED,
+            'submitted_at': now,
+            'admitted_at': None,
+            'finished_at': None,
+            'launch_id': None,
+            'run_id': None,
+            'error': None,
+            'tag': request.get('tag')
+        } for request in requests]
+        if not items:
+            return items
+        with self._cond:
+            for item in items:
+                self.items[item['queue_id']] = item
+            self._changed()
+        return items
+
+    def cancel(self, queue_id):
+        """取消一个仍在排队的条目，返回是否成功"""
+        with self._cond:
+            item = self.items.get(queue_id)
+            if not item or item['status'] != QUEUED:
+                return False
+            item['status'] = CANCELLED
+            item['finished_at'] = time.time()
+            self._changed()
+        self._finished(item)
+        return True
+
+    def _queued(self):
+        queued = [item for item in self.items.values() if item['status'] == QUEUED]
+        queued.sort(key=lambda item: (-item.get('priority', 0), item['submitted_at']))
+        return queued
+
+    def _describe(self, item, position=None):
+        info = dict(item)
+        now = time.time()
+        if item['status'] == QUEUED:
+            info['position'] = position
+            info['wait_time'] = now - item['submitted_at']
+        elif item.get('admitted_at'):
+            info['wait_time'] = item['admitted_at'] - item['submitted_at']
+        return info
+
+    def get(self, queue_id):
+        """查询单个条目（排队中的条目带有 position 与 wait_time）"""
+        with self._cond:
+            item = self.items.get(queue_id)
+            if not item:
+                return None
+            position = None
+            if item['status'] == QUEUED:
+                position = [q['queue_id'] for q in self._queued()].index(queue_id) + 1
+            return self._describe(item, position)
+
+    def snapshot(self):
+        """队列整体状态"""
+        with self._cond:
+            queued = [self._describe(item, i + 1) for i, item in enumerate(self._queued())]
+            others = [self._describe(item) for item in self.items.values() if item['status'] != QUEUED]
+            waits = [item['wait_time'] for item in others if item.get('wait_time') is not None]
+            launching = sum(1 for item in self.items.values() if item['status'] == LAUNCHING)
+        others.sort(key=lambda item: item['submitted_at'], reverse=True)
+        return {
+            'queued': queued,
+            'recent': others,
+            'launching': launching,
+            'active': self.count_active(),
+            'max_concurrency': self.max_concurrency,
+            'blocked_reason': self.blocked_reason,
+            'avg_wait_time': sum(waits) / len(waits) if waits else None
+        }
+
+    def notify(self):
+        """外部状态变化（如运行结束）时唤醒调度线程"""
+        with self._cond:
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+    def start(self):
+        if self._thread is not None:
+            return
+        self._recover_launching()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name='run-scheduler')
+        self._thread.start()
+        print(f"运行调度器已启动: max_concurrency={self.max_concurrency}, cores_per_run={self.cores_per_run}")
+
+    def _check_resources(self, launching):
+        """返回无法放行的原因，可以放行时返回 None"""
+        running = self.count_active() + launching
+        if running >= self.max_concurrency:
+            return 'max_concurrency'
+        # 没有任何运行时总是放行一个，避免因外部负载导致队列永久阻塞
+        if running == 0:
+            return None
+        free_cores = self.cpu_count * (1 - psutil.cpu_percent(interval=None) / 100)
+        if free_cores < self.cores_per_run:
+            return 'cpu'
+        # 正在启动的运行尚未占用内存，为它们预先扣除
+        available_mb = psutil.virtual_memory().available / 2 ** 20 - launching * self.memory_per_run_mb
+        if available_mb < self.min_free_memory_mb + self.memory_per_run_mb:
+            return 'memory'
+        return None
+
+    def _loop(self):
+        psutil.cpu_percent(interval=None)  # 初始化CPU使用率采样基线
+        while True:
+            with self._cond:
+                self._prune()
+                queued = self._queued()
+                launching = sum(1 for item in self.items.values() if item['status'] == LAUNCHING)
+                reason = self._check_resources(launching) if queued else None
+                self.blocked_reason = reason
+                if queued and reason is None:
+                    item = queued[0]
+                    item['status'] = LAUNCHING
+                    item['admitted_at'] = time.time()
+                    self._changed()
+                else:
+                    item = None
+                    self._cond.wait(self.poll_interval)
+            if item is not None:
+                self._admit(item)
+
+    def _admit(self, item):
+        def listener(stage, **payload):
+            with self._cond:
+                if stage == 'workspace_created':
+                    # 记录工作区，后端重启时据此判断运行器是否已经启动
+                    item['workspace_dir'] = payload.get('workspace_dir')
+                    self._save()
+                    return
+                if stage == 'ready':
+                    item['status'] = STARTED
+                    item['run_id'] = payload.get('run_id')
+                elif stage == 'failed':
+                    item['status'] = FAILED
+                    item['error'] = payload.get('error')
+                else:
+                    return
+                item['finished_at'] = time.time()
+                self._changed()
+            self._finished(item)
+
+        try:
+            ticket = self.submit_fn(item['strategy'], item['mode'], listener=listener, **item.get('launch_options', {}))
+            with self._cond:
+                item['launch_id'] = ticket['launch_id']
+                self._save()
+        except Exception as e:
+            listener('failed', error=str(e))
+
+    def _prune(self):
+        """清理过期的已结束条目（调用方需持有锁）"""
+        now = time.time()
+        expired = [
+            queue_id for queue_id, item in self.items.items()
+            if item['status'] in FINISHED_STATES and now - (item.get('finished_at') or now) > self.history_ttl
+        ]
+        for queue_id in expired:
+            del self.items[queue_id]
+        if expired:
+            self._save()
@@ -0,0 +1,223 @@
+# myquant/backend/utils/run_telemetry.py
+"""
+每个运行的资源占用采样。
+
+TelemetrySampler 在单独的线程中按固定间隔对每个活动运行的进程树（运行器进程及其所有子进程）采样：
+- cpu_percent：进程树的 CPU 占用之和（100 表示占满一个核）
+- rss / uss：常驻内存和独占内存（字节，uss 需要读取 smaps，可通过 collect_uss 关闭）
+- read_bytes / write_bytes：累计磁盘读写字节数，read_rate / write_rate 为相邻两次采样间的速率
+- threads / fds / processes：线程数、打开的文件描述符数（Windows 下为句柄数）、进程数
+
+采样写入 monitor_history.SeriesBuffer：点数达到上限后隔点丢弃并加倍采样间隔，
+整个运行过程以均匀降采样的形式保留，内存占用固定。同时记录各指标的峰值。
+运行结束时（进程监视器回调或采样时发现进程已退出）把缓冲写入工作区的 resource_usage.json。
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+from backend.utils.monitor_history import SeriesBuffer
+
+TELEMETRY_FILENAME = 'resource_usage.json'
+
+# 记录峰值的指标
+PEAK_FIELDS = ('cpu_percent', 'rss', 'uss', 'threads', 'fds', 'processes', 'read_rate', 'write_rate')
+
+
+class RunTelemetry:
+    """单个运行的资源采样缓冲"""
+
+    def __init__(self, run_id, pid, workspace_dir, capacity=1000, collect_uss=True):
+        self.run_id = run_id
+        self.pid = pid
+        self.workspace_dir = Path(workspace_dir)
+        self.collect_uss = collect_uss
+        self.started_at = time.time()
+        self.samples = 0
+        self.latest = None
+        self.peak = {}
+        self.series = SeriesBuffer(capacity)
+        self._root = psutil.Process(pid)
+        self._procs = {}
+        self._last_io = None  # (采样时间, read_bytes, write_bytes)
+        self._lock = threading.Lock()
+        self._tree()  # 建立 CPU 占用的计算基线
+
+    def _tree(self):
+        """当前进程树；沿用已有的 Process 对象，cpu_percent 才能按两次采样之间计算"""
+        procs = {}
+        for proc in [self._root] + self._root.children(recursive=True):
+            cached = self._procs.get(proc.pid)
+            if cached is None:
+                cached = proc
+                try:
+                    cached.cpu_percent(None)
+                except psutil.Error:
+                    continue
+            procs[proc.pid] = cached
+        self._procs = procs
+        return list(procs.values())
+
+    def _read_process(self, proc, totals):
+        with proc.oneshot():
+            totals['cpu_percent'] += proc.cpu_percent(None)
+            memory = None
+            if self.collect_uss:
+                try:
+                    memory = proc.memory_full_info()
+                    totals['uss'] += memory.uss
+                except psutil.AccessDenied:
+                    memory = None
+            memory = memory or proc.memory_info()
+            totals['rss'] += memory.rss
+            totals['threads'] += proc.num_threads()
+            totals['fds'] += proc.num_fds() if hasattr(proc, 'num_fds') else proc.num_handles()
+            if hasattr(proc, 'io_counters'):
+                try:
+                    io = proc.io_counters()
+                    totals['read_bytes'] += io.read_bytes
+                    totals['write_bytes'] += io.write_bytes
+                except psutil.AccessDenied:
+                    pass
+
+    def sample(self, now=None):
+        """
+        采样一次并返回该样本
+        运行器进程本身已退出时抛出 psutil.NoSuchProcess
+        """
+        now = now or time.time()
+        with self._lock:
+            totals = {'cpu_percent': 0.0, 'rss': 0, 'uss': 0, 'read_bytes': 0, 'write_bytes': 0,
+                      'threads': 0, 'fds': 0, 'processes': 0}
+            for proc in self._tree():
+                try:
+                    self._read_process(proc, totals)
+                    totals['processes'] += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    # 子进程可能在采样过程中退出；运行器进程本身退出则结束采样
+                    if proc is self._root:
+                        raise psutil.NoSuchProcess(self.pid)
+
+            totals['cpu_percent'] = round(totals['cpu_percent'], 1)
+            if not self.collect_uss:
+                del totals['uss']
+            # 子进程退出后累计值会回落，速率按 0 计
+            if self._last_io is not None:
+                elapsed = max(now - self._last_io[0], 1e-6)
+                totals['read_rate'] = max(0, int((totals['read_bytes'] - self._last_io[1]) / elapsed))
+                totals['write_rate'] = max(0, int((totals['write_bytes'] - self._last_io[2]) / elapsed))
+            self._last_io = (now, totals['read_bytes'], totals['write_bytes'])
+
+            timestamp = round(now, 1)
+            self.series.add(timestamp, totals)
+            self.samples += 1
+            self.latest = dict(totals, time=timestamp)
+            for field in PEAK_FIELDS:
+                if field in totals and totals[field] > self.peak.get(field, 0):
+                    self.peak[field] = totals[field]
+            return self.latest
+
+    def summary(self):
+        return {
+            'run_id': self.run_id,
+            'pid': self.pid,
+            'started_at': self.started_at,
+            'samples': self.samples,
+            'latest': self.latest,
+            'peak': dict(self.peak)
+        }
+
+    def export(self):
+        with self._lock:
+            data = self.summary()
+            data['series'] = self.series.export()
+            return data
+
+    def save(self):
+        """写入工作区的 resource_usage.json（先写临时文件再替换）"""
+        data = self.export()
+        data['ended_at'] = time.time()
+        path = self.workspace_dir / TELEMETRY_FILENAME
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+
+class TelemetrySampler:
+    """按 run_id 登记运行，在后台线程中定期采样并把每轮的样本交给 emit 回调"""
+
+    def __init__(self, emit, interval=2.0, capacity=1000, collect_uss=True):
+        """emit(samples)：samples 为 {run_id: 样本}，每轮采样后调用一次"""
+        self.emit = emit
+        self.interval = interval
+        self.capacity = capacity
+        self.collect_uss = collect_uss
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, run_id, pid, workspace_dir):
+        """开始采样一个运行（进程已不存在时忽略）"""
+        try:
+            telemetry = RunTelemetry(run_id, pid, workspace_dir, self.capacity, self.collect_uss)
+        except psutil.Error:
+            return None
+        with self._lock:
+            self._runs[run_id] = telemetry
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name='run-telemetry', daemon=True)
+                self._thread.start()
+        return telemetry
+
+    def get(self, run_id):
+        return self._runs.get(run_id)
+
+    def finish(self, run_id):
+        """停止采样并把缓冲写入工作区（可重复调用）"""
+        with self._lock:
+            telemetry = self._runs.pop(run_id, None)
+        if telemetry is None:
+            return None
+        try:
+            return telemetry.save()
+        except OSError as e:
+            print(f"保存资源占用记录失败 ({run_id}): {e}")
+            return None
+
+    def overview(self):
+        """所有活动运行的最新样本和峰值，以及合计"""
+        with self._lock:
+            runs = [telemetry.summary() for telemetry in self._runs.values()]
+        totals = {'cpu_percent': 0.0, 'rss': 0, 'uss': 0}
+        for run in runs:
+            for field in totals:
+                totals[field] += (run['latest'] or {}).get(field, 0)
+        totals['cpu_percent'] = round(totals['cpu_percent'], 1)
+        return {'interval': self.interval, 'runs': runs, 'totals': totals}
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                runs = list(self._runs.items())
+            samples = {}
+            now = time.time()
+            for run_id, telemetry in runs:
+                try:
+                    samples[run_id] = telemetry.sample(now)
+                except psutil.NoSuchProcess:
+                    self.finish(run_id)
+                except Exception as e:
+                    print(f"资源采样失败 ({run_id}): {e}")
+            if samples:
+                try:
+                    self.emit(samples)
+                except Exception as e:
+                    print(f"推送资源采样失败: {e}")
@@ -0,0 +1,125 @@
+# myquant/backend/utils/runner_events.py
+"""
+后端与 platform_runner 之间的启动握手。
+
+运行器把启动阶段事件以 `@@MYQUANT_EVENT {json}` 行写到 stdout：
+- imported：启动参数已接收，qtrader 已导入
+- listening：监控服务器已绑定端口
+- workspace_created：工作区目录已创建
+- ready：端口与工作区都已就绪，携带 pid / port / workspace_dir
+- failed：启动过程中抛出异常
+- monitor：运行中的监控数据采样（权益、基准、订单），供后端记录监控历史
+
+RunnerChannel 在后台线程中持续读取 stdout 和 stderr（保证子进程不会因管道写满而阻塞），
+解析事件并唤醒等待者；子进程在就绪前退出时会立即被发现。
+事件以外的输出行交给 OutputCapture 缓存、落盘和推送，启动失败时附带最后几行输出。
+"""
+
+import json
+import threading
+import time
+
+from backend.utils.run_output import OutputCapture
+
+EVENT_PREFIX = '@@MYQUANT_EVENT '
+
+
+class RunnerStartupError(RuntimeError):
+    """运行器在就绪前失败、退出或超时"""
+
+
+class RunnerChannel:
+    """读取单个运行器进程的 stdout 并解析握手事件"""
+
+    def __init__(self, process, on_event=None, output=None):
+        self.process = process
+        self.on_event = on_event
+        self.output = output if output is not None else OutputCapture()
+        self.events = []
+        self.ready = None
+        self.failure = None
+        self.closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+        self._stderr_thread = None
+        if process.stderr is not None:
+            self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+            self._stderr_thread.start()
+
+    def _read_loop(self):
+        try:
+            for raw in iter(self.process.stdout.readline, b''):
+                line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+                if line.startswith(EVENT_PREFIX):
+                    self._handle_event(line[len(EVENT_PREFIX):])
+                else:
+                    self.output.append('stdout', line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            # stdout 关闭意味着进程即将退出，回收子进程避免残留僵尸进程
+            try:
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+            if self._stderr_thread is not None:
+                self._stderr_thread.join(timeout=5)
+            self.output.close()
+            with self._cond:
+                self.closed = True
+                self._cond.notify_all()
+
+    def _read_stderr(self):
+        try:
+            for raw in iter(self.process.stderr.readline, b''):
+                self.output.append('stderr', raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+        except (OSError, ValueError):
+            pass
+
+    def _handle_event(self, text):
+        try:
+            event = json.loads(text)
+        except ValueError:
+            return
+        with self._cond:
+            self.events.append(event)
+            if event.get('event') == 'ready' and self.ready is None:
+                self.ready = event
+            elif event.get('event') == 'failed' and self.ready is None:
+                self.failure = event
+            self._cond.notify_all()
+        if self.on_event:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                print(f"处理运行器事件失败: {e}")
+
+    def wait_ready(self, timeout):
+        """
+        等待运行器报告就绪。
+        返回 ready 事件；失败、进程退出或超时时抛出 RunnerStartupError。
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self.ready is None:
+                if self.failure is not None:
+                    raise RunnerStartupError(
+                        f"qtrader 启动失败: {self.failure.get('error')}" + self._output_tail()
+                    )
+                if self.closed:
+                    returncode = self.process.poll()
+                    raise RunnerStartupError(
+                        f"qtrader 进程在就绪前退出 (返回码: {returncode})。" + self._output_tail()
+                    )
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise RunnerStartupError(
+                        f"在 {timeout} 秒内 qtrader 服务器未能启动或响应。" + self._output_tail()
+                    )
+                self._cond.wait(remaining)
+            return self.ready
+
+    def _output_tail(self, count=20):
+        text = self.output.tail_text(count)
+        return f"\n最近的输出:\n{text}" if text else ''
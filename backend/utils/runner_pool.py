@@ -0,0 +1,185 @@
+# myquant/backend/utils/runner_pool.py
+"""
+预热的 QTrader 运行器进程池。
+
+池中的每个空闲 worker 都是以 `--warm` 模式启动的 platform_runner.py：
+解释器启动、qtrader/pandas/numpy 等模块的导入都在启动请求到来之前完成。
+启动运行时，后端只需把 argv 列表以一行 JSON 写入 worker 的 stdin。
+池为空（或未启用）时自动退化为冷启动。
+
+无论哪种方式，运行器的 stdout / stderr 都是管道，由 RunnerChannel 读取启动握手事件并捕获输出。
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+
+RUNNER_SCRIPT = Path(__file__).parent / 'platform_runner.py'
+
+# Windows 下为子进程创建新的进程组，便于单独终止
+CREATION_FLAGS = subprocess.CREATE_NEW_PROCESS_GROUP if hasattr(subprocess, 'CREATE_NEW_PROCESS_GROUP') else 0
+
+# POSIX 下运行器放到独立会话中，后端退出（如 Ctrl+C 或重新部署）时不会随之终止，重启后可重新接管
+START_NEW_SESSION = os.name == 'posix'
+
+DEFAULT_PRELOAD_MODULES = ['numpy', 'pandas']
+
+
+def build_runner_args(config, strategy=None, data_provider=None, resume_from=None, start_paused=False, user_data=None,
+                      shard=None):
+    """
+    构造 platform_runner.py 的命令行参数（不含解释器和脚本路径）
+    shard 形如 {"index": 0, "count": 4, "key": "symbols"}
+    """
+    args = ['--config', str(config)]
+    if user_data:
+        args += ['--user-data', json.dumps(user_data, ensure_ascii=False)]
+    if shard:
+        args += ['--shard', f"{shard['index']}/{shard['count']}", '--shard-key', shard.get('key', 'symbols')]
+    if resume_from:
+        args += ['--resume-from', str(resume_from)]
+    if strategy:
+        args += ['--strategy', str(strategy)]
+    if data_provider:
+        args += ['--data-provider', str(data_provider)]
+    if start_paused:
+        args.append('--start-paused')
+    return args
+
+
+class RunnerPool:
+    """维护固定数量的空闲预热 worker，按需补充"""
+
+    def __init__(self, size=0, preload_modules=None, latency_history=200):
+        self.size = max(0, int(size))
+        self.preload_modules = list(DEFAULT_PRELOAD_MODULES if preload_modules is None else preload_modules)
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._started = False
+        self._latencies = deque(maxlen=latency_history)
+        self.warm_launches = 0
+        self.cold_launches = 0
+
+    def start(self):
+        """启动进程池并填充空闲 worker"""
+        with self._lock:
+            if self._started or self.size == 0:
+                return
+            self._started = True
+        self._replenish()
+        print(f"运行器进程池已启动: size={self.size}, preload={self.preload_modules}")
+
+    def shutdown(self):
+        """终止所有空闲 worker"""
+        with self._lock:
+            self._started = False
+            workers = list(self._idle)
+            self._idle.clear()
+        for process in workers:
+            if process.poll() is None:
+                process.kill()
+
+    def _spawn_worker(self):
+        cmd = [sys.executable, str(RUNNER_SCRIPT), '--warm', '--preload', ','.join(self.preload_modules)]
+        return subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=CREATION_FLAGS,
+            start_new_session=START_NEW_SESSION
+        )
+
+    def _replenish(self):
+        """补充空闲 worker 到目标数量"""
+        while True:
+            with self._lock:
+                # 清理意外退出的 worker
+                for process in [p for p in self._idle if p.poll() is not None]:
+                    self._idle.remove(process)
+                if not self._started or len(self._idle) >= self.size:
+                    return
+            try:
+                process = self._spawn_worker()
+            except Exception as e:
+                print(f"创建预热 worker 失败: {e}")
+                return
+            with self._lock:
+                self._idle.append(process)
+
+    def _acquire(self):
+        """取出一个存活的空闲 worker，没有则返回 None"""
+        with self._lock:
+            while self._idle:
+                process = self._idle.popleft()
+                if process.poll() is None:
+                    break
+            else:
+                process = None
+        if self._started:
+            threading.Thread(target=self._replenish, daemon=True).start()
+        return process
+
+    def launch(self, runner_args):
+        """
+        启动一个运行器进程。
+        返回: (process, launch_mode)，launch_mode 为 'warm' 或 'cold'
+        """
+        process = self._acquire()
+        if process is not None:
+            try:
+                process.stdin.write((json.dumps(runner_args) + '\n').encode('utf-8'))
+                process.stdin.close()
+                with self._lock:
+                    self.warm_launches += 1
+                return process, 'warm'
+            except OSError as e:
+                print(f"向预热 worker 下发启动参数失败，改为冷启动: {e}")
+                process.kill()
+
+        process = subprocess.Popen(
+            [sys.executable, str(RUNNER_SCRIPT)] + list(runner_args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=CREATION_FLAGS,
+            start_new_session=START_NEW_SESSION
+        )
+        with self._lock:
+            self.cold_launches += 1
+        return process, 'cold'
+
+    def record_latency(self, launch_mode, seconds):
+        """记录一次启动到就绪的耗时"""
+        with self._lock:
+            self._latencies.append((launch_mode, seconds))
+
+    def get_stats(self):
+        """进程池统计信息，包括按启动方式划分的启动就绪耗时"""
+        with self._lock:
+            idle = sum(1 for p in self._idle if p.poll() is None)
+            latencies = list(self._latencies)
+            warm_launches, cold_launches = self.warm_launches, self.cold_launches
+        latency = {}
+        for mode in ('warm', 'cold'):
+            samples = [s for m, s in latencies if m == mode]
+            if samples:
+                latency[mode] = {
+                    'count': len(samples),
+                    'avg': sum(samples) / len(samples),
+                    'min': min(samples),
+                    'max': max(samples),
+                    'last': samples[-1]
+                }
+        return {
+            'enabled': self.size > 0,
+            'size': self.size,
+            'idle': idle,
+            'preload_modules': self.preload_modules,
+            'warm_launches': warm_launches,
+            'cold_launches': cold_launches,
+            'ready_latency': latency
+        }
@@ -0,0 +1,177 @@
+# myquant/backend/utils/shard_merge.py
+"""
+分片运行的结果合并。
+
+每个分片是一次独立的 qtrader 运行，持有部分股票池和按比例划分的初始资金。
+全部分片结束后，把它们工作区中的输出合并到一个工作区：
+- equity.csv：按日期对齐，金额列（VALUE_COLUMNS：总资产、现金、持仓市值等）求和，
+  returns 按初始资金加权重算，日收益率由合并后的净值重新计算，其它列（如基准）取第一个分片的值
+- 其它 CSV（成交、订单、持仓等）：逐行拼接并追加 shard 列，按第一列（时间）排序
+- report.html：合并后的收益概览与各分片结果
+"""
+
+import csv
+import html
+from pathlib import Path
+
+EQUITY_FILENAME = 'equity.csv'
+RETURNS_COLUMN = 'returns'
+
+# 各分片之间可以直接相加的金额列
+VALUE_COLUMNS = (
+    'total_value', 'cash', 'available_cash', 'frozen_cash', 'market_value', 'positions_value',
+    'long_positions_value', 'short_positions_value', 'net_positions_value', 'commission', 'pnl'
+)
+# 由合并后的净值重新计算的日收益率列
+DAILY_RETURN_COLUMNS = ('daily_return', 'daily_returns')
+
+
+def _read_csv(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        return list(reader.fieldnames or []), list(reader)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def merge_equity(shard_dirs, weights, output_path):
+    """
+    合并各分片的资金曲线
+    weights 为每个分片的初始资金占比（之和为 1）
+    只保留所有分片都已有数据的日期；某个分片缺少某日数据时沿用它最近一天的数值
+    返回: [(date, returns), ...]
+    """
+    shards = [_read_csv(Path(shard_dir) / EQUITY_FILENAME) for shard_dir in shard_dirs]
+    fieldnames = shards[0][0]
+    if not fieldnames:
+        raise ValueError('分片的 equity.csv 为空')
+    date_column = fieldnames[0]
+
+    by_date = [{row[date_column]: row for row in rows} for _, rows in shards]
+    first_date = max(min(rows) for rows in by_date)
+    dates = sorted({date for rows in by_date for date in rows if date >= first_date})
+
+    merged = []
+    last_rows = [None] * len(shards)
+    previous_nav = None
+    for date in dates:
+        for i, rows in enumerate(by_date):
+            last_rows[i] = rows.get(date, last_rows[i])
+        row = {date_column: date}
+        for column in fieldnames[1:]:
+            values = [_to_float(shard_row.get(column)) for shard_row in last_rows]
+            if column == RETURNS_COLUMN:
+                # 各分片资产 = 初始资金 × (1 + 累计收益率)，合并收益率即按初始资金加权
+                row[column] = sum(w * (1 + (v or 0.0)) for w, v in zip(weights, values)) - 1
+            elif column in VALUE_COLUMNS and all(v is not None for v in values):
+                row[column] = sum(values)
+            else:
+                # 各分片相同的列（如基准），或无法由分片数值直接合并的列
+                row[column] = last_rows[0].get(column)
+
+        # 日收益率按合并后的净值重算（有 returns 时净值从 1 起算，否则用总资产）
+        if RETURNS_COLUMN in row:
+            nav = 1 + row[RETURNS_COLUMN]
+            previous_nav = 1.0 if previous_nav is None else previous_nav
+        else:
+            nav = _to_float(row.get('total_value'))
+        for column in DAILY_RETURN_COLUMNS:
+            if column in row:
+                row[column] = nav / previous_nav - 1 if nav is not None and previous_nav else ''
+        previous_nav = nav
+        merged.append(row)
+
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(merged)
+
+    return [(row[date_column], row.get(RETURNS_COLUMN)) for row in merged]
+
+
+def merge_tables(shard_dirs, output_dir):
+    """拼接各分片工作区根目录下除 equity.csv 之外的 CSV，返回合并的文件名列表"""
+    names = sorted({
+        path.name for shard_dir in shard_dirs for path in Path(shard_dir).glob('*.csv')
+        if path.name != EQUITY_FILENAME
+    })
+    for name in names:
+        fieldnames = []
+        rows = []
+        for index, shard_dir in enumerate(shard_dirs):
+            path = Path(shard_dir) / name
+            if not path.exists():
+                continue
+            shard_fields, shard_rows = _read_csv(path)
+            fieldnames += [field for field in shard_fields if field not in fieldnames]
+            for row in shard_rows:
+                row['shard'] = index
+            rows += shard_rows
+        if fieldnames:
+            rows.sort(key=lambda row: row.get(fieldnames[0]) or '')
+        with open(Path(output_dir) / name, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames + ['shard'])
+            writer.writeheader()
+            writer.writerows(rows)
+    return names
+
+
+def _sparkline(points, width=800, height=240):
+    """用内联 SVG 画出收益曲线"""
+    values = [value for _, value in points if value is not None]
+    if len(values) < 2:
+        return ''
+    low, high = min(values), max(values)
+    span = (high - low) or 1.0
+    step = width / (len(values) - 1)
+    coords = ' '.join(
+        f'{i * step:.1f},{height - (value - low) / span * height:.1f}' for i, value in enumerate(values)
+    )
+    return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            f'<polyline fill="none" stroke="#1f77b4" stroke-width="1.5" points="{coords}"/></svg>')
+
+
+def write_report(output_dir, manifest, equity_points):
+    """生成合并工作区的 report.html"""
+    final_return = equity_points[-1][1] if equity_points else None
+    rows = ''.join(
+        '<tr><td>{}</td><td>{}</td><td>{:,.2f}</td><td>{}</td></tr>'.format(
+            shard['index'] + 1,
+            html.escape(shard.get('run_id') or ''),
+            shard['initial_cash'],
+            '' if shard.get('final_return') is None else f"{shard['final_return']:.2%}"
+        )
+        for shard in manifest['shards']
+    )
+    period = f'{equity_points[0][0]} ~ {equity_points[-1][0]}' if equity_points else ''
+    content = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(manifest['run_id'])}</title>
+<style>body{{font-family:sans-serif;margin:24px}}table{{border-collapse:collapse}}td,th{{border:1px solid #ccc;padding:4px 10px}}</style>
+</head><body>
+<h2>{html.escape(manifest['strategy'])} 分片回测（{manifest['shard_count']} 个分片）</h2>
+<p>区间: {html.escape(period)}　初始资金: {manifest['initial_cash']:,.2f}　合并收益率: {'' if final_return is None else f'{final_return:.2%}'}</p>
+{_sparkline(equity_points)}
+<h3>分片</h3>
+<table><tr><th>分片</th><th>运行</th><th>初始资金</th><th>收益率</th></tr>{rows}</table>
+</body></html>
+"""
+    with open(Path(output_dir) / 'report.html', 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def merge_shards(shard_dirs, manifest, output_dir):
+    """
+    合并所有分片的输出到 output_dir
+    返回合并后的最终收益率
+    """
+    total_cash = sum(shard['initial_cash'] for shard in manifest['shards'])
+    weights = [shard['initial_cash'] / total_cash for shard in manifest['shards']]
+    equity_points = merge_equity(shard_dirs, weights, Path(output_dir) / EQUITY_FILENAME)
+    merge_tables(shard_dirs, output_dir)
+    write_report(output_dir, manifest, equity_points)
+    return equity_points[-1][1] if equity_points else None
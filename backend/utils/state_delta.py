@@ -0,0 +1,56 @@
+# myquant/backend/utils/state_delta.py
+"""
+监控状态的增量编码。
+
+diff_state 比较两个（嵌套字典）状态，得到把旧状态变为新状态所需的最少操作：
+- set: [[路径, 新值], ...]，路径为键的列表；字典以外的值（列表、数字等）整体替换
+- unset: [路径, ...]，新状态中已不存在的键
+apply_delta 是其逆操作（供测试和 Python 客户端使用）。
+encode_frame 可选地把帧编码为紧凑的二进制（zlib 压缩的 JSON）。
+"""
+
+import copy
+import json
+import zlib
+
+
+def diff_state(old, new, path=()):
+    """返回 (set_ops, unset_ops)"""
+    set_ops = []
+    unset_ops = []
+    for key, value in new.items():
+        if key not in old:
+            set_ops.append([list(path) + [key], value])
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            child_set, child_unset = diff_state(old[key], value, path + (key,))
+            set_ops.extend(child_set)
+            unset_ops.extend(child_unset)
+        elif value != old[key]:
+            set_ops.append([list(path) + [key], value])
+    for key in old:
+        if key not in new:
+            unset_ops.append(list(path) + [key])
+    return set_ops, unset_ops
+
+
+def apply_delta(state, set_ops, unset_ops):
+    """把增量应用到状态上（原地修改并返回）"""
+    for path in unset_ops:
+        node = state
+        for key in path[:-1]:
+            node = node.get(key, {})
+        node.pop(path[-1], None)
+    for path, value in set_ops:
+        node = state
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = copy.deepcopy(value)
+    return state
+
+
+def encode_frame(frame, binary=False):
+    """binary 为 True 时返回 zlib 压缩的 JSON 字节，否则原样返回"""
+    if not binary:
+        return frame
+    text = json.dumps(frame, ensure_ascii=False, separators=(',', ':'), default=str)
+    return zlib.compress(text.encode('utf-8'), 6)
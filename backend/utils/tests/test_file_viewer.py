@@ -0,0 +1,138 @@
+# myquant/backend/utils/tests/test_file_viewer.py
+"""大文件分段查看的单元测试"""
+
+import pytest
+
+from backend.utils import file_viewer
+from backend.utils.file_viewer import get_line_index, read_bytes, read_lines, tail_lines
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    """缩小索引步长和读取块，让小文件也能覆盖多个检查点和多次读取"""
+    monkeypatch.setattr(file_viewer, 'LINE_INDEX_STEP', 10)
+    monkeypatch.setattr(file_viewer, 'SCAN_CHUNK_SIZE', 64)
+    monkeypatch.setattr(file_viewer, 'TAIL_BLOCK_SIZE', 16)
+    file_viewer._index_cache.clear()
+    file_viewer._path_locks.clear()
+
+
+def write_lines(path, count, trailing_newline=True):
+    text = '\n'.join(f'line {i}' for i in range(count))
+    path.write_text(text + ('\n' if trailing_newline else ''), encoding='utf-8')
+    return text
+
+
+@pytest.mark.parametrize('trailing_newline', [True, False])
+def test_read_lines_pages(tmp_path, trailing_newline):
+    path = tmp_path / 'run.log'
+    write_lines(path, 95, trailing_newline)
+
+    page = read_lines(path, 37, 5)
+    assert page['lines'] == [f'line {i}' for i in range(37, 42)]
+    assert page['total_lines'] == 95
+    assert page['next_offset'] == 42
+
+    last = read_lines(path, 90, 10)
+    assert last['lines'] == [f'line {i}' for i in range(90, 95)]
+    assert last['next_offset'] is None
+
+    assert read_lines(path, 500, 10)['lines'] == []
+
+
+def test_index_checkpoints_are_line_offsets(tmp_path):
+    path = tmp_path / 'run.log'
+    write_lines(path, 35)
+    data = path.read_bytes()
+
+    index = get_line_index(path)
+    assert len(index.checkpoints) == 4
+    for i, offset in enumerate(index.checkpoints):
+        assert data[offset:].startswith(f'line {i * 10}\n'.encode())
+
+
+def test_index_extends_appended_files(tmp_path):
+    path = tmp_path / 'run.log'
+    write_lines(path, 25, trailing_newline=False)
+    first = get_line_index(path)
+    assert first.total_lines == 25
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n' + '\n'.join(f'line {i}' for i in range(25, 40)) + '\n')
+    second = get_line_index(path)
+
+    assert second.total_lines == 40
+    # 增量更新在副本上进行，之前取得的索引不变
+    assert first.total_lines == 25
+    assert read_lines(path, 24, 3)['lines'] == ['line 24', 'line 25', 'line 26']
+
+
+def test_index_rebuilds_truncated_files(tmp_path):
+    path = tmp_path / 'run.log'
+    write_lines(path, 30)
+    assert get_line_index(path).total_lines == 30
+    write_lines(path, 5)
+    assert get_line_index(path).total_lines == 5
+
+
+def test_index_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_viewer, 'INDEX_CACHE_SIZE', 2)
+    paths = [tmp_path / f'{i}.log' for i in range(3)]
+    for path in paths:
+        write_lines(path, 3)
+        get_line_index(path)
+    assert list(file_viewer._index_cache) == [str(paths[1]), str(paths[2])]
+    assert str(paths[0]) not in file_viewer._path_locks
+
+
+def test_eviction_keeps_locks_in_use(tmp_path, monkeypatch):
+    """被淘汰的文件仍有请求持有或等待锁时，锁必须保留，后续请求仍与其串行"""
+    monkeypatch.setattr(file_viewer, 'INDEX_CACHE_SIZE', 1)
+    busy, other = tmp_path / 'busy.log', tmp_path / 'other.log'
+    write_lines(busy, 3)
+    write_lines(other, 3)
+    get_line_index(busy)
+
+    entry = file_viewer._path_locks[str(busy)]
+    entry[1] += 1  # 模拟一个正在等待该锁的请求
+    get_line_index(other)  # 淘汰 busy 的索引
+    assert str(busy) not in file_viewer._index_cache
+    assert file_viewer._path_locks[str(busy)] is entry
+
+    entry[1] -= 1
+    get_line_index(busy)
+    assert file_viewer._path_locks[str(busy)] is entry
+    get_line_index(other)
+    assert str(busy) not in file_viewer._path_locks
+
+
+def test_tail_lines(tmp_path):
+    path = tmp_path / 'run.log'
+    write_lines(path, 50)
+
+    lines, size, truncated = tail_lines(path, 3)
+    assert lines == ['line 47', 'line 48', 'line 49']
+    assert size == path.stat().st_size
+    assert truncated is False
+
+    assert tail_lines(path, 0)[0] == []
+    assert tail_lines(path, 500)[0] == [f'line {i}' for i in range(50)]
+
+
+def test_tail_lines_stops_at_byte_cap(tmp_path):
+    path = tmp_path / 'run.log'
+    write_lines(path, 50)
+
+    lines, _, truncated = tail_lines(path, 40, max_bytes=40)
+    assert truncated is True
+    # 只返回上限内的完整行
+    assert lines == ['line 46', 'line 47', 'line 48', 'line 49']
+
+
+def test_read_bytes_clamps_range(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_bytes(b'0123456789')
+    assert read_bytes(path, 3, 4) == (b'3456', 10)
+    assert read_bytes(path, 8, 100) == (b'89', 10)
+    assert read_bytes(path, 50, 4) == (b'', 10)
+    assert read_bytes(path, -5, 2) == (b'01', 10)
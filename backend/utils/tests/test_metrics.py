@@ -0,0 +1,125 @@
+# myquant/backend/utils/tests/test_metrics.py
+"""绩效指标计算的单元测试"""
+
+import numpy as np
+import pytest
+
+from backend.utils import metrics
+from backend.utils.metrics import (
+    TRADING_DAYS_PER_YEAR, compute_metrics, daily_nav, drawdown_series, get_equity_metrics, load_equity
+)
+
+
+def make_dates(n):
+    return np.array([f'2023-01-{day:02d}' for day in range(1, n + 1)])
+
+
+def test_total_and_annual_return():
+    nav = np.array([1.01, 1.02, 1.05])
+    metrics = compute_metrics(make_dates(3), nav)
+    assert metrics['trading_days'] == 3
+    assert metrics['final_return'] == pytest.approx(0.05)
+    assert metrics['total_return'] == metrics['final_return']
+    assert metrics['annual_return'] == pytest.approx(1.05 ** (TRADING_DAYS_PER_YEAR / 3) - 1)
+    assert metrics['start_date'] == '2023-01-01'
+    assert metrics['end_date'] == '2023-01-03'
+
+
+def test_first_day_return_is_relative_to_initial_capital():
+    # 第一天就亏 10%，胜率和回撤都应计入这一天
+    metrics = compute_metrics(make_dates(2), np.array([0.9, 0.99]))
+    assert metrics['max_drawdown'] == pytest.approx(-0.1)
+    assert metrics['win_rate'] == pytest.approx(0.5)
+
+
+def test_max_drawdown_and_duration():
+    nav = np.array([1.1, 1.2, 0.9, 1.0, 1.3, 1.25])
+    metrics = compute_metrics(make_dates(6), nav)
+    assert metrics['max_drawdown'] == pytest.approx(0.9 / 1.2 - 1)
+    assert metrics['max_drawdown_start'] == '2023-01-02'
+    assert metrics['max_drawdown_end'] == '2023-01-03'
+    # 1.2 之后跌破高点两天，第 5 天创出新高
+    assert metrics['max_drawdown_duration'] == 2
+    assert metrics['calmar'] == pytest.approx(metrics['annual_return'] / abs(metrics['max_drawdown']))
+
+
+def test_volatility_sharpe_and_sortino():
+    nav = np.array([1.01, 0.99, 1.02, 1.03])
+    returns = nav / np.concatenate(([1.0], nav[:-1])) - 1
+    metrics = compute_metrics(make_dates(4), nav)
+    std = returns.std(ddof=1)
+    assert metrics['volatility'] == pytest.approx(std * np.sqrt(TRADING_DAYS_PER_YEAR))
+    assert metrics['sharpe'] == pytest.approx(returns.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR))
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+    assert metrics['sortino'] == pytest.approx(returns.mean() / downside * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+
+def test_single_day_and_flat_curves_have_no_ratios():
+    single = compute_metrics(make_dates(1), np.array([1.02]))
+    assert single['volatility'] is None and single['sharpe'] is None
+
+    flat = compute_metrics(make_dates(3), np.array([1.0, 1.0, 1.0]))
+    assert flat['sharpe'] is None
+    assert flat['sortino'] is None
+    assert flat['calmar'] is None
+    assert flat['win_rate'] is None
+    assert flat['max_drawdown'] == 0
+
+
+def test_non_positive_nav_has_no_annual_return():
+    metrics = compute_metrics(make_dates(2), np.array([0.5, 0.0]))
+    assert metrics['annual_return'] is None
+    assert metrics['final_return'] == pytest.approx(-1.0)
+
+
+def test_daily_nav_takes_last_value_of_each_day():
+    dates = np.array(['2023-01-03 09:30:00', '2023-01-03 15:00:00', '2023-01-04 09:30:00', '2023-01-04 15:00:00'])
+    days, nav = daily_nav(dates, np.array([1.0, 1.1, 1.2, 1.15]))
+    assert days.tolist() == ['2023-01-03', '2023-01-04']
+    assert nav.tolist() == [1.1, 1.15]
+
+
+def test_drawdown_series_starts_from_initial_capital():
+    assert drawdown_series(np.array([0.95, 1.1, 0.99])).tolist() == pytest.approx([-0.05, 0.0, 0.99 / 1.1 - 1])
+
+
+def test_equity_metrics_from_workspace(tmp_path):
+    (tmp_path / 'equity.csv').write_text(
+        'date,total_value,returns\n2023-01-03,1010000,0.01\n2023-01-04,1020000,0.02\n', encoding='utf-8'
+    )
+    dates, nav = load_equity(tmp_path)
+    assert dates.tolist() == ['2023-01-03', '2023-01-04']
+    assert nav.tolist() == pytest.approx([1.01, 1.02])
+    assert get_equity_metrics(tmp_path)['final_return'] == pytest.approx(0.02)
+
+
+def test_equity_from_total_value_without_returns(tmp_path):
+    (tmp_path / 'equity.csv').write_text(
+        'date,total_value\n2023-01-03,200\n2023-01-04,250\n', encoding='utf-8'
+    )
+    _, nav = load_equity(tmp_path)
+    assert nav.tolist() == pytest.approx([1.0, 1.25])
+
+
+def test_missing_equity_returns_none(tmp_path):
+    assert get_equity_metrics(tmp_path) is None
+
+
+def test_offloaded_compute_does_not_reenter_the_cache(tmp_path, monkeypatch):
+    """交给 run_cpu_bound 的函数在原生线程中执行，不能嵌套 run_cpu_bound 或取缓存锁"""
+    depth = []
+
+    def run_cpu_bound(fn, *args, **kwargs):
+        assert not depth, 'run_cpu_bound 被嵌套调用'
+        depth.append(fn)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            depth.pop()
+
+    monkeypatch.setattr(metrics, 'run_cpu_bound', run_cpu_bound)
+    metrics._cache.clear()
+    (tmp_path / 'equity.csv').write_text(
+        'date,total_value,returns\n2023-01-03,1010000,0.01\n2023-01-04,1020000,0.02\n', encoding='utf-8'
+    )
+    assert get_equity_metrics(tmp_path, risk_free_rate=0.01)['final_return'] == pytest.approx(0.02)
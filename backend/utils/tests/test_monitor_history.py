@@ -0,0 +1,90 @@
+# myquant/backend/utils/tests/test_monitor_history.py
+"""监控历史缓冲（降采样）的单元测试"""
+
+from backend.utils.monitor_history import MonitorHistory, SeriesBuffer
+
+
+def test_series_keeps_everything_below_capacity():
+    buffer = SeriesBuffer(10)
+    for t in range(10):
+        buffer.add(t, {'value': t * 10})
+    assert buffer.export() == {'time': list(range(10)), 'fields': {'value': [t * 10 for t in range(10)]}}
+
+
+def test_series_downsamples_uniformly_when_full():
+    buffer = SeriesBuffer(8)
+    for t in range(1000):
+        buffer.add(t, {'value': t})
+
+    times = buffer.times
+    assert len(times) <= 8
+    # 覆盖整个运行过程（保留起点），且间隔均匀
+    assert times[0] == 0
+    assert times[-1] >= 1000 - buffer.stride
+    gaps = {b - a for a, b in zip(times, times[1:])}
+    assert len(gaps) == 1
+    assert buffer.fields['value'] == times
+
+
+def test_series_memory_is_bounded():
+    buffer = SeriesBuffer(50)
+    for t in range(100000):
+        buffer.add(t, {'value': t})
+    assert len(buffer.times) <= 50
+    assert all(len(column) == len(buffer.times) for column in buffer.fields.values())
+
+
+def test_series_same_time_keeps_latest_values():
+    buffer = SeriesBuffer(10)
+    buffer.add(1, {'cash': 100})
+    buffer.add(1, {'cash': 90, 'total_value': 200})
+    buffer.add(2, {'cash': 80})
+    assert buffer.export() == {'time': [1, 2], 'fields': {'cash': [90, 80], 'total_value': [200, None]}}
+
+
+def test_series_new_fields_are_backfilled():
+    buffer = SeriesBuffer(10)
+    buffer.add(1, {'a': 1})
+    buffer.add(2, {'b': 2})
+    assert buffer.export()['fields'] == {'a': [1, None], 'b': [None, 2]}
+
+
+def update(t, cash, benchmark=None, orders=None):
+    overview = {'current_dt': f'2023-01-03 09:{t:02d}', 'portfolio': {'cash': cash, 'name': 'acct', 'ok': True}}
+    if benchmark is not None:
+        overview['benchmark'] = {'value': benchmark}
+    data = {'overview': overview}
+    if orders is not None:
+        data['orders'] = {'orders': orders}
+    return data
+
+
+def test_history_records_numeric_series():
+    history = MonitorHistory(capacity=100)
+    history.record(update(30, 100.0, benchmark=1.0))
+    history.record(update(31, 101.5))
+    exported = history.export()
+
+    equity = exported['series']['equity']
+    assert equity['time'] == ['2023-01-03 09:30', '2023-01-03 09:31']
+    # 只记录数值字段（字符串和布尔值忽略）
+    assert equity['fields'] == {'cash': [100.0, 101.5]}
+    assert exported['series']['benchmark']['fields'] == {'value': [1.0]}
+
+
+def test_history_ignores_updates_without_time():
+    history = MonitorHistory()
+    history.record({'overview': {'portfolio': {'cash': 1}}})
+    history.record('not a dict')
+    assert history.export() == {'series': {}, 'orders': []}
+
+
+def test_history_dedupes_and_bounds_orders():
+    history = MonitorHistory(max_orders=3)
+    history.record(update(30, 1, orders=[{'order_id': 1, 'status': 'open'}, {'order_id': 2, 'status': 'open'}]))
+    history.record(update(31, 1, orders=[{'order_id': 1, 'status': 'filled'}, {'id': 3}, {'symbol': 'x'}]))
+    history.record(update(32, 1, orders=[{'symbol': 'x'}, 'bad']))
+
+    orders = history.export()['orders']
+    assert len(orders) == 3
+    assert orders == [{'order_id': 1, 'status': 'filled'}, {'id': 3}, {'symbol': 'x'}]
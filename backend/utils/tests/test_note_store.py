@@ -0,0 +1,67 @@
+# myquant/backend/utils/tests/test_note_store.py
+"""运行备注存储（SQLite 写穿 + 旧 JSON 文件迁移）的单元测试"""
+
+import json
+
+from backend.utils.note_store import NoteStore
+
+
+def write_legacy(path, notes):
+    path.write_text(json.dumps(notes, ensure_ascii=False), encoding='utf-8')
+
+
+def test_legacy_file_is_imported_once_and_renamed(tmp_path):
+    legacy = tmp_path / 'run_notes.json'
+    write_legacy(legacy, {'demo_backtest_1': '第一次', 'demo_backtest_2': '', 'other_backtest_1': 'x'})
+
+    store = NoteStore(tmp_path / 'notes.db', legacy_file=legacy)
+    assert store.all() == {'demo_backtest_1': '第一次', 'other_backtest_1': 'x'}  # 空备注不导入
+    assert not legacy.exists()
+    assert (tmp_path / 'run_notes.json.migrated').exists()
+
+    # 之后启动不再有旧文件，数据来自数据库
+    reopened = NoteStore(tmp_path / 'notes.db', legacy_file=legacy)
+    assert reopened.get('demo_backtest_1') == '第一次'
+
+
+def test_legacy_import_does_not_overwrite_existing_notes(tmp_path):
+    db_path = tmp_path / 'notes.db'
+    NoteStore(db_path).set('demo_backtest_1', '新备注')
+    legacy = tmp_path / 'run_notes.json'
+    write_legacy(legacy, {'demo_backtest_1': '旧备注', 'demo_backtest_2': '只在旧文件中'})
+
+    store = NoteStore(db_path, legacy_file=legacy)
+    assert store.get('demo_backtest_1') == '新备注'
+    assert store.get('demo_backtest_2') == '只在旧文件中'
+
+
+def test_unreadable_legacy_file_is_left_in_place(tmp_path):
+    legacy = tmp_path / 'run_notes.json'
+    legacy.write_text('{broken', encoding='utf-8')
+
+    store = NoteStore(tmp_path / 'notes.db', legacy_file=legacy)
+    assert store.all() == {}
+    assert legacy.exists()
+
+
+def test_set_delete_and_write_through(tmp_path):
+    db_path = tmp_path / 'notes.db'
+    store = NoteStore(db_path)
+    store.set('a', 'one')
+    store.set('b', 'two')
+    store.set('b', '')  # 空备注等同于删除
+    store.delete('missing')
+
+    assert store.get_many(['a', 'b']) == {'a': 'one', 'b': ''}
+    assert NoteStore(db_path).all() == {'a': 'one'}
+
+
+def test_delete_prefix_treats_underscore_literally(tmp_path):
+    store = NoteStore(tmp_path / 'notes.db')
+    for run_id in ('demo_backtest_1', 'demo_simulation_1', 'demoXbacktest_1', 'demo2_backtest_1'):
+        store.set(run_id, run_id)
+
+    deleted = store.delete_prefix('demo_')
+    assert sorted(deleted) == ['demo_backtest_1', 'demo_simulation_1']
+    assert sorted(store.all()) == ['demo2_backtest_1', 'demoXbacktest_1']
+    assert sorted(NoteStore(tmp_path / 'notes.db').all()) == ['demo2_backtest_1', 'demoXbacktest_1']
@@ -0,0 +1,87 @@
+# myquant/backend/utils/tests/test_process_supervisor.py
+"""运行器进程退出监视的单元测试（pidfd 与等待线程两种方式）"""
+
+import queue
+import subprocess
+import sys
+
+import pytest
+
+from backend.utils.process_supervisor import ProcessSupervisor
+
+
+def spawn(code='import time; time.sleep(0.2)'):
+    return subprocess.Popen([sys.executable, '-c', code])
+
+
+def make_supervisor(use_pidfd):
+    exits = queue.Queue()
+    supervisor = ProcessSupervisor(lambda key, pid, returncode: exits.put((key, pid, returncode)))
+    if use_pidfd and not supervisor.use_pidfd:
+        pytest.skip('当前平台不支持 pidfd')
+    supervisor.use_pidfd = use_pidfd
+    return supervisor, exits
+
+
+@pytest.fixture(params=[True, False], ids=['pidfd', 'thread'])
+def supervisor(request):
+    return make_supervisor(request.param)
+
+
+def test_child_exit_reports_returncode(supervisor):
+    supervisor, exits = supervisor
+    first = spawn('import sys, time; time.sleep(0.2); sys.exit(3)')
+    second = spawn('import time; time.sleep(0.4)')
+    supervisor.watch('first', first.pid, first)
+    supervisor.watch('second', second.pid, second)
+
+    assert exits.get(timeout=5) == ('first', first.pid, 3)
+    assert exits.get(timeout=5) == ('second', second.pid, 0)
+    # 回调前已回收，不会残留僵尸进程
+    assert first.returncode == 3 and second.returncode == 0
+    assert supervisor.watched_count() == 0
+
+
+def test_reattached_pid_exit_is_detected_without_returncode(supervisor):
+    supervisor, exits = supervisor
+    process = spawn()
+    supervisor.watch('reattached', process.pid)
+
+    assert exits.get(timeout=5) == ('reattached', process.pid, None)
+    process.wait(timeout=5)
+
+
+def test_mismatched_process_is_ignored(supervisor):
+    supervisor, exits = supervisor
+    process, other = spawn(), spawn('pass')
+    supervisor.watch('run', process.pid, other)
+
+    assert exits.get(timeout=5) == ('run', process.pid, None)
+    process.wait(timeout=5)
+    other.wait(timeout=5)
+
+
+def test_already_exited_process_is_reported_immediately():
+    supervisor, exits = make_supervisor(use_pidfd=True)
+    process = spawn('pass')
+    process.wait(timeout=5)
+    supervisor.watch('gone', process.pid, process)
+
+    assert exits.get(timeout=5) == ('gone', process.pid, 0)
+
+
+def test_callback_errors_do_not_stop_the_watcher(supervisor):
+    supervisor, exits = supervisor
+    original = supervisor.on_exit
+
+    def on_exit(key, pid, returncode):
+        original(key, pid, returncode)
+        if key == 'bad':
+            raise RuntimeError('boom')
+
+    supervisor.on_exit = on_exit
+    bad, good = spawn('pass'), spawn()
+    supervisor.watch('bad', bad.pid, bad)
+    assert exits.get(timeout=5)[0] == 'bad'
+    supervisor.watch('good', good.pid, good)
+    assert exits.get(timeout=5) == ('good', good.pid, 0)
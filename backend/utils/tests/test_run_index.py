@@ -0,0 +1,87 @@
+# myquant/backend/utils/tests/test_run_index.py
+"""历史运行摘要索引的单元测试"""
+
+import sqlite3
+
+from backend.utils.run_index import RunIndex, workspace_size
+
+
+def make_summary(run_id, strategy='demo', mode='backtest', **fields):
+    summary = {
+        'run_id': run_id,
+        'strategy': strategy,
+        'mode': mode,
+        'workspace_dir': f'/tmp/{run_id}',
+        'dir_mtime_ns': 1,
+        'start_time': 100.0,
+        'status': 'finished',
+        'size_bytes': 10,
+    }
+    summary.update(fields)
+    return summary
+
+
+def test_upsert_list_and_delete(tmp_path):
+    index = RunIndex(tmp_path / 'index.db')
+    index.upsert(make_summary('a'))
+    index.upsert(make_summary('b', mode='simulation'))
+    index.upsert(make_summary('c', strategy='other'))
+
+    assert set(index.list('demo')) == {'a', 'b'}
+    assert set(index.list('demo', 'simulation')) == {'b'}
+    assert index.get('a')['note'] == ''
+
+    index.upsert(make_summary('a', status='interrupted', dir_mtime_ns=2))
+    assert index.get('a')['status'] == 'interrupted'
+    assert index.get('a')['dir_mtime_ns'] == 2
+
+    index.set_note('a', '好结果')
+    assert index.get('a')['note'] == '好结果'
+    index.delete(['a'])
+    assert index.get('a') is None
+    index.delete_strategy('demo')
+    assert index.list('demo') == {}
+    assert set(index.list('other')) == {'c'}
+
+
+def test_strategy_stats(tmp_path):
+    index = RunIndex(tmp_path / 'index.db')
+    index.upsert(make_summary('a', start_time=100.0, size_bytes=5))
+    index.upsert(make_summary('b', start_time=200.0, size_bytes=7, status='corrupted'))
+    index.upsert(make_summary('c', strategy='other', start_time=50.0, size_bytes=None))
+
+    stats = index.strategy_stats()
+    assert stats['demo']['counts'] == {'finished': 1, 'corrupted': 1}
+    assert stats['demo']['size_bytes'] == 12
+    assert stats['demo']['latest_run']['run_id'] == 'b'
+    assert stats['other']['size_bytes'] == 0
+
+
+def test_migration_adds_column_and_invalidates_summaries(tmp_path):
+    db_path = tmp_path / 'index.db'
+    conn = sqlite3.connect(str(db_path))
+    with conn:
+        conn.execute(
+            'CREATE TABLE run_summaries (run_id TEXT PRIMARY KEY, strategy TEXT NOT NULL, mode TEXT NOT NULL, '
+            'workspace_dir TEXT NOT NULL, dir_mtime_ns INTEGER NOT NULL, start_time REAL, status TEXT, '
+            'start_date TEXT, end_date TEXT, final_return REAL, note TEXT NOT NULL DEFAULT \'\', '
+            'size_bytes INTEGER, file_count INTEGER, updated_at REAL NOT NULL)'
+        )
+        conn.execute(
+            "INSERT INTO run_summaries (run_id, strategy, mode, workspace_dir, dir_mtime_ns, updated_at) "
+            "VALUES ('a', 'demo', 'backtest', '/tmp/a', 123, 0)"
+        )
+    conn.close()
+
+    index = RunIndex(db_path)
+    summary = index.get('a')
+    assert summary['end_time'] is None
+    # 旧摘要缺少新列，标记为过期后下次列出时重建
+    assert summary['dir_mtime_ns'] == -1
+
+
+def test_workspace_size(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'a.csv').write_bytes(b'x' * 10)
+    (tmp_path / 'sub' / 'b.log').write_bytes(b'y' * 5)
+    assert workspace_size(tmp_path) == (15, 2)
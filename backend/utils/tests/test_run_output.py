@@ -0,0 +1,81 @@
+# myquant/backend/utils/tests/test_run_output.py
+"""运行器输出捕获与批量推送的单元测试"""
+
+import time
+
+from backend.utils.run_output import OUTPUT_LOG_NAME, OutputCapture, OutputHub, parse_log_line
+
+
+def read_log(workspace):
+    return [parse_log_line(line) for line in (workspace / OUTPUT_LOG_NAME).read_text(encoding='utf-8').splitlines()]
+
+
+def test_append_does_not_touch_the_log_file(tmp_path):
+    capture = OutputCapture()
+    capture.attach_workspace(tmp_path)
+    capture.append('stdout', 'hello')
+    assert not (tmp_path / OUTPUT_LOG_NAME).exists()
+
+    capture.write_pending()
+    assert read_log(tmp_path) == [{'stream': 'stdout', 'text': 'hello'}]
+
+
+def test_output_before_ready_is_written_after_attach(tmp_path):
+    capture = OutputCapture()
+    capture.append('stderr', 'importing')
+    capture.write_pending()  # 工作区未就绪，不写也不丢
+    capture.attach_workspace(tmp_path)
+    capture.append('stdout', 'ready')
+    capture.write_pending()
+    assert read_log(tmp_path) == [{'stream': 'stderr', 'text': 'importing'}, {'stream': 'stdout', 'text': 'ready'}]
+
+
+def test_log_rotates_in_write_pending(tmp_path):
+    capture = OutputCapture(max_bytes=100, backup_count=2)
+    capture.attach_workspace(tmp_path)
+    for i in range(29):
+        capture.append('stdout', f'line {i:02d}')
+    capture.write_pending()
+    assert (tmp_path / f'{OUTPUT_LOG_NAME}.1').exists()
+    assert (tmp_path / f'{OUTPUT_LOG_NAME}.2').exists()
+    assert not (tmp_path / f'{OUTPUT_LOG_NAME}.3').exists()
+    assert read_log(tmp_path)[-1] == {'stream': 'stdout', 'text': 'line 28'}
+
+
+def test_unwritten_overflow_is_recorded_in_the_log(tmp_path):
+    capture = OutputCapture(max_pending_lines=3)
+    capture.attach_workspace(tmp_path)
+    for i in range(5):
+        capture.append('stdout', str(i))
+    capture.write_pending()
+    lines = read_log(tmp_path)
+    assert lines[0]['stream'] == 'platform' and '2' in lines[0]['text']
+    assert [line['text'] for line in lines[1:]] == ['2', '3', '4']
+
+
+def test_hub_writes_emits_and_drops_closed_capture(tmp_path):
+    emitted = []
+
+    def emit(run_id, lines, dropped):
+        emitted.extend(lines)
+
+    hub = OutputHub(emit, flush_interval=0.01)
+    capture = OutputCapture()
+    capture.attach_workspace(tmp_path)
+    hub.register('run-1', capture)
+    for i in range(10):
+        capture.append('stdout', f'line {i}')
+    capture.close()
+
+    deadline = time.time() + 5
+    while hub.get('run-1') is not None and time.time() < deadline:
+        time.sleep(0.01)
+    assert hub.get('run-1') is None
+    assert [entry['text'] for entry in emitted] == [f'line {i}' for i in range(10)]
+    assert len(read_log(tmp_path)) == 10
+    assert capture._file is None
+
+
+def test_parse_log_line():
+    assert parse_log_line('[stderr] boom: [x] y') == {'stream': 'stderr', 'text': 'boom: [x] y'}
+    assert parse_log_line('no prefix') == {'stream': 'stdout', 'text': 'no prefix'}
@@ -0,0 +1,100 @@
+# myquant/backend/utils/tests/test_run_registry.py
+"""活动运行登记表（内存字典 + SQLite 写穿）的单元测试"""
+
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from backend.utils.run_registry import RunRegistry
+
+
+def make_info(strategy='demo', **fields):
+    info = {
+        'strategy': strategy,
+        'mode': 'backtest',
+        'pid': 1234,
+        'port': 8051,
+        'is_paused': False,
+        'workspace_dir': f'/tmp/{strategy}/ws',
+        'last_heartbeat': datetime.now() - timedelta(hours=1),
+    }
+    info.update(fields)
+    return info
+
+
+def stored_rows(db_path):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return {row[0]: row[1:] for row in conn.execute('SELECT run_id, strategy, pid, is_paused FROM active_runs')}
+    finally:
+        conn.close()
+
+
+def test_writes_through_to_sqlite(tmp_path):
+    db_path = tmp_path / 'runs.db'
+    registry = RunRegistry(db_path)
+    registry['a'] = make_info(pid=11)
+    registry['b'] = make_info('other', pid=22, is_paused=True)
+    assert stored_rows(db_path) == {'a': ('demo', 11, 0), 'b': ('other', 22, 1)}
+
+    del registry['a']
+    assert registry.pop('b')['pid'] == 22
+    assert registry.pop('b', None) is None
+    with pytest.raises(KeyError):
+        registry.pop('b')
+    assert stored_rows(db_path) == {}
+
+
+def test_update_run_persists_but_direct_mutation_does_not(tmp_path):
+    db_path = tmp_path / 'runs.db'
+    registry = RunRegistry(db_path)
+    registry['a'] = make_info()
+
+    registry['a']['port'] = 9999  # 只改内存
+    registry.update_run('a', is_paused=True)
+    reloaded = RunRegistry(db_path)
+    assert reloaded['a']['is_paused'] is True
+    assert reloaded['a']['port'] == 9999  # update_run 持久化的是整条记录
+    assert stored_rows(db_path)['a'][2] == 1
+
+
+def test_reload_restores_records_and_resets_heartbeat(tmp_path):
+    db_path = tmp_path / 'runs.db'
+    registry = RunRegistry(db_path)
+    registry['a'] = make_info(workspace_dir=Path('/tmp/demo/ws'))
+
+    before = datetime.now()
+    reloaded = RunRegistry(db_path)
+    info = reloaded['a']
+    assert info['workspace_dir'] == '/tmp/demo/ws'
+    assert info['pid'] == 1234
+    # 心跳从重新加载时开始计算，重启期间的运行不会被当作空闲实例清理
+    assert isinstance(info['last_heartbeat'], datetime)
+    assert info['last_heartbeat'] >= before
+
+
+def test_strategy_index_follows_changes(tmp_path):
+    registry = RunRegistry(tmp_path / 'runs.db')
+    registry['a'] = make_info('demo')
+    registry['b'] = make_info('demo')
+    registry['c'] = make_info('other')
+    assert set(registry.by_strategy('demo')) == {'a', 'b'}
+
+    registry['b'] = make_info('other')  # 覆盖时从旧策略的索引中移除
+    del registry['a']
+    assert registry.by_strategy('demo') == {}
+    assert set(registry.by_strategy('other')) == {'b', 'c'}
+    assert len(registry) == 2 and 'a' not in registry
+
+
+def test_corrupted_rows_are_skipped_on_load(tmp_path):
+    db_path = tmp_path / 'runs.db'
+    RunRegistry(db_path)['a'] = make_info()
+    conn = sqlite3.connect(str(db_path))
+    with conn:
+        conn.execute("INSERT INTO active_runs (run_id, strategy, data) VALUES ('broken', 'demo', '{not json')")
+    conn.close()
+
+    assert list(RunRegistry(db_path)) == ['a']
@@ -0,0 +1,261 @@
+# myquant/backend/utils/tests/test_run_scheduler.py
+"""运行队列与调度器的单元测试（submit_fn 用假的启动器代替）"""
+
+import json
+import time
+from collections import namedtuple
+
+import pytest
+
+from backend.utils import run_scheduler as scheduler_module
+from backend.utils.run_scheduler import CANCELLED, FAILED, LAUNCHING, QUEUED, STARTED, RunScheduler
+
+Memory = namedtuple('Memory', 'available')
+
+
+class FakeLauncher:
+    """记录每次启动请求，由测试决定何时报告启动阶段"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.launches = []  # [(strategy, listener, launch_options)]
+
+    def __call__(self, strategy_name, mode, listener, **launch_options):
+        if self.error:
+            raise RuntimeError(self.error)
+        self.launches.append((strategy_name, listener, launch_options))
+        return {'launch_id': f'launch-{len(self.launches)}'}
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def idle_host(monkeypatch):
+    """CPU 空闲、内存充足的主机"""
+    monkeypatch.setattr(scheduler_module.psutil, 'cpu_percent', lambda interval=None: 0.0)
+    monkeypatch.setattr(scheduler_module.psutil, 'virtual_memory', lambda: Memory(64 * 2 ** 30))
+
+
+def make_scheduler(tmp_path, launcher, **kwargs):
+    kwargs.setdefault('count_active', lambda: 0)
+    kwargs.setdefault('max_concurrency', 1)
+    return RunScheduler(tmp_path / 'run_queue.json', submit_fn=launcher, poll_interval=0.05, **kwargs)
+
+
+def test_admits_by_priority_then_submission_order(tmp_path, idle_host):
+    launcher = FakeLauncher()
+    scheduler = make_scheduler(tmp_path, launcher)
+    low = scheduler.submit('low', 'backtest', priority=0)
+    high = scheduler.submit('high', 'backtest', priority=5)
+    mid_first = scheduler.submit('mid_first', 'backtest', priority=1)
+    scheduler.submit('mid_second', 'backtest', priority=1, launch_options={'user_data': {'x': 1}})
+    scheduler.start()
+
+    for expected in ('high', 'mid_first', 'mid_second', 'low'):
+        assert wait_until(lambda: launcher.launches and launcher.launches[-1][0] == expected)
+        # max_concurrency 为 1：上一个启动完成前不会放行下一个
+        time.sleep(0.1)
+        assert launcher.launches[-1][0] == expected
+        launcher.launches[-1][1]('ready', run_id=f'{expected}_run')
+
+    assert scheduler.get(high['queue_id'])['status'] == STARTED
+    assert scheduler.get(mid_first['queue_id'])['run_id'] == 'mid_first_run'
+    assert scheduler.get(low['queue_id'])['wait_time'] >= 0
+    assert launcher.launches[2][2] == {'user_data': {'x': 1}}
+
+
+def test_failed_launch_is_recorded_and_reported(tmp_path, idle_host):
+    scheduler = make_scheduler(tmp_path, FakeLauncher(error='boom'))
+    finished = []
+    scheduler.add_finish_listener(finished.append)
+    item = scheduler.submit('demo', 'backtest', tag={'sweep_id': 's1', 'index': 0})
+    scheduler.start()
+
+    assert wait_until(lambda: finished)
+    assert scheduler.get(item['queue_id'])['status'] == FAILED
+    assert finished[0]['error'] == 'boom'
+    assert finished[0]['tag'] == {'sweep_id': 's1', 'index': 0}
+
+
+def test_check_resources(tmp_path, monkeypatch):
+    active = {'count': 0}
+    scheduler = make_scheduler(tmp_path, FakeLauncher(), count_active=lambda: active['count'], max_concurrency=4,
+                               cores_per_run=1, memory_per_run_mb=512, min_free_memory_mb=1024)
+    scheduler.cpu_count = 4
+    cpu = {'percent': 90.0}
+    memory = {'mb': 100}
+    monkeypatch.setattr(scheduler_module.psutil, 'cpu_percent', lambda interval=None: cpu['percent'])
+    monkeypatch.setattr(scheduler_module.psutil, 'virtual_memory', lambda: Memory(memory['mb'] * 2 ** 20))
+
+    # 没有任何运行时总是放行一个
+    assert scheduler._check_resources(0) is None
+    active['count'] = 4
+    assert scheduler._check_resources(0) == 'max_concurrency'
+    active['count'] = 1
+    assert scheduler._check_resources(0) == 'cpu'
+    cpu['percent'] = 10.0
+    assert scheduler._check_resources(0) == 'memory'
+    memory['mb'] = 1600
+    assert scheduler._check_resources(0) is None
+    # 正在启动的运行预先扣除内存
+    assert scheduler._check_resources(1) == 'memory'
+    assert scheduler._check_resources(3) == 'max_concurrency'
+
+
+def test_cancel_only_affects_queued_items(tmp_path):
+    scheduler = make_scheduler(tmp_path, FakeLauncher())
+    finished = []
+    scheduler.add_finish_listener(finished.append)
+    queued = scheduler.submit('demo', 'backtest')
+    launching = scheduler.submit('demo', 'backtest')
+    scheduler.items[launching['queue_id']]['status'] = LAUNCHING
+
+    assert scheduler.cancel(queued['queue_id']) is True
+    assert scheduler.cancel(queued['queue_id']) is False
+    assert scheduler.cancel(launching['queue_id']) is False
+    assert scheduler.cancel('missing') is False
+    assert scheduler.get(queued['queue_id'])['status'] == CANCELLED
+    assert [item['queue_id'] for item in finished] == [queued['queue_id']]
+
+
+def test_prune_removes_only_expired_finished_items(tmp_path):
+    scheduler = make_scheduler(tmp_path, FakeLauncher(), history_ttl=60)
+    old = scheduler.submit('demo', 'backtest')
+    recent = scheduler.submit('demo', 'backtest')
+    queued = scheduler.submit('demo', 'backtest')
+    scheduler.items[queued['queue_id']]['submitted_at'] = time.time() - 3600
+    for item, age in ((old, 3600), (recent, 10)):
+        item['status'] = STARTED
+        item['finished_at'] = time.time() - age
+
+    with scheduler._cond:
+        scheduler._prune()
+
+    assert scheduler.get(old['queue_id']) is None
+    assert scheduler.get(recent['queue_id'])['status'] == STARTED
+    assert scheduler.get(queued['queue_id'])['status'] == QUEUED
+    with open(tmp_path / 'run_queue.json', 'r', encoding='utf-8') as f:
+        assert old['queue_id'] not in {item['queue_id'] for item in json.load(f)}
+
+
+def test_queue_survives_restart(tmp_path):
+    scheduler = make_scheduler(tmp_path, FakeLauncher())
+    item = scheduler.submit('demo', 'backtest', priority=3, launch_options={'config_overrides': {'a.b': 1}})
+
+    restored = make_scheduler(tmp_path, FakeLauncher())
+    loaded = restored.get(item['queue_id'])
+    assert loaded['status'] == QUEUED
+    assert loaded['priority'] == 3
+    assert loaded['launch_options'] == {'config_overrides': {'a.b': 1}}
+    assert loaded['position'] == 1
+
+
+def test_restart_reconciles_launching_items(tmp_path, idle_host):
+    scheduler = make_scheduler(tmp_path, FakeLauncher())
+    launched = scheduler.submit('launched', 'backtest')
+    pending = scheduler.submit('pending', 'backtest')
+    for item in (launched, pending):
+        item['status'] = LAUNCHING
+        item['admitted_at'] = time.time()
+    launched['workspace_dir'] = '/workspaces/20250101_093000'
+    with scheduler._cond:
+        scheduler._save()
+
+    launcher = FakeLauncher()
+    restored = make_scheduler(
+        tmp_path, launcher, max_concurrency=2,
+        find_launched=lambda item: 'launched_run' if item.get('workspace_dir') else None
+    )
+    finished = []
+    restored.add_finish_listener(finished.append)
+    # 核对在 start() 中进行，加载时保持原状态
+    assert restored.get(launched['queue_id'])['status'] == LAUNCHING
+    restored.start()
+
+    # 已经启动的不会重复启动，没有启动迹象的重新排队并启动
+    assert wait_until(lambda: launcher.launches)
+    time.sleep(0.1)
+    assert [launch[0] for launch in launcher.launches] == ['pending']
+    assert restored.get(launched['queue_id'])['status'] == STARTED
+    assert restored.get(launched['queue_id'])['run_id'] == 'launched_run'
+    assert [item['queue_id'] for item in finished] == [launched['queue_id']]
+
+
+def test_workspace_is_recorded_while_launching(tmp_path, idle_host):
+    launcher = FakeLauncher()
+    scheduler = make_scheduler(tmp_path, launcher)
+    item = scheduler.submit('demo', 'backtest')
+    scheduler.start()
+    assert wait_until(lambda: launcher.launches)
+
+    launcher.launches[0][1]('workspace_created', workspace_dir='/workspaces/20250101_093000')
+    with open(tmp_path / 'run_queue.json', 'r', encoding='utf-8') as f:
+        saved = {entry['queue_id']: entry for entry in json.load(f)}
+    assert saved[item['queue_id']]['status'] == LAUNCHING
+    assert saved[item['queue_id']]['workspace_dir'] == '/workspaces/20250101_093000'
+
+
+def test_submit_many_persists_and_notifies_once(tmp_path, idle_host):
+    changes = []
+    scheduler = make_scheduler(tmp_path, FakeLauncher(), on_change=lambda: changes.append(1))
+    items = scheduler.submit_many([
+        {'strategy_name': 'sweep', 'mode': 'backtest', 'tag': {'index': index}} for index in range(50)
+    ])
+    assert len(changes) == 1
+    assert [item['tag']['index'] for item in items] == list(range(50))
+    assert [item['tag']['index'] for item in scheduler._queued()] == list(range(50))
+    saved = json.loads((tmp_path / 'run_queue.json').read_text(encoding='utf-8'))
+    assert [item['queue_id'] for item in saved] == [item['queue_id'] for item in items]
+    assert scheduler.submit_many([]) == []
+    assert len(changes) == 1
+
+
+def test_admission_waits_for_free_slots(tmp_path, idle_host):
+    active = {'count': 0}
+    launcher = FakeLauncher()
+    scheduler = make_scheduler(tmp_path, launcher, max_concurrency=2, count_active=lambda: active['count'])
+    items = scheduler.submit_many([{'strategy_name': f'run{i}', 'mode': 'backtest'} for i in range(3)])
+    scheduler.start()
+
+    # 启动中的条目也占用并发名额
+    assert wait_until(lambda: len(launcher.launches) == 2)
+    for name, listener, _ in launcher.launches:
+        listener('ready', run_id=f'{name}_run')
+    active['count'] = 2
+    time.sleep(0.2)
+    assert len(launcher.launches) == 2
+    assert scheduler.blocked_reason == 'max_concurrency'
+    assert scheduler.get(items[2]['queue_id'])['position'] == 1
+
+    # 一个运行结束后，notify 立即唤醒调度线程放行排队的条目
+    active['count'] = 1
+    scheduler.notify()
+    assert wait_until(lambda: len(launcher.launches) == 3)
+    assert launcher.launches[2][0] == 'run2'
+
+
+def test_finished_items_and_tags_survive_restart(tmp_path, idle_host):
+    launcher = FakeLauncher()
+    scheduler = make_scheduler(tmp_path, launcher)
+    started = scheduler.submit('demo', 'backtest', tag={'wf_id': 'w1', 'window': 0})
+    cancelled = scheduler.submit('demo', 'backtest', priority=-1)
+    scheduler.cancel(cancelled['queue_id'])
+    scheduler.start()
+    assert wait_until(lambda: launcher.launches)
+    launcher.launches[0][1]('ready', run_id='demo_run')
+    assert wait_until(lambda: scheduler.get(started['queue_id'])['status'] == STARTED)
+
+    restored = make_scheduler(tmp_path, FakeLauncher())
+    loaded = restored.get(started['queue_id'])
+    assert loaded['status'] == STARTED
+    assert loaded['run_id'] == 'demo_run'
+    assert loaded['tag'] == {'wf_id': 'w1', 'window': 0}
+    assert restored.get(cancelled['queue_id'])['status'] == CANCELLED
+    assert restored._queued() == []
@@ -0,0 +1,103 @@
+# myquant/backend/utils/tests/test_run_telemetry.py
+"""运行资源占用采样的单元测试（对真实的子进程树采样）"""
+
+import json
+import subprocess
+import sys
+import time
+
+import psutil
+import pytest
+
+from backend.utils.run_telemetry import TELEMETRY_FILENAME, RunTelemetry, TelemetrySampler
+
+# 启动一个孙进程后一起等待，stdin 关闭时退出
+TREE_SCRIPT = '''
+import subprocess, sys
+child = subprocess.Popen([sys.executable, '-c', 'import sys; sys.stdin.read()'], stdin=subprocess.PIPE)
+print('ready', flush=True)
+sys.stdin.read()
+child.stdin.close()
+child.wait()
+'''
+
+
+@pytest.fixture
+def process_tree():
+    process = subprocess.Popen([sys.executable, '-c', TREE_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    assert process.stdout.readline().strip() == b'ready'
+    yield process
+    if process.poll() is None:
+        process.stdin.close()
+        process.wait(timeout=10)
+    process.stdout.close()
+
+
+def stop(process):
+    process.stdin.close()
+    process.wait(timeout=10)
+
+
+def test_sample_covers_the_whole_process_tree(process_tree, tmp_path):
+    telemetry = RunTelemetry('run', process_tree.pid, tmp_path, collect_uss=False)
+    first = telemetry.sample(now=100.0)
+    second = telemetry.sample(now=101.0)
+
+    assert first['processes'] == second['processes'] == 2
+    assert second['rss'] > 0 and second['threads'] >= 2 and second['fds'] > 0
+    assert 'uss' not in second
+    # 速率从第二次采样开始计算
+    assert 'read_rate' not in first and second['read_rate'] >= 0 and second['write_rate'] >= 0
+    assert telemetry.samples == 2 and telemetry.latest['time'] == 101.0
+    assert telemetry.peak['processes'] == 2 and telemetry.peak['rss'] >= second['rss']
+    assert telemetry.series.export()['time'] == [100.0, 101.0]
+
+
+def test_sample_raises_once_the_runner_exits(process_tree, tmp_path):
+    telemetry = RunTelemetry('run', process_tree.pid, tmp_path)
+    telemetry.sample()
+    stop(process_tree)
+    with pytest.raises(psutil.NoSuchProcess):
+        telemetry.sample()
+
+
+def test_finish_writes_resource_usage_once(process_tree, tmp_path):
+    sampler = TelemetrySampler(lambda samples: None, interval=60)
+    telemetry = sampler.register('run', process_tree.pid, tmp_path)
+    telemetry.sample()
+
+    path = sampler.finish('run')
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert path == tmp_path / TELEMETRY_FILENAME
+    assert data['run_id'] == 'run' and data['samples'] == 1
+    assert data['peak']['processes'] == 2 and data['series']['time']
+    assert data['ended_at'] >= data['started_at']
+    assert sampler.finish('run') is None and sampler.get('run') is None
+
+
+def test_register_ignores_exited_process(tmp_path):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait(timeout=10)
+    sampler = TelemetrySampler(lambda samples: None)
+    assert sampler.register('run', process.pid, tmp_path) is None
+    assert sampler.overview()['runs'] == []
+
+
+def test_sampler_emits_samples_and_finishes_exited_runs(process_tree, tmp_path):
+    emitted = []
+    sampler = TelemetrySampler(emitted.append, interval=0.05, collect_uss=False)
+    sampler.register('run', process_tree.pid, tmp_path)
+
+    deadline = time.time() + 5
+    while not emitted and time.time() < deadline:
+        time.sleep(0.02)
+    assert emitted and emitted[0]['run']['processes'] == 2
+    overview = sampler.overview()
+    assert overview['totals']['rss'] == sum(run['latest']['rss'] for run in overview['runs'])
+
+    # 进程退出后由采样线程结束采样并写入记录
+    stop(process_tree)
+    while sampler.get('run') is not None and time.time() < deadline:
+        time.sleep(0.02)
+    assert sampler.get('run') is None
+    assert (tmp_path / TELEMETRY_FILENAME).exists()
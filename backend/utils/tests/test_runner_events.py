@@ -0,0 +1,133 @@
+# myquant/backend/utils/tests/test_runner_events.py
+"""运行器启动握手的单元测试：RunnerChannel 的事件解析与等待，ReadyReporter 的端口与工作区识别"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from backend.utils.runner_events import EVENT_PREFIX, RunnerChannel, RunnerStartupError
+
+
+def runner(*lines, tail=''):
+    """依次输出给定行的子进程；tail 为输出之后执行的代码"""
+    code = 'import sys, time\n' + ''.join(f'print({line!r}, flush=True)\n' for line in lines) + tail
+    return subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def event(name, **payload):
+    return EVENT_PREFIX + json.dumps(dict(payload, event=name))
+
+
+def test_wait_ready_returns_ready_event_and_forwards_all_events():
+    received = []
+    process = runner(event('imported'), 'plain output', '@@MYQUANT_EVENT {broken',
+                     event('ready', pid=1, port=8051, workspace_dir='/ws'), event('monitor', equity=1.0))
+    channel = RunnerChannel(process, on_event=received.append)
+
+    assert channel.wait_ready(10)['port'] == 8051
+    process.wait(timeout=10)
+    channel._thread.join(timeout=10)
+    assert [e['event'] for e in received] == ['imported', 'ready', 'monitor']
+    # 事件以外的行进入输出缓存，无法解析的事件行被丢弃
+    assert channel.output.tail_text(5) == 'plain output'
+
+
+def test_failed_event_raises_with_output_tail():
+    process = runner('loading strategy', event('failed', error='bad config'), tail='time.sleep(5)')
+    channel = RunnerChannel(process)
+    try:
+        with pytest.raises(RunnerStartupError, match='bad config') as excinfo:
+            channel.wait_ready(10)
+        assert 'loading strategy' in str(excinfo.value)
+    finally:
+        process.kill()
+
+
+def test_exit_before_ready_is_detected_immediately():
+    process = runner(event('imported'), tail='sys.stderr.write("Traceback: boom\\n"); sys.exit(2)')
+    channel = RunnerChannel(process)
+    with pytest.raises(RunnerStartupError, match='返回码: 2') as excinfo:
+        channel.wait_ready(10)
+    assert 'Traceback: boom' in str(excinfo.value)
+
+
+def test_wait_ready_times_out():
+    process = runner(event('imported'), tail='time.sleep(5)')
+    channel = RunnerChannel(process)
+    try:
+        with pytest.raises(RunnerStartupError, match='0.2 秒内'):
+            channel.wait_ready(0.2)
+    finally:
+        process.kill()
+
+
+@pytest.fixture
+def reporter_events(monkeypatch, capfd):
+    """安装 ReadyReporter 的拦截（测试结束后还原），返回读取已报告事件的函数"""
+    pytest.importorskip('qtrader')
+    from backend.utils import platform_runner
+    monkeypatch.setattr(socket.socket, 'listen', socket.socket.listen)
+    monkeypatch.setattr(os, 'mkdir', os.mkdir)
+
+    def read_events():
+        out = capfd.readouterr().out
+        return [json.loads(line[len(EVENT_PREFIX):]) for line in out.splitlines() if line.startswith(EVENT_PREFIX)]
+
+    return platform_runner, read_events
+
+
+def listen_on(port=0):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', port))
+    sock.listen()
+    return sock
+
+
+def test_reporter_only_accepts_the_configured_port(reporter_events, tmp_path):
+    platform_runner, read_events = reporter_events
+    expected = listen_on()
+    expected_port = expected.getsockname()[1]
+    expected.close()
+
+    mode_dir = tmp_path / 'demo' / 'backtest'
+    mode_dir.mkdir(parents=True)
+    reporter = platform_runner.ReadyReporter(mode_dir=mode_dir, expected_port=expected_port)
+    reporter.install()
+    other = listen_on()  # 策略或第三方库自己监听的端口
+    os.mkdir(mode_dir / 'ws')
+    assert reporter.port is None
+    monitor = listen_on(expected_port)
+    other.close()
+    monitor.close()
+
+    events = read_events()
+    assert [e['event'] for e in events] == ['workspace_created', 'listening', 'ready']
+    assert events[-1]['port'] == expected_port
+    assert events[-1]['workspace_dir'] == str((mode_dir / 'ws').resolve())
+
+
+def test_reporter_takes_first_listener_when_port_is_assigned_by_os(reporter_events, tmp_path):
+    platform_runner, read_events = reporter_events
+    reporter = platform_runner.ReadyReporter(workspace_dir=tmp_path, expected_port=0)
+    reporter.install()
+    first, second = listen_on(), listen_on()
+    first_port = first.getsockname()[1]
+    first.close()
+    second.close()
+
+    events = read_events()
+    assert [e['event'] for e in events] == ['listening', 'ready']
+    assert events[-1]['port'] == first_port
+
+
+def test_read_runner_config(reporter_events, tmp_path):
+    platform_runner, _ = reporter_events
+    config = tmp_path / 'config.yaml'
+    config.write_text('engine:\n  mode: simulation\nserver:\n  port: 8060\n', encoding='utf-8')
+    assert platform_runner.read_runner_config(config) == ('simulation', 8060)
+    config.write_text('engine: {}\n', encoding='utf-8')
+    assert platform_runner.read_runner_config(config) == ('backtest', 0)
@@ -0,0 +1,97 @@
+# myquant/backend/utils/tests/test_runner_pool.py
+"""预热运行器进程池的单元测试（用回显参数的假运行器脚本代替 platform_runner.py）"""
+
+import json
+import time
+
+import pytest
+
+from backend.utils import runner_pool
+from backend.utils.runner_pool import RunnerPool, build_runner_args
+
+# 预热模式从 stdin 读取一行 argv，冷启动直接使用命令行参数；两种方式都把 argv 回显到 stdout
+FAKE_RUNNER = '''
+import json, sys
+args = sys.argv[1:]
+if args[:1] == ['--warm']:
+    args = json.loads(sys.stdin.readline())
+print(json.dumps(args))
+'''
+
+
+@pytest.fixture
+def fake_runner(tmp_path, monkeypatch):
+    script = tmp_path / 'fake_runner.py'
+    script.write_text(FAKE_RUNNER, encoding='utf-8')
+    monkeypatch.setattr(runner_pool, 'RUNNER_SCRIPT', script)
+    return script
+
+
+def launched_args(process):
+    # 预热 worker 的 stdin 已由进程池关闭，直接读取 stdout
+    stdout = process.stdout.read()
+    process.wait(timeout=10)
+    process.stdout.close()
+    process.stderr.close()
+    return json.loads(stdout)
+
+
+def wait_idle(pool, count, timeout=5):
+    deadline = time.time() + timeout
+    while pool.get_stats()['idle'] != count and time.time() < deadline:
+        time.sleep(0.02)
+    return pool.get_stats()['idle'] == count
+
+
+def test_build_runner_args():
+    args = build_runner_args('cfg.yaml', strategy='s.py', resume_from='snap.pkl', start_paused=True,
+                             user_data={'fast': 5}, shard={'index': 1, 'count': 4})
+    assert args == ['--config', 'cfg.yaml', '--user-data', '{"fast": 5}', '--shard', '1/4', '--shard-key', 'symbols',
+                    '--resume-from', 'snap.pkl', '--strategy', 's.py', '--start-paused']
+    assert build_runner_args('cfg.yaml') == ['--config', 'cfg.yaml']
+
+
+def test_disabled_pool_launches_cold(fake_runner):
+    pool = RunnerPool(size=0)
+    pool.start()
+    process, launch_mode = pool.launch(['--config', 'a.yaml'])
+    assert launch_mode == 'cold'
+    assert launched_args(process) == ['--config', 'a.yaml']
+    assert pool.get_stats()['enabled'] is False
+
+
+def test_warm_launch_hands_args_to_idle_worker_and_replenishes(fake_runner):
+    pool = RunnerPool(size=1, preload_modules=[])
+    pool.start()
+    try:
+        assert wait_idle(pool, 1)
+        process, launch_mode = pool.launch(['--config', 'a.yaml'])
+        assert launch_mode == 'warm'
+        assert launched_args(process) == ['--config', 'a.yaml']
+        # 取出 worker 后在后台补充
+        assert wait_idle(pool, 1)
+    finally:
+        pool.shutdown()
+    assert pool.get_stats()['idle'] == 0
+
+
+def test_dead_idle_worker_falls_back_to_cold_launch(fake_runner):
+    pool = RunnerPool(size=1, preload_modules=[])
+    pool.start()
+    assert wait_idle(pool, 1)
+    pool.shutdown()  # 杀掉空闲 worker，池也不再补充
+    process, launch_mode = pool.launch(['--config', 'b.yaml'])
+    assert launch_mode == 'cold'
+    assert launched_args(process) == ['--config', 'b.yaml']
+
+
+def test_get_stats_summarises_latency_by_launch_mode():
+    pool = RunnerPool(size=2)
+    for launch_mode, seconds in [('warm', 0.2), ('cold', 3.0), ('warm', 0.4)]:
+        pool.record_latency(launch_mode, seconds)
+    pool.warm_launches, pool.cold_launches = 2, 1
+
+    stats = pool.get_stats()
+    assert stats['ready_latency']['warm'] == {'count': 2, 'avg': pytest.approx(0.3), 'min': 0.2, 'max': 0.4, 'last': 0.4}
+    assert stats['ready_latency']['cold']['count'] == 1
+    assert (stats['warm_launches'], stats['cold_launches'], stats['idle']) == (2, 1, 0)
@@ -0,0 +1,112 @@
+# myquant/backend/utils/tests/test_shard_merge.py
+"""分片结果合并的单元测试"""
+
+import csv
+
+import pytest
+
+from backend.utils.shard_merge import merge_equity, merge_shards, merge_tables
+
+
+def write_csv(path, header, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture
+def shard_dirs(tmp_path):
+    header = ['date', 'total_value', 'cash', 'returns', 'daily_return', 'benchmark']
+    write_csv(tmp_path / 'a' / 'equity.csv', header, [
+        ['2023-01-03', 600, 100, 0.0, 0.0, 1.0],
+        ['2023-01-04', 660, 100, 0.1, 0.1, 1.01],
+        ['2023-01-05', 690, 120, 0.15, 0.0454545, 1.02],
+    ])
+    write_csv(tmp_path / 'b' / 'equity.csv', header, [
+        ['2023-01-03', 400, 50, 0.0, 0.0, 1.0],
+        ['2023-01-04', 380, 50, -0.05, -0.05, 1.01],
+        # 缺少 2023-01-05：沿用上一天的数值
+    ])
+    return [tmp_path / 'a', tmp_path / 'b']
+
+
+def test_merge_equity_sums_value_columns_and_weights_returns(tmp_path, shard_dirs):
+    points = merge_equity(shard_dirs, [0.6, 0.4], tmp_path / 'equity.csv')
+    rows = read_csv(tmp_path / 'equity.csv')
+
+    assert [row['date'] for row in rows] == ['2023-01-03', '2023-01-04', '2023-01-05']
+    assert [float(row['total_value']) for row in rows] == [1000, 1040, 1070]
+    assert [float(row['cash']) for row in rows] == [150, 150, 170]
+    assert [value for _, value in points] == pytest.approx([0.0, 0.04, 0.07])
+    # 与合并后的总资产一致
+    assert float(rows[-1]['returns']) == pytest.approx(1070 / 1000 - 1)
+
+
+def test_merge_equity_recomputes_ratios(tmp_path, shard_dirs):
+    merge_equity(shard_dirs, [0.6, 0.4], tmp_path / 'equity.csv')
+    rows = read_csv(tmp_path / 'equity.csv')
+
+    assert [float(row['daily_return']) for row in rows] == pytest.approx([0.0, 0.04, 1.07 / 1.04 - 1])
+    # 非金额列不求和，取第一个分片的值
+    assert [row['benchmark'] for row in rows] == ['1.0', '1.01', '1.02']
+
+
+def test_merge_equity_starts_when_every_shard_has_data(tmp_path):
+    write_csv(tmp_path / 'a' / 'equity.csv', ['date', 'total_value', 'returns'], [
+        ['2023-01-02', 500, 0.0], ['2023-01-03', 510, 0.02]
+    ])
+    write_csv(tmp_path / 'b' / 'equity.csv', ['date', 'total_value', 'returns'], [
+        ['2023-01-03', 500, 0.0]
+    ])
+    points = merge_equity([tmp_path / 'a', tmp_path / 'b'], [0.5, 0.5], tmp_path / 'equity.csv')
+    assert points == [('2023-01-03', pytest.approx(0.01))]
+
+
+def test_merge_equity_keeps_identifier_columns(tmp_path):
+    write_csv(tmp_path / 'a' / 'equity.csv', ['date', 'total_value', 'account_id'], [['2023-01-03', 100, '000001']])
+    write_csv(tmp_path / 'b' / 'equity.csv', ['date', 'total_value', 'account_id'], [['2023-01-03', 200, '000002']])
+    merge_equity([tmp_path / 'a', tmp_path / 'b'], [0.5, 0.5], tmp_path / 'equity.csv')
+    row = read_csv(tmp_path / 'equity.csv')[0]
+    assert float(row['total_value']) == 300
+    assert row['account_id'] == '000001'
+
+
+def test_merge_tables_concatenates_and_sorts(tmp_path):
+    write_csv(tmp_path / 'a' / 'trades.csv', ['time', 'symbol', 'amount'], [
+        ['2023-01-04 10:00', '000001', 100]
+    ])
+    write_csv(tmp_path / 'b' / 'trades.csv', ['time', 'symbol', 'amount', 'fee'], [
+        ['2023-01-03 10:00', '600000', 200, 5]
+    ])
+    write_csv(tmp_path / 'b' / 'equity.csv', ['date'], [])
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+
+    assert merge_tables([tmp_path / 'a', tmp_path / 'b'], output_dir) == ['trades.csv']
+    rows = read_csv(output_dir / 'trades.csv')
+    assert [(row['symbol'], row['shard'], row['fee']) for row in rows] == [('600000', '1', '5'), ('000001', '0', '')]
+
+
+def test_merge_shards_writes_report(tmp_path, shard_dirs):
+    output_dir = tmp_path / 'merged'
+    output_dir.mkdir()
+    manifest = {
+        'run_id': 'demo_backtest_20230101_000000',
+        'strategy': 'demo',
+        'shard_count': 2,
+        'initial_cash': 1000,
+        'shards': [
+            {'index': 0, 'run_id': 'a', 'initial_cash': 600, 'final_return': 0.15},
+            {'index': 1, 'run_id': 'b', 'initial_cash': 400, 'final_return': -0.05},
+        ]
+    }
+    assert merge_shards(shard_dirs, manifest, output_dir) == pytest.approx(0.07)
+    report = (output_dir / 'report.html').read_text(encoding='utf-8')
+    assert '7.00%' in report and '<svg' in report
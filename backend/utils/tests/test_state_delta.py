@@ -0,0 +1,79 @@
+# myquant/backend/utils/tests/test_state_delta.py
+"""监控状态增量编码的单元测试"""
+
+import copy
+import json
+import random
+import zlib
+
+from backend.utils.state_delta import apply_delta, diff_state, encode_frame
+
+
+def test_identical_states_have_no_ops():
+    state = {'overview': {'portfolio': {'cash': 1.0}}, 'orders': [1, 2]}
+    assert diff_state(state, copy.deepcopy(state)) == ([], [])
+
+
+def test_nested_changes_use_paths():
+    old = {'overview': {'portfolio': {'cash': 100, 'total_value': 200}, 'current_dt': '09:30'}, 'log': 'a'}
+    new = {'overview': {'portfolio': {'cash': 90, 'total_value': 200}, 'current_dt': '09:31'}, 'orders': []}
+    set_ops, unset_ops = diff_state(old, new)
+    assert sorted(set_ops, key=str) == sorted([
+        [['overview', 'portfolio', 'cash'], 90],
+        [['overview', 'current_dt'], '09:31'],
+        [['orders'], []],
+    ], key=str)
+    assert unset_ops == [['log']]
+
+
+def test_lists_and_type_changes_replace_whole_value():
+    old = {'positions': [{'symbol': 'a', 'amount': 1}], 'benchmark': {'value': 1}}
+    new = {'positions': [{'symbol': 'a', 'amount': 2}], 'benchmark': 1.01}
+    set_ops, unset_ops = diff_state(old, new)
+    assert [['positions'], [{'symbol': 'a', 'amount': 2}]] in set_ops
+    assert [['benchmark'], 1.01] in set_ops
+    assert unset_ops == []
+
+
+def test_apply_delta_round_trip():
+    old = {'a': {'b': {'c': 1, 'd': 2}, 'e': [1]}, 'f': 'x'}
+    new = {'a': {'b': {'c': 1, 'g': 3}, 'e': [1, 2]}, 'h': {'i': None}}
+    set_ops, unset_ops = diff_state(old, new)
+    assert apply_delta(copy.deepcopy(old), set_ops, unset_ops) == new
+
+
+def test_applied_values_are_copies():
+    new = {'orders': [{'id': 1}]}
+    set_ops, unset_ops = diff_state({}, new)
+    state = apply_delta({}, set_ops, unset_ops)
+    state['orders'][0]['id'] = 2
+    assert new['orders'][0]['id'] == 1
+
+
+def random_state(rng, depth=0):
+    state = {}
+    for key in rng.sample('abcdef', rng.randint(0, 4)):
+        kind = rng.random()
+        if kind < 0.3 and depth < 3:
+            state[key] = random_state(rng, depth + 1)
+        elif kind < 0.5:
+            state[key] = [rng.randint(0, 3) for _ in range(rng.randint(0, 2))]
+        else:
+            state[key] = rng.choice([0, 1, 2.5, 'x', None, True])
+    return state
+
+
+def test_random_round_trips():
+    rng = random.Random(7)
+    for _ in range(500):
+        old, new = random_state(rng), random_state(rng)
+        set_ops, unset_ops = diff_state(old, new)
+        assert apply_delta(copy.deepcopy(old), set_ops, unset_ops) == new
+
+
+def test_encode_frame():
+    frame = {'run_id': 'demo', 'v': 3, 'set': [[['overview', 'current_dt'], '2023-01-03 09:31']]}
+    assert encode_frame(frame) is frame
+    encoded = encode_frame(frame, binary=True)
+    assert isinstance(encoded, bytes)
+    assert json.loads(zlib.decompress(encoded).decode('utf-8')) == frame
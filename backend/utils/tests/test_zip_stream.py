@@ -0,0 +1,126 @@
+# myquant/backend/utils/tests/test_zip_stream.py
+"""流式 ZIP 打包的单元测试"""
+
+import io
+import os
+import zipfile
+
+import pytest
+
+from backend.utils import zip_stream
+from backend.utils.zip_stream import iter_zip
+
+
+def build_workspace(root):
+    (root / 'logs').mkdir(parents=True)
+    (root / 'columnar' / 'equity').mkdir(parents=True)
+    (root / 'equity.csv').write_text('date,returns\n2023-01-03,0.01\n', encoding='utf-8')
+    (root / 'logs' / 'run.log').write_text('第一行\n第二行\n', encoding='utf-8')
+    (root / 'chart.png').write_bytes(b'\x89PNG' + bytes(range(256)) * 10)
+    (root / 'columnar' / 'equity' / 'c0.npy').write_bytes(b'\0' * 100)
+    (root / 'big.bin').write_bytes(os.urandom(300 * 1024))
+
+
+def open_zip(chunks):
+    return zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+
+
+def test_archive_round_trip(tmp_path):
+    root = tmp_path / '20230101_093000'
+    build_workspace(root)
+
+    with open_zip(iter_zip(root)) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert '20230101_093000/equity.csv' in names
+        assert '20230101_093000/logs/' in names
+        assert zf.read('20230101_093000/logs/run.log').decode('utf-8') == '第一行\n第二行\n'
+        assert zf.read('20230101_093000/big.bin') == (root / 'big.bin').read_bytes()
+
+
+def test_precompressed_files_are_not_compressed(tmp_path):
+    root = tmp_path / 'ws'
+    build_workspace(root)
+
+    with open_zip(iter_zip(root)) as zf:
+        chart = zf.getinfo('ws/chart.png')
+        # 0 级 DEFLATED 只有少量分块开销，不再压缩
+        assert chart.compress_type == zipfile.ZIP_DEFLATED
+        assert chart.compress_size >= chart.file_size
+        log = zf.getinfo('ws/logs/run.log')
+        assert log.compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_no_stored_entries_use_data_descriptors(tmp_path):
+    """很多解压工具不接受带数据描述符（flag bit 3）的 STORED 条目"""
+    root = tmp_path / 'ws'
+    build_workspace(root)
+
+    with open_zip(iter_zip(root)) as zf:
+        infos = zf.infolist()
+    assert any(info.is_dir() for info in infos)
+    for info in infos:
+        if info.compress_type == zipfile.ZIP_STORED:
+            assert not info.flag_bits & 0x08, info.filename
+
+
+def test_exclude_dirs_and_arc_root(tmp_path):
+    root = tmp_path / 'ws'
+    build_workspace(root)
+
+    with open_zip(iter_zip(root, arc_root='export', exclude_dirs=('columnar',))) as zf:
+        names = zf.namelist()
+    assert all(name.startswith('export/') for name in names)
+    assert not any('columnar' in name for name in names)
+
+
+def test_streams_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_stream, 'CHUNK_SIZE', 16 * 1024)
+    root = tmp_path / 'ws'
+    build_workspace(root)
+
+    chunks = [chunk for chunk in iter_zip(root) if chunk]
+    # 大文件按块读取，每块压缩后立即输出
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks) < 100 * 1024
+    with open_zip(chunks) as zf:
+        assert zf.testzip() is None
+
+
+def test_unreadable_files_are_skipped(tmp_path):
+    root = tmp_path / 'ws'
+    build_workspace(root)
+    os.symlink(tmp_path / 'does_not_exist', root / 'broken_link.csv')
+
+    with open_zip(iter_zip(root)) as zf:
+        assert zf.testzip() is None
+        assert 'ws/broken_link.csv' not in zf.namelist()
+        assert 'ws/equity.csv' in zf.namelist()
+
+
+def test_read_failure_mid_file_aborts_the_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_stream, 'CHUNK_SIZE', 16 * 1024)
+    root = tmp_path / 'ws'
+    build_workspace(root)
+
+    class FailingFile(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell() > 0:
+                raise OSError('设备错误')
+            return super().read(size)
+
+    real_open = open
+
+    def fake_open(path, mode='r', *args, **kwargs):
+        if str(path).endswith('big.bin'):
+            return FailingFile(real_open(path, 'rb').read())
+        return real_open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(zip_stream, 'open', fake_open, raising=False)
+    chunks = []
+    with pytest.raises(OSError):
+        for chunk in iter_zip(root):
+            chunks.append(chunk)
+    # 已输出的部分没有中央目录，不会被当作完整的压缩包
+    with pytest.raises(zipfile.BadZipFile):
+        open_zip(chunks)
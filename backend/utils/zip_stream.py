@@ -0,0 +1,104 @@
+# myquant/backend/utils/zip_stream.py
+"""
+流式生成 ZIP 压缩包。
+
+边读取文件边压缩边输出，不生成临时文件：ZipFile 写入一个不可 seek 的缓冲区，
+每写入一块数据就把缓冲区中的字节交给调用方（通常直接作为 HTTP 分块响应发送）。
+文件的大小和 CRC 只能写在数据之后的数据描述符中，而很多解压工具（包括 Windows 资源管理器）
+不接受带数据描述符的 STORED 条目，因此：
+- 本身已经压缩过的文件（图片、压缩包等）以 DEFLATED 0 级（不压缩）存入，避免白白消耗 CPU
+- 目录条目没有数据，直接写入完整的文件头，不带数据描述符
+"""
+
+import io
+import os
+import zipfile
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+
+# 已压缩格式，以 0 级压缩存入
+STORED_SUFFIXES = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.zst', '.lz4', '.rar',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp4',
+    '.parquet', '.feather', '.whl', '.npz',
+}
+
+
+def _set_compress_level(info, level):
+    """设置单个条目的压缩级别（Python 3.13 起为公开属性 compress_level）"""
+    if hasattr(info, 'compress_level'):
+        info.compress_level = level
+    else:
+        info._compresslevel = level
+
+
+class _StreamBuffer(io.RawIOBase):
+    """只写缓冲区，不支持 seek，ZipFile 会改用数据描述符记录每个文件的大小和 CRC"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(root_dir, arc_root=None, exclude_dirs=()):
+    """
+    逐块生成 root_dir 的 ZIP 数据
+    arc_root: 压缩包内的顶层目录名，默认为 root_dir 的目录名
+    exclude_dirs: 不打包的子目录名（任意层级）
+    无法打开的文件会被跳过；读取到一半失败时中止输出（抛出 OSError），
+    下载方得到的是不完整的压缩包，而不是一个看似完整、实际内容被截断的文件
+    """
+    root_dir = Path(root_dir)
+    arc_root = arc_root if arc_root is not None else root_dir.name
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for dirpath, dirnames, filenames in os.walk(root_dir):
+            dirnames[:] = sorted(name for name in dirnames if name not in exclude_dirs)
+            directory = Path(dirpath)
+            arc_dir = Path(arc_root) / directory.relative_to(root_dir)
+            dir_info = zipfile.ZipInfo.from_file(directory, arc_dir, strict_timestamps=False)
+            dir_info.CRC = 0
+            zf.mkdir(dir_info)
+            yield buffer.drain()
+
+            for filename in sorted(filenames):
+                path = directory / filename
+                try:
+                    info = zipfile.ZipInfo.from_file(path, arc_dir / filename, strict_timestamps=False)
+                    src = open(path, 'rb')
+                except OSError as e:
+                    print(f"打包时跳过文件 {path}: {e}")
+                    continue
+                info.compress_type = zipfile.ZIP_DEFLATED
+                if path.suffix.lower() in STORED_SUFFIXES:
+                    _set_compress_level(info, 0)
+                with src, zf.open(info, 'w', force_zip64=True) as dest:
+                    while True:
+                        try:
+                            chunk = src.read(CHUNK_SIZE)
+                        except OSError as e:
+                            print(f"打包时读取文件失败，中止打包 {path}: {e}")
+                            raise
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+                yield buffer.drain()
+
+    # 中央目录
+    yield buffer.drain()
@@ -0,0 +1,194 @@
+# myquant/scripts/bench_backend.py
+"""
+后端并发能力基准测试。
+
+对一个已启动的后端（python backend/app.py）建立大量 Socket.IO 客户端并可选地同时启动若干运行，
+在持续时间内定期探测 HTTP 接口延迟，统计连接成功数、事件吞吐量以及后端进程的内存和线程数。
+分别以 server.async_mode 为 threading 和 gevent 启动后端各运行一次即可对比两种模式。
+
+用法:
+    python scripts/bench_backend.py --password admin123 --clients 500 --duration 30
+    python scripts/bench_backend.py --password admin123 --clients 200 --strategy demo --runs 10 --pid <后端pid>
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+import socketio
+
+try:
+    import psutil
+except ImportError:  # 只用于采集后端进程的资源占用
+    psutil = None
+
+COUNTED_EVENTS = ('run_output', 'monitoring_update', 'monitoring_frame', 'dashboard_update', 'run_status_changed')
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class ClientStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connected = 0
+        self.failed = 0
+        self.events = 0
+        self.connect_times = []
+
+    def count_event(self, *args):
+        with self.lock:
+            self.events += 1
+
+
+def connect_client(url, cookie, run_ids, stats):
+    client = socketio.Client(reconnection=False)
+    for event in COUNTED_EVENTS:
+        client.on(event, stats.count_event)
+    started = time.perf_counter()
+    try:
+        client.connect(url, headers={'Cookie': cookie}, transports=['websocket'], wait_timeout=30)
+    except Exception:
+        with stats.lock:
+            stats.failed += 1
+        return None
+    with stats.lock:
+        stats.connected += 1
+        stats.connect_times.append(time.perf_counter() - started)
+    for run_id in run_ids:
+        client.emit('subscribe_output', {'run_id': run_id})
+    return client
+
+
+def launch_runs(session, url, strategy, count):
+    """通过异步启动接口提交运行，返回就绪的 run_id 列表"""
+    tickets = []
+    for _ in range(count):
+        response = session.post(f'{url}/api/strategies/{strategy}/runs', json={'mode': 'backtest', 'async': True})
+        if response.status_code == 202:
+            tickets.append(response.json()['launch_id'])
+    run_ids = []
+    deadline = time.time() + 120
+    while tickets and time.time() < deadline:
+        for launch_id in list(tickets):
+            ticket = session.get(f'{url}/api/launches/{launch_id}').json()
+            if ticket.get('stage') == 'ready':
+                run_ids.append(ticket['run_id'])
+                tickets.remove(launch_id)
+            elif ticket.get('stage') == 'failed':
+                print(f"启动失败: {ticket.get('error')}")
+                tickets.remove(launch_id)
+        time.sleep(0.5)
+    return run_ids
+
+
+def probe_latency(session, url, duration, samples, stop):
+    """每 0.2 秒请求一次健康检查和看板接口，记录延迟"""
+    deadline = time.time() + duration
+    while time.time() < deadline and not stop.is_set():
+        for path in ('/api/health', '/api/dashboard'):
+            started = time.perf_counter()
+            try:
+                session.get(f'{url}{path}', timeout=30)
+                samples.setdefault(path, []).append(time.perf_counter() - started)
+            except requests.RequestException:
+                samples.setdefault(path, []).append(None)
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MyQuant 后端并发基准测试')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--password', required=True, help='平台登录密码')
+    parser.add_argument('--clients', type=int, default=200, help='Socket.IO 客户端数量')
+    parser.add_argument('--connect-batch', type=int, default=50, help='每批并发建立的连接数')
+    parser.add_argument('--duration', type=float, default=20, help='负载保持时间（秒）')
+    parser.add_argument('--strategy', help='同时启动运行所用的策略')
+    parser.add_argument('--runs', type=int, default=0, help='同时启动的回测数量（客户端订阅它们的输出）')
+    parser.add_argument('--pid', type=int, help='后端进程 pid，用于统计内存和线程数')
+    args = parser.parse_args()
+
+    session = requests.Session()
+    response = session.post(f'{args.url}/api/login', json={'password': args.password})
+    response.raise_for_status()
+    cookie = '; '.join(f'{name}={value}' for name, value in session.cookies.items())
+
+    run_ids = []
+    if args.strategy and args.runs:
+        started = time.perf_counter()
+        run_ids = launch_runs(session, args.url, args.strategy, args.runs)
+        print(f"已启动 {len(run_ids)}/{args.runs} 个运行，耗时 {time.perf_counter() - started:.1f}s")
+
+    stats = ClientStats()
+    clients = []
+    started = time.perf_counter()
+    for offset in range(0, args.clients, args.connect_batch):
+        batch = []
+        results = [None] * min(args.connect_batch, args.clients - offset)
+
+        def connect(index):
+            results[index] = connect_client(args.url, cookie, run_ids, stats)
+
+        for index in range(len(results)):
+            thread = threading.Thread(target=connect, args=(index,), daemon=True)
+            thread.start()
+            batch.append(thread)
+        for thread in batch:
+            thread.join()
+        clients.extend(client for client in results if client is not None)
+    connect_elapsed = time.perf_counter() - started
+    print(f"连接: 成功 {stats.connected}，失败 {stats.failed}，耗时 {connect_elapsed:.1f}s")
+
+    samples = {}
+    stop = threading.Event()
+    events_before = stats.events
+    load_started = time.perf_counter()
+    probe_latency(session, args.url, args.duration, samples, stop)
+    load_elapsed = time.perf_counter() - load_started
+    events = stats.events - events_before
+
+    backend = None
+    if args.pid and psutil:
+        try:
+            process = psutil.Process(args.pid)
+            backend = {'rss_mb': process.memory_info().rss / 1024 / 1024, 'threads': process.num_threads()}
+        except psutil.Error:
+            pass
+
+    print('=' * 60)
+    print(f"客户端: {stats.connected}/{args.clients}，运行: {len(run_ids)}")
+    if stats.connect_times:
+        print(f"建立连接: p50 {percentile(stats.connect_times, 0.5) * 1000:.0f}ms，"
+              f"p99 {percentile(stats.connect_times, 0.99) * 1000:.0f}ms")
+    print(f"收到事件: {events}（{events / load_elapsed:.0f}/s）")
+    for path, values in samples.items():
+        ok = [value for value in values if value is not None]
+        errors = len(values) - len(ok)
+        if ok:
+            print(f"{path}: p50 {statistics.median(ok) * 1000:.1f}ms，p95 {percentile(ok, 0.95) * 1000:.1f}ms，"
+                  f"max {max(ok) * 1000:.1f}ms，失败 {errors}")
+        else:
+            print(f"{path}: 全部失败 ({errors})")
+    if backend:
+        print(f"后端进程: RSS {backend['rss_mb']:.0f}MB，线程 {backend['threads']}")
+
+    for client in clients:
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+    for run_id in run_ids:
+        try:
+            session.post(f'{args.url}/api/runs/{run_id}/control', json={'action': 'stop'}, timeout=30)
+        except requests.RequestException as e:
+            print(f"停止运行 {run_id} 失败: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+from qtrader.strategy.base import Strategy
+class S(Strategy):
+    def initialize(self, context):
+        context.user_data['short_ma_period'] = 5
+        context.user_data['long_ma_period'] = 10
+        context.user_data['derived'] = context.user_data['short_ma_period'] * 100
+        context.user_data['symbols'] = ['A%d' % i for i in range(10)]